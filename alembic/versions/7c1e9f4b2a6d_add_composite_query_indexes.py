@@ -0,0 +1,56 @@
+"""add composite query indexes
+
+Revision ID: 7c1e9f4b2a6d
+Revises: d5c099b3d9ec
+Create Date: 2026-10-17 10:12:41.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e9f4b2a6d'
+down_revision: Union[str, Sequence[str], None] = 'd5c099b3d9ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Single-column indexes on primary keys; the primary key already is one.
+REDUNDANT_PK_INDEXES = [
+    ('ix_delivery_channels_channel_id', 'delivery_channels', 'channel_id'),
+    ('ix_users_user_id', 'users', 'user_id'),
+    ('ix_calendars_calendar_id', 'calendars', 'calendar_id'),
+    ('ix_reminders_reminder_id', 'reminders', 'reminder_id'),
+    ('ix_smtp_settings_smtp_id', 'smtp_settings', 'smtp_id'),
+    ('ix_todos_todo_id', 'todos', 'todo_id'),
+    ('ix_whatsapp_settings_wa_id', 'whatsapp_settings', 'wa_id'),
+    ('ix_calendar_events_event_id', 'calendar_events', 'event_id'),
+    ('ix_reminder_deliveries_delivery_id', 'reminder_deliveries', 'delivery_id'),
+    ('ix_reminder_logs_id_log_id', 'reminder_logs', 'id_log_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reminders_user_id_reminder_datetime', 'reminders', ['user_id', 'reminder_datetime'], unique=False)
+    op.create_index('ix_reminders_status_reminder_datetime', 'reminders', ['status', 'reminder_datetime'], unique=False)
+    op.create_index('ix_todos_user_id_due_date', 'todos', ['user_id', 'due_date'], unique=False)
+    op.create_index('ix_calendar_events_calendar_id_start_datetime', 'calendar_events', ['calendar_id', 'start_datetime'], unique=False)
+    op.create_index('ix_reminder_deliveries_reminder_id_channel_id', 'reminder_deliveries', ['reminder_id', 'channel_id'], unique=False)
+    for name, table, _ in REDUNDANT_PK_INDEXES:
+        op.drop_index(op.f(name), table_name=table)
+    # The scheduler selects on status = 'pending'; NULL used to mean the same.
+    op.execute(sa.text("UPDATE reminders SET status = 'pending' WHERE status IS NULL"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, column in REDUNDANT_PK_INDEXES:
+        op.create_index(op.f(name), table, [column], unique=False)
+    op.drop_index('ix_reminder_deliveries_reminder_id_channel_id', table_name='reminder_deliveries')
+    op.drop_index('ix_calendar_events_calendar_id_start_datetime', table_name='calendar_events')
+    op.drop_index('ix_todos_user_id_due_date', table_name='todos')
+    op.drop_index('ix_reminders_status_reminder_datetime', table_name='reminders')
+    op.drop_index('ix_reminders_user_id_reminder_datetime', table_name='reminders')
@@ -0,0 +1,30 @@
+"""add delivery digests
+
+Revision ID: a3f9d2c7b5e1
+Revises: d4a7b2e9f351
+Create Date: 2026-10-17 18:02:51.377104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f9d2c7b5e1'
+down_revision: Union[str, Sequence[str], None] = 'd4a7b2e9f351'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('delivery_channels', sa.Column('digest_window_seconds', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('reminder_deliveries', sa.Column('not_before', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reminder_deliveries', 'not_before')
+    op.drop_column('delivery_channels', 'digest_window_seconds')
@@ -0,0 +1,30 @@
+"""add reminder recurrence rule
+
+Revision ID: a9d3e5f71c20
+Revises: e6a4c8d1f02b
+Create Date: 2026-10-17 12:41:37.208514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e5f71c20'
+down_revision: Union[str, Sequence[str], None] = 'e6a4c8d1f02b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reminders', sa.Column('recurrence_rule', sa.String(length=500), nullable=True))
+    op.add_column('reminders', sa.Column('recurrence_start', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reminders', 'recurrence_start')
+    op.drop_column('reminders', 'recurrence_rule')
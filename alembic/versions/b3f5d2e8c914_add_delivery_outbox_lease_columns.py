@@ -0,0 +1,34 @@
+"""add delivery outbox lease columns
+
+Revision ID: b3f5d2e8c914
+Revises: 7c1e9f4b2a6d
+Create Date: 2026-10-17 11:03:27.184950
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f5d2e8c914'
+down_revision: Union[str, Sequence[str], None] = '7c1e9f4b2a6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reminder_deliveries', sa.Column('locked_by', sa.String(length=64), nullable=True))
+    op.add_column('reminder_deliveries', sa.Column('locked_until', sa.DateTime(), nullable=True))
+    op.add_column('reminder_deliveries', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_reminder_deliveries_delivery_status_delivery_id', 'reminder_deliveries', ['delivery_status', 'delivery_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reminder_deliveries_delivery_status_delivery_id', table_name='reminder_deliveries')
+    op.drop_column('reminder_deliveries', 'attempts')
+    op.drop_column('reminder_deliveries', 'locked_until')
+    op.drop_column('reminder_deliveries', 'locked_by')
@@ -0,0 +1,30 @@
+"""add reminder updated_at
+
+Revision ID: b7e2c5f8a914
+Revises: a3f9d2c7b5e1
+Create Date: 2026-10-17 21:14:08.512390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c5f8a914'
+down_revision: Union[str, Sequence[str], None] = 'a3f9d2c7b5e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reminders', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_reminders_status_updated_at', 'reminders', ['status', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reminders_status_updated_at', table_name='reminders')
+    op.drop_column('reminders', 'updated_at')
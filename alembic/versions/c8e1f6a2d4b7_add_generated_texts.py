@@ -0,0 +1,36 @@
+"""add generated texts
+
+Revision ID: c8e1f6a2d4b7
+Revises: f2b7c4a9e813
+Create Date: 2026-10-17 15:02:11.730214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e1f6a2d4b7'
+down_revision: Union[str, Sequence[str], None] = 'f2b7c4a9e813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('generated_texts',
+    sa.Column('text_hash', sa.String(length=64), nullable=False),
+    sa.Column('generator', sa.String(length=100), nullable=False),
+    sa.Column('source_text', sa.Text(), nullable=False),
+    sa.Column('generated_text', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('text_hash'),
+    mysql_engine='InnoDB'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('generated_texts')
@@ -0,0 +1,33 @@
+"""add retention indexes
+
+Revision ID: d4a7b2e9f351
+Revises: c8e1f6a2d4b7
+Create Date: 2026-10-17 16:11:38.204517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7b2e9f351'
+down_revision: Union[str, Sequence[str], None] = 'c8e1f6a2d4b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable with no default, so MySQL adds it in place without a rewrite.
+    op.add_column('reminder_deliveries', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_reminder_deliveries_created_at', 'reminder_deliveries', ['created_at'], unique=False)
+    op.create_index('ix_reminder_logs_created_at', 'reminder_logs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reminder_logs_created_at', table_name='reminder_logs')
+    op.drop_index('ix_reminder_deliveries_created_at', table_name='reminder_deliveries')
+    op.drop_column('reminder_deliveries', 'created_at')
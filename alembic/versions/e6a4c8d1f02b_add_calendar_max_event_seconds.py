@@ -0,0 +1,33 @@
+"""add calendar max event seconds
+
+Revision ID: e6a4c8d1f02b
+Revises: b3f5d2e8c914
+Create Date: 2026-10-17 11:48:09.772631
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a4c8d1f02b'
+down_revision: Union[str, Sequence[str], None] = 'b3f5d2e8c914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('calendars', sa.Column('max_event_seconds', sa.Integer(), server_default='0', nullable=False))
+    op.execute(sa.text(
+        "UPDATE calendars c SET max_event_seconds = COALESCE(("
+        " SELECT MAX(TIMESTAMPDIFF(SECOND, e.start_datetime, e.end_datetime))"
+        " FROM calendar_events e WHERE e.calendar_id = c.calendar_id), 0)"
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('calendars', 'max_event_seconds')
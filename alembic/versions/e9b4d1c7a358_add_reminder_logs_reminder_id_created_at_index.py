@@ -0,0 +1,28 @@
+"""add reminder_logs reminder_id created_at index
+
+Revision ID: e9b4d1c7a358
+Revises: b7e2c5f8a914
+Create Date: 2026-10-17 21:32:47.209815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b4d1c7a358'
+down_revision: Union[str, Sequence[str], None] = 'b7e2c5f8a914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reminder_logs_reminder_id_created_at', 'reminder_logs', ['reminder_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reminder_logs_reminder_id_created_at', table_name='reminder_logs')
@@ -0,0 +1,34 @@
+"""add calendar feed columns
+
+Revision ID: f2b7c4a9e813
+Revises: a9d3e5f71c20
+Create Date: 2026-10-17 13:26:52.419066
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7c4a9e813'
+down_revision: Union[str, Sequence[str], None] = 'a9d3e5f71c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('calendars', sa.Column('change_counter', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('calendars', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('calendars', sa.Column('feed_token', sa.String(length=64), nullable=True))
+    op.create_unique_constraint(op.f('uq_calendars_feed_token'), 'calendars', ['feed_token'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(op.f('uq_calendars_feed_token'), 'calendars', type_='unique')
+    op.drop_column('calendars', 'feed_token')
+    op.drop_column('calendars', 'updated_at')
+    op.drop_column('calendars', 'change_counter')
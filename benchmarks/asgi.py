@@ -0,0 +1,39 @@
+"""Drive an ASGI app directly, discarding the response body as it arrives.
+
+httpx's ASGITransport buffers whole bodies, which hides whether an
+endpoint really streams. ``consume`` keeps only counters, so traced
+memory reflects the server side.
+"""
+import asyncio
+
+
+async def consume(app, path, query_string=b"", headers=(), method="GET", body=b""):
+    """Request ``path`` and return ``(status, response_headers, body_bytes, newlines)``."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query_string, "server": ("bench", 80), "client": ("127.0.0.1", 1),
+        "headers": [(b"host", b"bench"), *headers],
+    }
+    response = {"status": None, "headers": {}, "bytes": 0, "newlines": 0}
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # Starlette listens for a disconnect while streaming; never send one.
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {key.decode(): value.decode() for key, value in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            response["bytes"] += len(chunk)
+            response["newlines"] += chunk.count(b"\n")
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["bytes"], response["newlines"]
@@ -0,0 +1,58 @@
+"""Per-request overhead of get_current_user with and without the token cache.
+
+    python -m benchmarks.auth_cache --iterations 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import benchmarks.env
+
+from datetime import timedelta
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, User
+from routers.auth import create_access_token, get_current_user
+from services.token_cache import get_token_cache
+
+
+async def measure(token, iterations):
+    async with SessionLocal() as session:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await get_current_user(token, session)
+        elapsed = time.perf_counter() - started
+    return round(elapsed / iterations * 1e6, 1)
+
+
+async def main(args):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as session:
+        session.add(User(name="Bench", email="bench@example.com", password="unused"))
+        await session.commit()
+    token = create_access_token({"sub": "bench@example.com"}, expires_delta=timedelta(minutes=30))
+
+    cache = get_token_cache()
+    max_size = cache.max_size
+    cache.max_size = 0
+    uncached = await measure(token, args.iterations)
+    cache.max_size = max_size
+    cache.hits = cache.misses = 0
+    cached = await measure(token, args.iterations)
+    await get_engine().dispose()
+
+    print(json.dumps({
+        "iterations": args.iterations,
+        "uncached_us_per_request": uncached,
+        "cached_us_per_request": cached,
+        "speedup": round(uncached / cached, 1),
+        "cache": cache.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+"""Latency of month-view overlap queries on large synthetic calendars.
+
+Seeds one user with ``--events`` events spread over ``--calendars``
+calendars and ``--years`` of history, then times random month windows
+three ways: find_overlapping_events on its own, the full
+GET /calendars/events request, and a plain overlap query
+(``start < end AND end > start``) with no lower bound on
+``start_datetime`` for comparison.
+
+    python -m benchmarks.calendar_range
+    python -m benchmarks.calendar_range --events 50000 --calendars 5 --years 1
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import benchmarks.env
+
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import insert, select
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, Calendar, CalendarEvent, User
+from main import app
+from routers.auth import create_access_token
+from routers.calendar import find_overlapping_events
+
+YEAR_START = datetime(2030, 1, 1)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+async def seed(events, calendars, years, max_hours):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    rng = random.Random(7)
+    async with SessionLocal() as session:
+        session.add(User(user_id=1, name="Bench", email="bench@example.com", password="unused"))
+        session.add_all(
+            Calendar(calendar_id=i, user_id=1, calendar_name=f"Calendar {i}", max_event_seconds=max_hours * 3600)
+            for i in range(1, calendars + 1)
+        )
+        await session.flush()
+        rows = []
+        for i in range(events):
+            start = YEAR_START + timedelta(minutes=rng.randrange(years * 365 * 24 * 60))
+            rows.append({
+                "calendar_id": 1 + i % calendars,
+                "title": f"Event {i}",
+                "start_datetime": start,
+                "end_datetime": start + timedelta(minutes=rng.randrange(15, max_hours * 60)),
+            })
+            if len(rows) == 5000:
+                await session.execute(insert(CalendarEvent), rows)
+                rows = []
+        if rows:
+            await session.execute(insert(CalendarEvent), rows)
+        await session.commit()
+
+
+def month_windows(views, years):
+    rng = random.Random(11)
+    windows = []
+    for _ in range(views):
+        start = YEAR_START + timedelta(days=rng.randrange(years * 365 - 30))
+        windows.append((start, start + timedelta(days=30)))
+    return windows
+
+
+async def naive_overlap(start, end):
+    async with SessionLocal() as session:
+        query = (
+            select(CalendarEvent)
+            .join(Calendar, Calendar.calendar_id == CalendarEvent.calendar_id)
+            .where(Calendar.user_id == 1, CalendarEvent.start_datetime < end, CalendarEvent.end_datetime > start)
+            .order_by(CalendarEvent.start_datetime, CalendarEvent.event_id)
+        )
+        return (await session.execute(query)).scalars().all()
+
+
+async def main(args):
+    await seed(args.events, args.calendars, args.years, args.max_hours)
+    token = create_access_token({"sub": "bench@example.com"}, expires_delta=timedelta(hours=1))
+    windows = month_windows(args.views, args.years)
+
+    bounded, api, naive, counts = [], [], [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.get("/calendars/events", params={"start": windows[0][0].isoformat(), "end": windows[0][1].isoformat()}, headers=headers)
+        for start, end in windows:
+            async with SessionLocal() as session:
+                started = time.perf_counter()
+                rows = await find_overlapping_events(session, 1, start, end)
+                bounded.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            response = await client.get("/calendars/events", params={"start": start.isoformat(), "end": end.isoformat()}, headers=headers)
+            api.append(time.perf_counter() - started)
+            counts.append(len(response.json()))
+            assert len(rows) == counts[-1], (len(rows), counts[-1])
+
+            started = time.perf_counter()
+            rows = await naive_overlap(start, end)
+            naive.append(time.perf_counter() - started)
+            assert len(rows) == counts[-1], (len(rows), counts[-1])
+    await get_engine().dispose()
+    print(json.dumps({
+        "events": args.events,
+        "calendars": args.calendars,
+        "views": args.views,
+        "mean_events_per_view": round(statistics.mean(counts), 1),
+        "years": args.years,
+        "bounded_query": percentiles(bounded),
+        "endpoint": percentiles(api),
+        "naive_query": percentiles(naive),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--calendars", type=int, default=5)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--views", type=int, default=200)
+    parser.add_argument("--max-hours", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
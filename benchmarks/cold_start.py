@@ -0,0 +1,135 @@
+"""Cold start: time from spawning a server process to its first served request.
+
+Each run starts ``uvicorn main:app`` in a fresh interpreter against a
+seeded SQLite file and polls an authenticated ``GET /todos`` until it
+answers 200. A second set of runs times the phases inside a fresh
+interpreter: importing main, ``create_app()``, the lifespan startup and
+the first request.
+
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 10
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import benchmarks.env
+
+EMAIL = "bench@example.com"
+
+
+def seed():
+    from sqlalchemy import create_engine, insert
+
+    from lib.db.models import Base, User
+
+    engine = create_engine(os.environ["MYSQL_URL"])
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        conn.execute(insert(User), [{"name": "Bench", "email": EMAIL, "password": "unused"}])
+    engine.dispose()
+
+
+def token():
+    from routers.auth import create_access_token
+
+    return create_access_token({"sub": EMAIL})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_once(headers, timeout=30.0):
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/todos", params={"limit": 1}, headers=headers)
+                if response.status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.005)
+        raise RuntimeError("server did not answer in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def phases(headers):
+    """Runs in the child interpreter; prints each phase's duration."""
+    import asyncio
+
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+    app = main.create_app()
+    created = time.perf_counter()
+
+    async def boot_and_serve():
+        from benchmarks.asgi import consume
+
+        async with app.router.lifespan_context(app):
+            booted = time.perf_counter()
+            status, *_ = await consume(app, "/todos", b"limit=1", [(k.lower().encode(), v.encode()) for k, v in headers.items()])
+            served = time.perf_counter()
+        assert status == 200, status
+        return booted, served
+
+    booted, served = asyncio.run(boot_and_serve())
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "create_app_ms": (created - imported) * 1000,
+        "lifespan_ms": (booted - created) * 1000,
+        "first_request_ms": (served - booted) * 1000,
+        "total_ms": (served - started) * 1000,
+    }))
+
+
+def summarize(samples):
+    return {"median": round(statistics.median(samples), 1), "min": round(min(samples), 1), "max": round(max(samples), 1)}
+
+
+def main(args):
+    if args.child:
+        # The token comes from the parent, so nothing is imported early.
+        phases({"Authorization": f"Bearer {args.child}"})
+        return
+    access_token = token()
+    headers = {"Authorization": f"Bearer {access_token}"}
+    seed()
+    to_first_response = [serve_once(headers) * 1000 for _ in range(args.runs)]
+    runs = []
+    for _ in range(args.runs):
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.cold_start", "--child", access_token], capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(child.stdout))
+    print(json.dumps({
+        "runs": args.runs,
+        "spawn_to_first_response_ms": summarize(to_first_response),
+        "phases_ms": {name: summarize([run[name] for run in runs]) for name in runs[0]},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", metavar="TOKEN", help=argparse.SUPPRESS)
+    main(parser.parse_args())
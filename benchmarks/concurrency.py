@@ -0,0 +1,74 @@
+"""Requests/sec of the authenticated todo endpoint as the number of
+concurrent clients grows.
+
+Run from the repository root:
+
+    python -m benchmarks.concurrency --clients 1 4 16 64 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import benchmarks.env
+
+import httpx
+
+from lib.db.connection import get_engine
+from lib.db.models import Base
+from main import app
+
+USER = {
+    "firstname": "Bench",
+    "lastname": "User",
+    "email": "bench@example.com",
+    "password": "bench-password",
+    "contactNo": 5550100,
+}
+
+
+async def setup(client):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await client.post("/auth/register", json=USER)
+    response = await client.post(
+        "/auth/login", json={"username": USER["email"], "password": USER["password"]}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_level(client, headers, clients, total):
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.post(
+                "/todos",
+                headers=headers,
+                json={"title": "bench", "description": "bench", "due_date": "2030-01-01T09:00:00"},
+            )
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {"clients": clients, "requests": total, "seconds": round(elapsed, 3),
+            "requests_per_sec": round(total / elapsed, 1)}
+
+
+async def main(args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = await setup(client)
+        results = [await run_level(client, headers, n, args.requests) for n in args.clients]
+    await get_engine().dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,168 @@
+"""Sends avoided and latency added by per-user delivery digests.
+
+Replays a burst trace of due reminders through ``services.outbox``:
+``--users`` users over ``--minutes`` minutes, where each due moment
+carries one reminder (60%), a small burst of 2-3 (25%) or a large one
+of 4-10 (15%), jittered over ``--jitter`` seconds, like a calendar
+import or a morning routine. The trace runs ``--speed`` times faster
+than real time and is replayed twice: with the email channel's digest
+window off, then at ``--window`` trace seconds. A real
+SmtpDeliveryEngine builds the messages; only the SMTP send itself is
+replaced by a ``--send-ms`` sleep.
+
+Reports messages sent, sends avoided, UPDATE statements spent recording
+outcomes and due-to-sent latency in trace seconds.
+
+    python -m benchmarks.digests
+    python -m benchmarks.digests --users 500 --window 120
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from benchmarks.env import email, users as seed_users
+
+from datetime import datetime
+
+from sqlalchemy import delete, event, insert, select, update
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, DeliveryChannel, Reminder, ReminderForDelivery, SmtpShipping, User
+from services.deliveries import DELIVERY_SENT
+from services.outbox import CHANNEL_EMAIL, OutboxWorker, enqueue
+from services.scheduler import DueReminder
+from services.settings_cache import DeliverySettingsCache
+from services.smtp_delivery import SmtpDeliveryEngine
+
+
+class TimedSmtpEngine(SmtpDeliveryEngine):
+    """Builds messages as usual; sending is a sleep."""
+
+    def __init__(self, session_factory, latency, settings_cache):
+        super().__init__(session_factory, settings_cache=settings_cache)
+        self.latency = latency
+        self.messages = 0
+
+    async def send(self, settings, message):
+        self.messages += 1
+        await asyncio.sleep(self.latency)
+
+
+def trace(rng, users, minutes, jitter):
+    """(offset seconds, user id) per due reminder, sorted by offset."""
+    due = []
+    for user_id in range(1, users + 1):
+        moments = rng.randint(1, max(1, minutes // 5))
+        for _ in range(moments):
+            at = rng.uniform(0, minutes * 60)
+            roll = rng.random()
+            size = 1 if roll < 0.6 else rng.randint(2, 3) if roll < 0.85 else rng.randint(4, 10)
+            due.extend((at + rng.uniform(0, jitter), user_id) for _ in range(size))
+    return sorted(due)
+
+
+async def seed(users, due):
+    async with get_engine().begin() as conn:
+        await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), seed_users(users))
+        await conn.execute(insert(SmtpShipping), [
+            {"user_id": i, "smtp_server": "smtp.example.com", "port": 587, "username": email(i), "password_hash": "x"}
+            for i in range(1, users + 1)
+        ])
+        await conn.execute(insert(DeliveryChannel), [{"channel_id": 1, "channel_name": CHANNEL_EMAIL, "is_active": True}])
+        await conn.execute(insert(Reminder), [
+            {"reminder_id": n, "user_id": user_id, "title": f"Reminder {n}", "description": "Due now", "reminder_datetime": datetime(2030, 1, 1)}
+            for n, (_, user_id) in enumerate(due, 1)
+        ])
+
+
+async def replay(due, window, args):
+    async with get_engine().begin() as conn:
+        await conn.execute(delete(ReminderForDelivery))
+        await conn.execute(update(DeliveryChannel).values(digest_window_seconds=window))
+    settings_cache = DeliverySettingsCache()
+    sender = TimedSmtpEngine(SessionLocal, args.send_ms / 1000, settings_cache)
+    worker = OutboxWorker(
+        SessionLocal, {CHANNEL_EMAIL: sender}, batch_size=args.batch_size,
+        poll_interval=0.05, settings_cache=settings_cache,
+    )
+    updates = []
+
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE reminder_deliveries SET delivery_status=?, sent_at="):
+            # aiomysql runs an UPDATE executemany row by row.
+            updates.append(len(parameters) if executemany else 1)
+
+    event.listen(get_engine().sync_engine, "before_cursor_execute", count_updates)
+    due_at = {}
+    started = time.monotonic()
+
+    async def scheduler():
+        for n, (offset, user_id) in enumerate(due, 1):
+            delay = started + offset / args.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with SessionLocal() as session:
+                await enqueue(session, [DueReminder(n, user_id, datetime.utcnow())], settings_cache)
+                await session.commit()
+            due_at[n] = time.monotonic()
+
+    worker_task = asyncio.create_task(worker.run())
+    await scheduler()
+    while True:
+        async with SessionLocal() as session:
+            remaining = await session.scalar(
+                select(ReminderForDelivery.delivery_id).where(ReminderForDelivery.delivery_status != DELIVERY_SENT).limit(1)
+            )
+        if remaining is None:
+            break
+        await asyncio.sleep(0.05)
+    worker.stop()
+    await worker_task
+    event.remove(get_engine().sync_engine, "before_cursor_execute", count_updates)
+
+    async with SessionLocal() as session:
+        rows = (await session.execute(select(ReminderForDelivery.reminder_id, ReminderForDelivery.sent_at))).all()
+    # sent_at is wall-clock; map it onto the monotonic clock used for due_at.
+    offset = time.monotonic() - datetime.utcnow().timestamp()
+    latencies = sorted((sent_at.timestamp() + offset - due_at[reminder_id]) * args.speed for reminder_id, sent_at in rows)
+    return {
+        "deliveries": len(rows),
+        "messages": sender.messages,
+        "complete_updates": sum(updates),
+        "latency_s": {
+            "p50": round(statistics.median(latencies), 1),
+            "p95": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+            "max": round(latencies[-1], 1),
+        },
+    }
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    due = trace(rng, args.users, args.minutes, args.jitter)
+    await seed(args.users, due)
+    window = max(1, round(args.window / args.speed))
+    report = {"due_reminders": len(due), "window_trace_s": window * args.speed}
+    report["off"] = await replay(due, 0, args)
+    report["digest"] = await replay(due, window, args)
+    report["sends_avoided_pct"] = round((1 - report["digest"]["messages"] / report["off"]["messages"]) * 100, 1)
+    await get_engine().dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--jitter", type=float, default=30.0)
+    parser.add_argument("--window", type=float, default=60.0)
+    parser.add_argument("--speed", type=float, default=60.0)
+    parser.add_argument("--send-ms", type=float, default=50.0)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
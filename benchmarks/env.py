@@ -0,0 +1,30 @@
+"""Environment and seed rows shared by the benchmarks.
+
+Import this before anything from ``lib``, ``routers``, ``services`` or
+``main``: their engines and singletons read the environment on first
+use. Each run gets a fresh temporary directory with a SQLite database in
+it, unless ``MYSQL_URL`` is already set. Child processes inherit the
+parent's environment, so they open the parent's database.
+"""
+import os
+import tempfile
+
+BENCH_DIR = tempfile.mkdtemp(prefix="orbion-bench-")
+DB_PATH = os.path.join(BENCH_DIR, "bench.db")
+os.environ.setdefault("MYSQL_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("DB_ECHO", "false")
+os.environ.setdefault("PUSH_BROKER", "local")
+
+
+def email(user_id):
+    return f"user{user_id}@example.com"
+
+
+def users(count, password="unused", phone_numbers=False):
+    """Rows for ``insert(User)``: users 1 to ``count``."""
+    rows = [{"user_id": i, "name": f"User {i}", "email": email(i), "password": password} for i in range(1, count + 1)]
+    if phone_numbers:
+        for row in rows:
+            row["phone_number"] = f"+1555{row['user_id']:07d}"
+    return rows
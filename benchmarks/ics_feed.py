@@ -0,0 +1,110 @@
+"""Response time and peak memory of the ICS feed for a large calendar.
+
+Seeds one calendar with ``--events`` events (every tenth with a related
+reminder) and times a full feed download, then a conditional GET with
+the returned ETag, which should be a 304 that never reads the events.
+
+    python -m benchmarks.ics_feed
+    python -m benchmarks.ics_feed --events 100000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.env import users
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from benchmarks.asgi import consume
+from lib.db.connection import get_engine
+from lib.db.models import Base, Calendar, CalendarEvent, Reminder, User
+from main import app
+
+START = datetime(2030, 1, 1)
+FEED_TOKEN = "bench-feed-token"
+
+
+async def seed(events):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), users(1))
+        await conn.execute(insert(Calendar), [{
+            "calendar_id": 1, "user_id": 1, "calendar_name": "Bench, large", "feed_token": FEED_TOKEN,
+            "max_event_seconds": 4 * 3600, "change_counter": events, "updated_at": START,
+        }])
+        rng = random.Random(9)
+        reminders, rows = [], []
+        for i in range(events):
+            start = START + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+            related = None
+            if i % 10 == 0:
+                related = len(reminders) + 1
+                reminders.append({
+                    "reminder_id": related, "user_id": 1, "title": f"Prepare for event {i}",
+                    "reminder_datetime": start - timedelta(minutes=30), "status": "pending",
+                })
+            rows.append({
+                "calendar_id": 1, "title": f"Event {i}; room {i % 40}",
+                "description": "Synthetic event with a description long enough to need folding " * (1 + i % 2),
+                "start_datetime": start, "end_datetime": start + timedelta(minutes=rng.randrange(15, 240)),
+                "related_reminder_id": related,
+            })
+        await conn.execute(insert(Reminder), reminders)
+        for offset in range(0, len(rows), 10000):
+            await conn.execute(insert(CalendarEvent), rows[offset:offset + 10000])
+
+
+async def main(args):
+    await seed(args.events)
+    path = f"/calendars/feeds/{FEED_TOKEN}.ics"
+
+    started = time.perf_counter()
+    status, headers, size, _ = await consume(app, path)
+    elapsed = time.perf_counter() - started
+    assert status == 200, status
+    # tracemalloc slows allocation-heavy code several times over, so peak
+    # memory is measured on a second, untimed download.
+    tracemalloc.start()
+    await consume(app, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(get_engine().sync_engine, "before_cursor_execute", listener)
+    samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        status, _, _, _ = await consume(app, path, headers=[(b"if-none-match", headers["etag"].encode())])
+        samples.append(time.perf_counter() - started)
+        assert status == 304, status
+    event.remove(get_engine().sync_engine, "before_cursor_execute", listener)
+    await get_engine().dispose()
+
+    print(json.dumps({
+        "events": args.events,
+        "full_feed": {
+            "seconds": round(elapsed, 2),
+            "mb": round(size / 2**20, 2),
+            "events_per_sec": round(args.events / elapsed, 1),
+            "peak_traced_mb": round(peak / 2**20, 2),
+        },
+        "not_modified": {
+            "p50_ms": round(statistics.median(samples) * 1000, 3),
+            "max_ms": round(max(samples) * 1000, 3),
+            "reads_calendar_events": any("calendar_events" in statement for statement in statements),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,282 @@
+"""Load test of the app from main.py against a seeded SQLite database.
+
+Seeds ``--users`` users, each with ``--rows`` todos, reminders and
+calendar events, boots the app (lifespan included) and has ``--clients``
+concurrent clients run a weighted mix of register, login and CRUD
+requests for ``--requests`` requests in total. Reports throughput and
+p50/p95/p99 latency per scenario as JSON. ``--seed`` fixes the request
+mix and the synthetic data, so two runs on the same tree do the same work.
+
+    python -m benchmarks.loadtest --output before.json
+    python -m benchmarks.loadtest --baseline before.json --output after.json
+    python -m benchmarks.loadtest --compare before.json after.json --tolerance 10
+
+With ``--baseline`` or ``--compare``, scenarios whose p95 grew or whose
+throughput fell by more than ``--tolerance`` percent are listed as
+regressions and the exit status is 1. Scenarios with fewer than
+``--min-requests`` requests in either run are reported but never
+flagged: their p95 is too noisy to judge.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+
+from benchmarks.env import email, users as seed_users
+
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import insert
+
+from lib.db.connection import get_engine, get_settings
+from lib.db.models import Base, Calendar, CalendarEvent, Reminder, Todo, User
+from main import app
+from routers.auth import create_access_token
+from services.passwords import get_password_hasher
+
+START = datetime(2030, 1, 1)
+PASSWORD = "bench-password"
+
+# Relative weight of each scenario in the request mix.
+MIX = {
+    "register": 1,
+    "login": 2,
+    "list_todos": 15,
+    "create_todo": 8,
+    "list_reminders": 15,
+    "create_reminder": 8,
+    "reminder_occurrences": 5,
+    "calendar_month": 10,
+    "create_event": 4,
+    "update_event": 2,
+}
+
+
+async def seed(users, rows, rng):
+    password = await get_password_hasher().hash(PASSWORD)
+    span = timedelta(days=365).total_seconds()
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), seed_users(users, password, phone_numbers=True))
+        await conn.execute(insert(Calendar), [
+            {"calendar_id": i, "user_id": i, "calendar_name": f"Calendar {i}"} for i in range(1, users + 1)
+        ])
+        for user_id in range(1, users + 1):
+            times = [START + timedelta(seconds=rng.uniform(0, span)) for _ in range(rows)]
+            await conn.execute(insert(Todo), [
+                {"user_id": user_id, "title": f"todo {n}", "due_date": at, "status": "Pending"} for n, at in enumerate(times)
+            ])
+            await conn.execute(insert(Reminder), [
+                {"user_id": user_id, "title": f"reminder {n}", "reminder_datetime": at, "status": "pending"}
+                for n, at in enumerate(times)
+            ])
+            await conn.execute(insert(CalendarEvent), [
+                {"calendar_id": user_id, "title": f"event {n}", "start_datetime": at, "end_datetime": at + timedelta(hours=1)}
+                for n, at in enumerate(times)
+            ])
+        # Events of up to an hour, so range queries bound their scan.
+        await conn.execute(Calendar.__table__.update().values(max_event_seconds=3600))
+
+
+class Client:
+    """One simulated user: a seeded account with its own token."""
+
+    def __init__(self, http, user_id, rng):
+        self.http = http
+        self.user_id = user_id
+        self.rng = rng
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': email(user_id)}, timedelta(hours=1))}"}
+        self.event_ids = []
+
+    def when(self):
+        return (START + timedelta(days=self.rng.randrange(365), minutes=self.rng.randrange(24 * 60))).isoformat()
+
+    async def register(self):
+        token = f"{self.user_id}-{self.rng.getrandbits(48):x}"
+        return await self.http.post("/auth/register", json={
+            "firstname": "Load", "lastname": token, "email": f"new-{token}@example.com",
+            "password": PASSWORD, "contactNo": 5550000,
+        })
+
+    async def login(self):
+        return await self.http.post("/auth/login", json={"username": email(self.user_id), "password": PASSWORD})
+
+    async def list_todos(self):
+        return await self.http.get("/todos", params={"limit": 50}, headers=self.headers)
+
+    async def create_todo(self):
+        return await self.http.post("/todos", headers=self.headers, json={
+            "title": "load", "description": "load", "due_date": self.when(),
+        })
+
+    async def list_reminders(self):
+        return await self.http.get("/reminders", params={"limit": 50}, headers=self.headers)
+
+    async def create_reminder(self):
+        return await self.http.post("/reminders", headers=self.headers, json={"title": "load", "reminder_datetime": self.when()})
+
+    async def reminder_occurrences(self):
+        start = START + timedelta(days=self.rng.randrange(335))
+        return await self.http.get("/reminders/occurrences", headers=self.headers, params={
+            "start": start.isoformat(), "end": (start + timedelta(days=30)).isoformat(),
+        })
+
+    async def calendar_month(self):
+        start = START + timedelta(days=self.rng.randrange(335))
+        return await self.http.get("/calendars/events", headers=self.headers, params={
+            "start": start.isoformat(), "end": (start + timedelta(days=30)).isoformat(),
+        })
+
+    async def create_event(self):
+        start = self.when()
+        response = await self.http.post(f"/calendars/{self.user_id}/events", headers=self.headers, json={
+            "title": "load", "start_datetime": start, "end_datetime": start,
+        })
+        if response.status_code == 200:
+            self.event_ids.append(response.json()["event_id"])
+        return response
+
+    async def update_event(self):
+        if not self.event_ids:
+            return await self.create_event()
+        start = self.when()
+        return await self.http.put(
+            f"/calendars/{self.user_id}/events/{self.rng.choice(self.event_ids)}",
+            headers=self.headers,
+            json={"title": "moved", "start_datetime": start, "end_datetime": start},
+        )
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def summarize(latencies, errors, elapsed):
+    samples = sorted(latencies)
+    if not samples:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "requests_per_sec": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    await seed(args.users, args.rows, rng)
+    names = list(MIX)
+    weights = [MIX[name] for name in names]
+    plan = rng.choices(names, weights, k=args.requests)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    limits = httpx.Limits(max_connections=args.clients)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits) as http:
+            clients = [Client(http, rng.randint(1, args.users), random.Random(rng.random())) for _ in range(args.clients)]
+            for client in clients:
+                await client.list_todos()
+            position = 0
+
+            async def worker(client):
+                nonlocal position
+                while position < len(plan):
+                    name = plan[position]
+                    position += 1
+                    started = time.perf_counter()
+                    response = await getattr(client, name)()
+                    latencies[name].append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors[name] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for client in clients))
+            elapsed = time.perf_counter() - started
+
+    overall = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "config": {
+            "users": args.users, "rows": args.rows, "clients": args.clients, "requests": args.requests,
+            "seed": args.seed, "pool_size": get_settings()["pool_size"],
+            "python": platform.python_version(), "database": "sqlite",
+        },
+        "seconds": round(elapsed, 3),
+        "overall": summarize(overall, sum(errors.values()), elapsed),
+        "scenarios": {name: summarize(latencies[name], errors[name], elapsed) for name in names if latencies[name]},
+    }
+
+
+def compare(baseline, current, tolerance, min_requests=100):
+    """Scenarios whose p95 rose, or whose throughput fell, by more than
+    ``tolerance`` percent."""
+    rows = []
+    pairs = [("overall", baseline["overall"], current["overall"])]
+    pairs += [(name, baseline["scenarios"][name], stats) for name, stats in current["scenarios"].items() if name in baseline["scenarios"]]
+    for name, before, after in pairs:
+        if not before.get("requests") or not after.get("requests"):
+            continue
+        p95 = (after["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        throughput = (after["requests_per_sec"] - before["requests_per_sec"]) / before["requests_per_sec"] * 100
+        rows.append({
+            "scenario": name,
+            "p95_ms": [before["p95_ms"], after["p95_ms"]],
+            "p95_change_pct": round(p95, 1),
+            "requests_per_sec": [before["requests_per_sec"], after["requests_per_sec"]],
+            "throughput_change_pct": round(throughput, 1),
+            "regression": (
+                min(before["requests"], after["requests"]) >= min_requests
+                and (p95 > tolerance or throughput < -tolerance)
+            ),
+        })
+    if baseline["config"] != current["config"]:
+        return {"warning": "runs used different settings", "baseline_config": baseline["config"], "scenarios": rows}
+    return {"scenarios": rows}
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(args):
+    if args.compare:
+        report = compare(load(args.compare[0]), load(args.compare[1]), args.tolerance, args.min_requests)
+    else:
+        # The app's lifespan disposes of the engine on the way out.
+        result = asyncio.run(run(args))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+        report = result
+        if args.baseline:
+            report = {**result, "comparison": compare(load(args.baseline), result, args.tolerance, args.min_requests)}
+    print(json.dumps(report, indent=2))
+    comparison = report if args.compare else report.get("comparison")
+    if comparison and any(row["regression"] for row in comparison["scenarios"]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline", help="previous --output to compare this run against")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two saved runs without running")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed change in percent")
+    parser.add_argument("--min-requests", type=int, default=100, help="fewest requests for a scenario to be judged")
+    sys.exit(main(parser.parse_args()))
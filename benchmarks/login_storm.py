@@ -0,0 +1,92 @@
+"""Login throughput and non-auth route latency during a login storm.
+
+Each run fires ``--logins`` concurrent logins while a probe client keeps
+hitting /metrics/db-pool and records its latency. Compare the executors:
+
+    PASSWORD_HASH_EXECUTOR=inline python -m benchmarks.login_storm
+    PASSWORD_HASH_EXECUTOR=thread python -m benchmarks.login_storm
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import benchmarks.env
+
+import httpx
+
+from lib.db.connection import get_engine
+from lib.db.models import Base
+from main import app
+from services.passwords import get_password_hasher
+
+USER = {
+    "firstname": "Bench",
+    "lastname": "User",
+    "email": "bench@example.com",
+    "password": "bench-password",
+    "contactNo": 5550100,
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def main(args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async with get_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await client.post("/auth/register", json=USER)
+
+        done = asyncio.Event()
+        probe_latencies = []
+        statuses = {}
+
+        async def probe():
+            # Latency is measured from the scheduled send time, so a probe
+            # starved by a blocked loop still counts the time it waited.
+            interval = args.probe_interval_ms / 1000
+            scheduled = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+                await client.get("/metrics/db-pool")
+                probe_latencies.append(time.perf_counter() - scheduled)
+                scheduled = max(scheduled + interval, time.perf_counter())
+
+        async def login():
+            response = await client.post(
+                "/auth/login", json={"username": USER["email"], "password": USER["password"]}
+            )
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+    await get_engine().dispose()
+    hasher = get_password_hasher()
+    hasher.shutdown()
+
+    print(json.dumps({
+        "executor": hasher.executor_kind,
+        "workers": hasher.workers,
+        "bcrypt_rounds": hasher.rounds,
+        "logins": args.logins,
+        "login_statuses": statuses,
+        "logins_per_sec": round(statuses.get(200, 0) / elapsed, 1),
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": round(percentile(probe_latencies, 50) * 1000, 2),
+        "probe_p99_ms": round(percentile(probe_latencies, 99) * 1000, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probe-interval-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""Per-request cost of the metrics middleware and engine statement hooks.
+
+Builds the same two-route app twice, with and without MetricsMiddleware
+(and the engine instrumented or not), and times ``--requests`` calls to
+each route through the ASGI interface. The difference in mean latency is
+the instrumentation's cost. Also times rendering /metrics.
+
+    python -m benchmarks.metrics_overhead
+    python -m benchmarks.metrics_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import benchmarks.env
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+
+from benchmarks.asgi import consume
+from lib.db.connection import get_engine, get_session
+from lib.metrics import MetricsMiddleware, instrument_engine, registry, uninstrument_engine
+
+
+def build_app(instrumented):
+    app = FastAPI()
+
+    @app.get("/ping/{item_id}")
+    async def ping(item_id: int):
+        return {"item_id": item_id}
+
+    @app.get("/db")
+    async def db(session=Depends(get_session)):
+        return {"value": (await session.execute(text("SELECT 1"))).scalar()}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def time_route(app, path, requests, rounds):
+    """Mean microseconds per request, best of ``rounds``."""
+    for _ in range(200):
+        await consume(app, path)
+    means = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await consume(app, path)
+        means.append((time.perf_counter() - started) / requests * 1e6)
+    return min(means)
+
+
+async def main(args):
+    bare, instrumented = build_app(False), build_app(True)
+    report = {"requests_per_round": args.requests, "routes": {}}
+    for path in ("/ping/42", "/db"):
+        baseline = await time_route(bare, path, args.requests, args.rounds)
+        listeners = instrument_engine(get_engine(), name="bench")
+        measured = await time_route(instrumented, path, args.requests, args.rounds)
+        uninstrument_engine(get_engine(), listeners)
+        report["routes"][path] = {
+            "bare_us": round(baseline, 1),
+            "instrumented_us": round(measured, 1),
+            "overhead_us": round(measured - baseline, 1),
+            "overhead_pct": round((measured - baseline) / baseline * 100, 1),
+        }
+    samples = []
+    for _ in range(50):
+        started = time.perf_counter()
+        body = registry.render()
+        samples.append(time.perf_counter() - started)
+    report["render"] = {"lines": body.count("\n"), "ms": round(statistics.median(samples) * 1000, 3)}
+    await get_engine().dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""Delivery outbox throughput as the number of worker processes grows.
+
+Each worker is a separate process claiming from the same SQLite file
+(WAL mode). Sends are simulated with ``--send-ms`` of latency, so the
+numbers show how claiming scales rather than provider speed. Every run
+also checks that no delivery was sent twice.
+
+    python -m benchmarks.outbox_workers --workers 1 2 4 8 --deliveries 4000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+
+import benchmarks.env
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert
+
+from lib.db.models import Base, DeliveryChannel, Reminder, ReminderForDelivery, User
+from services.deliveries import DELIVERY_PENDING, DELIVERY_SENT, DeliveryResult
+from services.outbox import CHANNEL_EMAIL, OutboxWorker
+
+
+class FakeSender:
+    def __init__(self, latency):
+        self.latency = latency
+        self.sent = []
+
+    async def send_deliveries(self, delivery_ids):
+        await asyncio.sleep(self.latency)
+        self.sent.extend(delivery_ids)
+        now = datetime.utcnow()
+        return [DeliveryResult(delivery_id, DELIVERY_SENT, sent_at=now) for delivery_id in delivery_ids]
+
+
+def worker_process(worker_id, batch_size, latency, queue):
+    async def work():
+        from lib.db.connection import SessionLocal, get_engine
+        sender = FakeSender(latency)
+        worker = OutboxWorker(SessionLocal, {CHANNEL_EMAIL: sender}, worker_id=worker_id,
+                              batch_size=batch_size, lease=timedelta(seconds=30))
+        while await worker.run_once():
+            pass
+        await get_engine().dispose()
+        return sender.sent
+
+    queue.put(asyncio.run(work()))
+
+
+async def reset(deliveries):
+    from lib.db.connection import SessionLocal, get_engine
+    async with get_engine().begin() as conn:
+        await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as session:
+        if not await session.get(User, 1):
+            session.add(User(user_id=1, name="Bench", email="bench@example.com", password="unused"))
+            session.add(DeliveryChannel(channel_id=1, channel_name=CHANNEL_EMAIL))
+            session.add(Reminder(reminder_id=1, user_id=1, title="bench", reminder_datetime=datetime(2030, 1, 1)))
+        await session.execute(delete(ReminderForDelivery))
+        await session.execute(insert(ReminderForDelivery), [
+            {"reminder_id": 1, "channel_id": 1, "delivery_status": DELIVERY_PENDING}
+            for _ in range(deliveries)
+        ])
+        await session.commit()
+    await get_engine().dispose()
+
+
+def run_level(workers, args):
+    asyncio.run(reset(args.deliveries))
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker_process, args=(f"w{n}", args.batch_size, args.send_ms / 1000, queue))
+        for n in range(workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    sent = Counter()
+    for _ in processes:
+        sent.update(queue.get())
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "sent": sum(sent.values()),
+        "duplicates": sum(count - 1 for count in sent.values() if count > 1),
+        "seconds": round(elapsed, 2),
+        "deliveries_per_sec": round(len(sent) / elapsed, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--deliveries", type=int, default=4000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--send-ms", type=float, default=100)
+    args = parser.parse_args()
+    results = [run_level(workers, args) for workers in args.workers]
+    baseline = results[0]["deliveries_per_sec"] / results[0]["workers"]
+    for result in results:
+        result["scaling_efficiency"] = round(result["deliveries_per_sec"] / (baseline * result["workers"]), 2)
+    print(json.dumps(results, indent=2))
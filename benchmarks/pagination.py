@@ -0,0 +1,128 @@
+"""Page latency by depth for keyset vs OFFSET pagination, and streaming.
+
+Seeds one user with ``--rows`` todos (some undated), then times fetching
+one page at increasing depths with a keyset cursor and with OFFSET. A
+full NDJSON stream of GET /todos is timed too, with its peak Python
+memory.
+
+    python -m benchmarks.pagination
+    python -m benchmarks.pagination --rows 500000 --limit 100
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+import benchmarks.env
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from benchmarks.asgi import consume
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, Todo, User
+from main import app
+from routers.auth import create_access_token
+from routers.todo import Todos
+from services.pagination import encode_cursor, fetch_page
+
+START = datetime(2030, 1, 1)
+
+
+async def seed(rows):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"user_id": 1, "name": "Bench", "email": "bench@example.com", "password": "unused"},
+            {"user_id": 2, "name": "Other", "email": "other@example.com", "password": "unused"},
+        ])
+        rng = random.Random(5)
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "user_id": 1 + (i % 10 == 0),
+                "title": f"Task {i}",
+                "description": "Seeded for pagination",
+                "due_date": None if i % 20 == 0 else START + timedelta(minutes=rng.randrange(10 * 365 * 24 * 60)),
+                "status": "Pending",
+            })
+            if len(batch) == 10000:
+                await conn.execute(insert(Todo), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Todo), batch)
+
+
+def list_query():
+    return select(*(getattr(Todo, field) for field in Todos.model_fields)).where(Todo.user_id == 1)
+
+
+async def timed(coro_factory, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+async def main(args):
+    await seed(args.rows)
+    async with SessionLocal() as session:
+        keys = (await session.execute(
+            select(Todo.due_date, Todo.todo_id).where(Todo.user_id == 1).order_by(Todo.due_date, Todo.todo_id)
+        )).all()
+
+    depths = sorted({0, 1000, 10000, len(keys) // 2, len(keys) - args.limit} & set(range(len(keys))))
+    report = {"rows_for_user": len(keys), "limit": args.limit, "depths": []}
+    async with SessionLocal() as session:
+        for depth in depths:
+            cursor = encode_cursor(*keys[depth - 1]) if depth else None
+
+            async def by_keyset():
+                rows, _ = await fetch_page(session, list_query(), Todo.due_date, Todo.todo_id, cursor, args.limit)
+                assert rows[0].todo_id == keys[depth][1]
+
+            async def by_offset():
+                query = list_query().order_by(Todo.due_date, Todo.todo_id).offset(depth).limit(args.limit + 1)
+                rows = (await session.execute(query)).mappings().all()
+                assert rows[0]["todo_id"] == keys[depth][1]
+
+            report["depths"].append({
+                "depth": depth,
+                "keyset_ms": await timed(by_keyset, args.repeat),
+                "offset_ms": await timed(by_offset, args.repeat),
+            })
+
+    token = create_access_token({"sub": "bench@example.com"}, expires_delta=timedelta(hours=1))
+    auth = [(b"authorization", f"Bearer {token}".encode())]
+    started = time.perf_counter()
+    status, _, _, streamed = await consume(app, "/todos", b"stream=ndjson", auth)
+    elapsed = time.perf_counter() - started
+    assert status == 200, status
+    # Peak memory comes from a second, untimed run: tracemalloc slows
+    # allocation-heavy code several times over.
+    tracemalloc.start()
+    await consume(app, "/todos", b"stream=ndjson", auth)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await get_engine().dispose()
+    report["stream"] = {
+        "rows": streamed,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(streamed / elapsed, 1),
+        "peak_traced_mb": round(peak / 2**20, 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
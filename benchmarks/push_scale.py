@@ -0,0 +1,212 @@
+"""Memory per idle push connection and fan-out latency.
+
+Starts the app under uvicorn in a child process, then opens
+``--connections`` idle Server-Sent Events connections to
+``/push/events`` (spread over ``--users`` users, authenticated with
+``?token=``) from this process over raw sockets. Reports the server's
+resident memory before and after, the cost per connection and what
+that extrapolates to at ``--target`` connections. It then publishes one
+event to every user and times how long each connection takes to
+receive it.
+
+The same run is repeated with ``--ws-connections`` WebSockets on
+``/push/ws`` in a fresh server, without permessage-deflate unless
+``--ws-deflate`` is given. Client and server share the machine, so
+the latencies include the client's own time reading the sockets; the
+open-file limit caps how many connections each side can hold.
+
+    python -m benchmarks.push_scale
+    python -m benchmarks.push_scale --connections 20000 --ws-connections 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.env import email, users as seed_users
+
+DATA = re.compile(rb"data: (\{.*?\})\n")
+
+
+def seed(users):
+    from sqlalchemy import create_engine, insert
+
+    from lib.db.models import Base, User
+
+    engine = create_engine(os.environ["MYSQL_URL"])
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        conn.execute(insert(User), seed_users(users))
+    engine.dispose()
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmRSS not found")
+
+
+async def serve(args):
+    """Runs in the child: the app, plus a stdin loop that publishes one
+    event per user on ``publish``."""
+    import uvicorn
+
+    from main import create_app
+    from services.push import get_push_hub
+
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(), host="127.0.0.1", port=args.port, log_level="warning", backlog=4096, ws=args.ws,
+        ws_per_message_deflate=args.ws_deflate,
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    print("ready", flush=True)
+    loop = asyncio.get_running_loop()
+    while (command := (await loop.run_in_executor(None, sys.stdin.readline)).strip()) not in ("", "quit"):
+        if command == "publish":
+            hub = get_push_hub()
+            started = time.perf_counter()
+            sent = time.time()
+            for user_id in range(1, args.users + 1):
+                await hub.publish(user_id, {"type": "bench", "sent": sent})
+            print(json.dumps({"publish_ms": round((time.perf_counter() - started) * 1000, 1), **hub.stats()}), flush=True)
+    # Streams outlive a graceful shutdown; end them first.
+    await get_push_hub().stop()
+    server.should_exit = True
+    await serving
+
+
+async def open_sse(port, token):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /push/events?token={token} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    if not head.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(head.split(b"\r\n", 1)[0].decode())
+    await reader.readuntil(b"\n\n")  # the retry: line
+    return reader, writer
+
+
+async def sse_event(connection):
+    reader, _ = connection
+    while True:
+        match = DATA.search(await reader.readuntil(b"\n\n"))
+        if match:
+            return time.time() - json.loads(match.group(1))["sent"]
+
+
+async def open_ws(port, token):
+    from websockets.asyncio.client import connect
+
+    return await connect(f"ws://127.0.0.1:{port}/push/ws?token={token}", ping_interval=None, max_queue=4)
+
+
+async def ws_event(connection):
+    return time.time() - json.loads(await connection.recv())["sent"]
+
+
+async def close(connection):
+    if isinstance(connection, tuple):
+        connection[1].close()
+    else:
+        await connection.close()
+
+
+async def measure(args, protocol, count):
+    from routers.auth import create_access_token
+
+    opener, receive = (open_sse, sse_event) if protocol == "sse" else (open_ws, ws_event)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, "-m", "benchmarks.push_scale", "--serve", "--port", str(port), "--users", str(args.users), "--ws", args.ws]
+    if args.ws_deflate:
+        command.append("--ws-deflate")
+    child = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert child.stdout.readline().strip() == "ready"
+        tokens = [create_access_token({"sub": email(i)}, None) for i in range(1, args.users + 1)]
+        # One connection first, so lazily imported code is not counted
+        # against the connections.
+        await close(await opener(port, tokens[0]))
+        await asyncio.sleep(0.5)
+        baseline = rss_mb(child.pid)
+
+        connections = []
+        started = time.perf_counter()
+        for start in range(0, count, args.batch):
+            connections += await asyncio.gather(*(
+                opener(port, tokens[n % args.users]) for n in range(start, min(start + args.batch, count))
+            ))
+        connect_seconds = time.perf_counter() - started
+        await asyncio.sleep(args.idle)
+        loaded = rss_mb(child.pid)
+
+        receivers = [asyncio.create_task(receive(connection)) for connection in connections]
+        child.stdin.write("publish\n")
+        child.stdin.flush()
+        latencies = sorted(await asyncio.gather(*receivers))
+        published = json.loads(child.stdout.readline())
+        for connection in connections:
+            await close(connection)
+        child.stdin.write("quit\n")
+        child.stdin.flush()
+        child.wait(timeout=30)
+    finally:
+        if child.poll() is None:
+            child.kill()
+
+    per_connection_kb = (loaded - baseline) * 1024 / count
+    return {
+        "connections": count,
+        "connect_s": round(connect_seconds, 1),
+        "server_rss_mb": {"baseline": round(baseline, 1), "loaded": round(loaded, 1)},
+        "kb_per_connection": round(per_connection_kb, 1),
+        f"projected_mb_at_{args.target}": round(baseline + per_connection_kb * args.target / 1024),
+        "fanout": {
+            **published,
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1),
+        },
+    }
+
+
+async def main(args):
+    seed(args.users)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    report = {"open_file_limit": hard, "sse": await measure(args, "sse", args.connections)}
+    if args.ws_connections:
+        report["websocket"] = await measure(args, "ws", args.ws_connections)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--ws-connections", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--target", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--idle", type=float, default=2.0)
+    parser.add_argument("--ws", default="auto", help="uvicorn WebSocket implementation")
+    parser.add_argument("--ws-deflate", action="store_true", help="negotiate permessage-deflate, as uvicorn does by default")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        asyncio.run(serve(args))
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,164 @@
+"""Storage and query time of recurrence rules vs materialized occurrences.
+
+Gives ``--users`` users the same handful of recurring reminders twice,
+each in its own SQLite database: once as one row per occurrence over
+``--days`` (the only option before recurrence rules), and once as one
+row per rule whose ``reminder_datetime`` is the next occurrence. Reports
+table rows, database size, and timings for the scheduler's "due next"
+query and a user's month view starting within ``--view-days``.
+
+Rules are expanded from their next occurrence, so month views further
+out cost more to expand; try ``--view-days 335`` for the far end.
+
+    python -m benchmarks.recurrence
+    python -m benchmarks.recurrence --users 500 --days 365 --view-days 335
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from benchmarks.env import BENCH_DIR, email, users as seed_users
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, Reminder, User
+from lib.responses import FastJSONResponse, records
+from routers.remdinder import reminder_occurrences
+from services.recurrence import occurrences
+from services.scheduler import REMINDER_PENDING
+from services.token_cache import AuthenticatedUser
+
+START = datetime(2030, 1, 1)
+
+RULES = [
+    ("Stand-up", "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR;BYHOUR=9;BYMINUTE=0;BYSECOND=0"),
+    ("Pills", "FREQ=DAILY;BYHOUR=8,20;BYMINUTE=0;BYSECOND=0"),
+    ("Timesheet", "FREQ=WEEKLY;BYDAY=FR;BYHOUR=16;BYMINUTE=30;BYSECOND=0"),
+    ("Rent", "FREQ=MONTHLY;BYMONTHDAY=1;BYHOUR=10;BYMINUTE=0;BYSECOND=0"),
+    ("Stretch", "FREQ=HOURLY;BYDAY=MO,TU,WE,TH,FR;BYHOUR=10,11,12,13,14,15,16;BYMINUTE=0;BYSECOND=0"),
+]
+
+
+def timings(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1] * 1000, 3),
+    }
+
+
+async def seed(engine, users, rows):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), seed_users(users))
+        for offset in range(0, len(rows), 5000):
+            await conn.execute(insert(Reminder), rows[offset:offset + 5000])
+    async with engine.connect() as conn:
+        await conn.execute(text("VACUUM"))
+        count = (await conn.execute(select(func.count()).select_from(Reminder))).scalar()
+        pages = (await conn.execute(text("PRAGMA page_count"))).scalar()
+        page_size = (await conn.execute(text("PRAGMA page_size"))).scalar()
+    return {"reminder_rows": count, "db_mb": round(pages * page_size / 2**20, 2)}
+
+
+def rule_rows(users):
+    return [
+        {
+            "user_id": user_id,
+            "title": title,
+            "reminder_datetime": next(occurrences(rule, START, START, datetime.max)),
+            "status": REMINDER_PENDING,
+            "recurrence_rule": rule,
+            "recurrence_start": START,
+        }
+        for user_id in range(1, users + 1)
+        for title, rule in RULES
+    ]
+
+
+def materialized_rows(users, days):
+    until = START + timedelta(days=days)
+    per_user = [
+        (title, at) for title, rule in RULES for at in occurrences(rule, START, START, until)
+    ]
+    return [
+        {"user_id": user_id, "title": title, "reminder_datetime": at, "status": REMINDER_PENDING}
+        for user_id in range(1, users + 1)
+        for title, at in per_user
+    ]
+
+
+async def due_next(session_factory, now, limit=500):
+    async with session_factory() as session:
+        return (await session.execute(
+            select(Reminder.reminder_id, Reminder.user_id, Reminder.reminder_datetime)
+            .where(Reminder.status == REMINDER_PENDING, Reminder.reminder_datetime >= now)
+            .order_by(Reminder.reminder_datetime, Reminder.reminder_id)
+            .limit(limit)
+        )).all()
+
+
+async def month_materialized(session_factory, user_id, start, end):
+    """Encoded as the occurrences endpoint encodes its response."""
+    async with session_factory() as session:
+        return FastJSONResponse(records((await session.execute(
+            select(Reminder.reminder_id, Reminder.title, Reminder.reminder_datetime)
+            .where(Reminder.user_id == user_id, Reminder.reminder_datetime >= start, Reminder.reminder_datetime < end)
+            .order_by(Reminder.reminder_datetime, Reminder.reminder_id)
+        )).all()))
+
+
+async def month_rules(session_factory, user_id, start, end):
+    user = AuthenticatedUser(user_id, email(user_id), f"User {user_id}")
+    async with session_factory() as session:
+        return await reminder_occurrences(start, end, current_user=user, db=session)
+
+
+async def measure(session_factory, month_view, users, view_days, samples):
+    rng = random.Random(3)
+    due, month, sizes = [], [], []
+    for _ in range(samples):
+        now = START + timedelta(minutes=rng.randrange(60 * 24 * 7))
+        started = time.perf_counter()
+        await due_next(session_factory, now)
+        due.append(time.perf_counter() - started)
+
+        start = START + timedelta(days=rng.randrange(view_days))
+        started = time.perf_counter()
+        response = await month_view(session_factory, rng.randint(1, users), start, start + timedelta(days=30))
+        month.append(time.perf_counter() - started)
+        sizes.append(len(json.loads(response.body)))
+    return {"due_next": timings(due), "month_view": timings(month), "mean_month_rows": round(statistics.mean(sizes), 1)}
+
+
+async def main(args):
+    materialized_engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(BENCH_DIR, 'materialized.db')}")
+    materialized_factory = async_sessionmaker(materialized_engine, expire_on_commit=False)
+
+    report = {"users": args.users, "rules_per_user": len(RULES), "days": args.days, "view_days": args.view_days}
+    report["rules"] = await seed(get_engine(), args.users, rule_rows(args.users))
+    report["materialized"] = await seed(materialized_engine, args.users, materialized_rows(args.users, args.days))
+    # Only the next occurrence of each rule is stored, so "due next" over
+    # the rule table looks at one row per rule; that is the point.
+    report["rules"].update(await measure(SessionLocal, month_rules, args.users, args.view_days, args.samples))
+    report["materialized"].update(await measure(materialized_factory, month_materialized, args.users, args.view_days, args.samples))
+    await get_engine().dispose()
+    await materialized_engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--view-days", type=int, default=60)
+    parser.add_argument("--samples", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
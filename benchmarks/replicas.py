@@ -0,0 +1,180 @@
+"""Primary load with and without read replicas.
+
+Seeds a primary SQLite file and copies it to two replica files, then
+runs the same read-heavy request mix through the app three times, each
+in a fresh interpreter:
+
+- primary: no replicas configured, every statement hits the primary;
+- replicas: ``MYSQL_REPLICA_URLS`` names both copies;
+- failover: one copy plus a replica that cannot be opened, which must
+  be marked down without failing a request.
+
+The copies are not replicated to, so after its own write a client can
+only see that write if its next read was pinned to the primary; each
+run checks that read-your-writes holds. Reports statements per engine,
+the primary's share, errors and latency.
+
+    python -m benchmarks.replicas
+    python -m benchmarks.replicas --requests 4000 --clients 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.env import BENCH_DIR, DB_PATH, email, users as seed_users
+REPLICA_PATHS = [os.path.join(BENCH_DIR, f"replica{i}.db") for i in (1, 2)]
+MISSING_REPLICA = os.path.join(BENCH_DIR, "missing", "replica.db")
+
+START = "2030-01-01T00:00:00"
+MODES = {
+    "primary": [],
+    "replicas": REPLICA_PATHS,
+    "failover": [REPLICA_PATHS[0], MISSING_REPLICA],
+}
+
+# (weight, method, path, query); POST bodies are built per request.
+MIX = [
+    (40, "GET", "/todos", {"limit": 50}),
+    (20, "GET", "/reminders", {"limit": 50}),
+    (15, "GET", "/reminders/occurrences", {"start": START, "end": "2030-02-01T00:00:00"}),
+    (15, "GET", "/calendars/events", {"start": START, "end": "2030-02-01T00:00:00"}),
+    (10, "POST", "/todos", None),
+]
+
+
+def seed(users, rows):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import create_engine, insert
+
+    from lib.db.models import Base, Calendar, CalendarEvent, Reminder, Todo, User
+
+    start = datetime(2030, 1, 1)
+    engine = create_engine(os.environ["MYSQL_URL"])
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        conn.execute(insert(User), seed_users(users))
+        conn.execute(insert(Calendar), [{"calendar_id": i, "user_id": i, "calendar_name": "Home"} for i in range(1, users + 1)])
+        for user_id in range(1, users + 1):
+            conn.execute(insert(Todo), [
+                {"user_id": user_id, "title": f"todo {n}", "due_date": start + timedelta(hours=n), "status": "Pending"}
+                for n in range(rows)
+            ])
+            conn.execute(insert(Reminder), [
+                {"user_id": user_id, "title": f"reminder {n}", "reminder_datetime": start + timedelta(hours=n)} for n in range(rows)
+            ])
+            conn.execute(insert(CalendarEvent), [
+                {
+                    "calendar_id": user_id, "title": f"event {n}", "start_datetime": start + timedelta(hours=n),
+                    "end_datetime": start + timedelta(hours=n + 1),
+                }
+                for n in range(rows)
+            ])
+    engine.dispose()
+
+
+async def run(args):
+    """Runs in the child interpreter, configured by the environment."""
+    import httpx
+    from sqlalchemy import event
+
+    from lib.db.connection import get_engine, get_replicas
+    from main import app
+    from routers.auth import create_access_token
+
+    rng = random.Random(args.seed)
+    weights = [weight for weight, *_ in MIX]
+    statements = {}
+    latencies = []
+    errors = 0
+
+    async with app.router.lifespan_context(app):
+        engines = {"primary": get_engine(), **dict(zip(get_replicas().names.values(), get_replicas().engines))}
+        for name, engine in engines.items():
+            statements[name] = 0
+            event.listen(engine.sync_engine, "after_cursor_execute", lambda *_, name=name: statements.__setitem__(name, statements[name] + 1))
+        headers = {i: {"Authorization": f"Bearer {create_access_token({'sub': email(i)}, None)}"} for i in range(1, args.users + 1)}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for user_id in headers:
+                await client.get("/todos", params={"limit": 1}, headers=headers[user_id])
+            for name in statements:
+                statements[name] = 0
+
+            remaining = iter(range(args.requests))
+
+            async def worker():
+                nonlocal errors
+                for n in remaining:
+                    _, method, path, query = rng.choices(MIX, weights)[0]
+                    user_headers = headers[rng.randint(1, args.users)]
+                    started = time.perf_counter()
+                    if method == "POST":
+                        response = await client.post(path, json={"title": f"new {n}", "description": "", "due_date": "2031-01-01T00:00:00"}, headers=user_headers)
+                    else:
+                        response = await client.get(path, params=query, headers=user_headers)
+                    latencies.append(time.perf_counter() - started)
+                    errors += response.status_code >= 400
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.clients)))
+            seconds = time.perf_counter() - started
+
+            # Read-your-writes: a fresh write must show up in the next read.
+            writer = headers[1]
+            created = (await client.post("/todos", json={"title": "read-your-writes", "description": "", "due_date": "2020-01-01T00:00:00"}, headers=writer)).json()
+            listed = (await client.get("/todos", params={"limit": 5}, headers=writer)).json()["items"]
+            read_your_writes = any(item["todo_id"] == created["todo_id"] for item in listed)
+        replica_stats = get_replicas().stats()
+
+    latencies.sort()
+    total = sum(statements.values())
+    return {
+        "requests": args.requests,
+        "errors": errors,
+        "throughput_rps": round(args.requests / seconds, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "statements": statements,
+        "primary_share": round(statements["primary"] / total, 3) if total else 0.0,
+        "replicas": replica_stats,
+        "read_your_writes": read_your_writes,
+    }
+
+
+def main(args):
+    if args.child:
+        print(json.dumps(asyncio.run(run(args))))
+        return
+    seed(args.users, args.rows)
+    for path in REPLICA_PATHS:
+        shutil.copyfile(DB_PATH, path)
+    report = {}
+    for mode, paths in MODES.items():
+        env = dict(os.environ, MYSQL_REPLICA_URLS=",".join(f"sqlite:///{path}" for path in paths))
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.replicas", "--child", *sys.argv[1:]],
+            env=env, stdout=subprocess.PIPE, text=True, check=True,
+        )
+        report[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+    primary = report["primary"]["statements"]["primary"]
+    report["primary_statements_saved_pct"] = round((1 - report["replicas"]["statements"]["primary"] / primary) * 100, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    main(parser.parse_args())
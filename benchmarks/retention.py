@@ -0,0 +1,153 @@
+"""Hot-table size and delivery write latency before, during and after archival.
+
+Seeds ``--logs`` reminder logs and ``--deliveries`` sent or failed
+deliveries spread evenly over the last ``--months`` months, then:
+
+- before: times ``--samples`` enqueue-style inserts of pending
+  deliveries (one short transaction each) against the full tables;
+- during: the same inserts, for as long as ``services.retention`` archives
+  everything older than ``--days`` in batches of ``--batch-size``;
+- after: the same inserts against the trimmed tables.
+
+Reports hot-table row counts, the database file size (after VACUUM),
+the archive's size on disk and the time to read one reminder's history
+back out of the archive.
+
+    python -m benchmarks.retention
+    python -m benchmarks.retention --deliveries 500000 --batch-size 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.env import BENCH_DIR, DB_PATH, users
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, text
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, DeliveryChannel, Reminder, ReminderForDelivery, ReminderLog, User
+from services.deliveries import DELIVERY_FAILED, DELIVERY_PENDING, DELIVERY_SENT
+from services.retention import SPECS, archive_table, archived_rows
+
+REMINDERS = 1000
+NOW = datetime.utcnow()
+
+
+async def seed(logs, deliveries, months):
+    span = timedelta(days=30 * months)
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), users(1))
+        await conn.execute(insert(DeliveryChannel), [{"channel_id": 1, "channel_name": "email", "is_active": True}])
+        await conn.execute(insert(Reminder), [
+            {"reminder_id": i + 1, "user_id": 1, "title": f"reminder {i}", "reminder_datetime": NOW} for i in range(REMINDERS)
+        ])
+        for start in range(0, logs, 10000):
+            await conn.execute(insert(ReminderLog), [
+                {
+                    "reminder_id": i % REMINDERS + 1,
+                    "original_text": f"Reminder {i}: pay the electricity bill",
+                    "ai_generated_text": f"Friendly reminder: pay the electricity bill ({i})",
+                    "created_at": NOW - span + span * i / logs,
+                }
+                for i in range(start, min(start + 10000, logs))
+            ])
+        for start in range(0, deliveries, 10000):
+            rows = []
+            for i in range(start, min(start + 10000, deliveries)):
+                created = NOW - span + span * i / deliveries
+                rows.append({
+                    "reminder_id": i % REMINDERS + 1,
+                    "channel_id": 1,
+                    "delivery_status": DELIVERY_FAILED if i % 50 == 0 else DELIVERY_SENT,
+                    "created_at": created,
+                    "sent_at": created + timedelta(seconds=5),
+                    "attempts": 1,
+                })
+            await conn.execute(insert(ReminderForDelivery), rows)
+
+
+async def sizes():
+    async with get_engine().connect() as conn:
+        counts = {
+            name: await conn.scalar(select(func.count()).select_from(spec.table)) for name, spec in SPECS.items()
+        }
+        await conn.execute(text("VACUUM"))
+    return {"hot_rows": counts, "db_mb": round(os.path.getsize(DB_PATH) / 2**20, 1)}
+
+
+async def insert_latencies(samples, interval, until=None):
+    """Enqueue latencies over ``samples`` inserts, or for as long as
+    ``until`` is running when given."""
+    latencies = []
+    i = 0
+    while (until is None and i < samples) or (until is not None and not until.done()):
+        i += 1
+        started = time.perf_counter()
+        async with SessionLocal() as session:
+            await session.execute(insert(ReminderForDelivery), [
+                {"reminder_id": (i + n) % REMINDERS + 1, "channel_id": 1, "delivery_status": DELIVERY_PENDING} for n in range(10)
+            ])
+            await session.commit()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def directory_mb(path):
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return round(total / 2**20, 1)
+
+
+async def main(args):
+    await seed(args.logs, args.deliveries, args.months)
+    archive_dir = os.path.join(BENCH_DIR, "archive")
+    cutoff = NOW - timedelta(days=args.days)
+    report = {"before": {**await sizes(), "insert": await insert_latencies(args.samples, 0.005)}}
+
+    async def archive():
+        started = time.perf_counter()
+        archived = {
+            name: await archive_table(SessionLocal, spec, cutoff, archive_dir, args.batch_size, args.pause)
+            for name, spec in SPECS.items()
+        }
+        return archived, time.perf_counter() - started
+
+    job = asyncio.create_task(archive())
+    during = await insert_latencies(args.samples, 0.005, until=job)
+    archived, seconds = await job
+    report["during"] = {"insert": during}
+    report["archival"] = {"archived": archived, "seconds": round(seconds, 2), "archive_mb": directory_mb(archive_dir)}
+    report["after"] = {**await sizes(), "insert": await insert_latencies(args.samples, 0.005)}
+
+    started = time.perf_counter()
+    history = await archived_rows(archive_dir, ReminderForDelivery.__tablename__, NOW - timedelta(days=args.days + 90), cutoff, 1)
+    report["archived_history_read"] = {
+        "window_days": 90,
+        "rows": len(history),
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    await get_engine().dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=int, default=200000)
+    parser.add_argument("--deliveries", type=int, default=200000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.05)
+    parser.add_argument("--samples", type=int, default=300)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""Firing skew of the reminder scheduler with 100k+ pending reminders.
+
+Reminders are spread over ``--span-minutes`` of virtual time in a
+temporary SQLite database. A fast-forward clock skips the idle sleeps but
+lets real processing time pass, so the reported skew is what the loading,
+heap and dispatch work would cost on a real clock.
+
+    python -m benchmarks.scheduler --reminders 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import benchmarks.env
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, Reminder, User
+from services.scheduler import REMINDER_PENDING, ReminderScheduler
+
+
+class FastForwardClock:
+    def __init__(self, start):
+        self.start = start
+        self.offset = 0.0
+        self.started = time.perf_counter()
+
+    def now(self):
+        return self.start + timedelta(seconds=self.offset + time.perf_counter() - self.started)
+
+    async def sleep(self, seconds, wakeup):
+        if not wakeup.is_set():
+            self.offset += max(seconds, 0)
+        await asyncio.sleep(0)
+
+
+async def seed(count, start, span):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as session:
+        session.add(User(user_id=1, name="Bench", email="bench@example.com", password="unused"))
+        await session.commit()
+        rng = random.Random(42)
+        rows = [
+            {
+                "user_id": 1,
+                "title": f"reminder {i}",
+                "reminder_datetime": start + timedelta(seconds=rng.uniform(0, span.total_seconds())),
+                "status": REMINDER_PENDING,
+            }
+            for i in range(count)
+        ]
+        for offset in range(0, count, 10000):
+            await session.execute(insert(Reminder), rows[offset:offset + 10000])
+        await session.commit()
+
+
+async def main(args):
+    start = datetime(2030, 1, 1)
+    span = timedelta(minutes=args.span_minutes)
+    await seed(args.reminders, start, span)
+
+    clock = FastForwardClock(start)
+    skews = []
+    batches = 0
+
+    async def deliver(session, batch):
+        nonlocal batches
+        batches += 1
+        now = clock.now()
+        skews.extend((now - due.due_at).total_seconds() for due in batch)
+        if len(skews) >= args.reminders:
+            scheduler.stop()
+
+    scheduler = ReminderScheduler(
+        SessionLocal, deliver, clock=clock,
+        window=timedelta(minutes=args.window_minutes), batch_size=args.batch_size,
+        linger=timedelta(milliseconds=args.linger_ms),
+    )
+    started = time.perf_counter()
+    await scheduler.run()
+    elapsed = time.perf_counter() - started
+    await get_engine().dispose()
+
+    skews.sort()
+    print(json.dumps({
+        "reminders": args.reminders,
+        "fired": scheduler.fired,
+        "batches": batches,
+        "wall_seconds": round(elapsed, 2),
+        "skew_p50_ms": round(skews[len(skews) // 2] * 1000, 2),
+        "skew_p99_ms": round(skews[int(len(skews) * 0.99)] * 1000, 2),
+        "skew_max_ms": round(skews[-1] * 1000, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reminders", type=int, default=100000)
+    parser.add_argument("--span-minutes", type=float, default=60)
+    parser.add_argument("--window-minutes", type=float, default=15)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--linger-ms", type=float, default=50)
+    asyncio.run(main(parser.parse_args()))
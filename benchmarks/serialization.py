@@ -0,0 +1,130 @@
+"""Serialization time and bytes for 1k-item list responses.
+
+Seeds ``--items`` todos, reminders and calendar events for one user and
+reads them back with each list endpoint's own select. Each list is then
+encoded ``--repeat`` times:
+
+- pydantic: validating the row mappings against the endpoint's response
+  model and dumping it, as FastAPI does for a ``response_model`` route;
+- jsonable_encoder: Starlette's ``JSONResponse`` over
+  ``jsonable_encoder``, as for a route without one;
+- fast: ``FastJSONResponse`` over ``records()`` of the row tuples, with
+  orjson, and with the standard-library fallback.
+
+Also reports response bytes, next to the bytes of the same rows with
+every table column, as returning whole ORM rows would send.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --items 5000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.env import users
+
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+import lib.responses
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, Calendar, CalendarEvent, Reminder, Todo, User
+from lib.responses import FastJSONResponse, records
+from routers.calendar import EventOut
+from routers.remdinder import Reminders
+from routers.todo import Todos
+
+START = datetime(2030, 1, 1, 9, 30)
+LISTS = {"todos": (Todo, Todos), "reminders": (Reminder, Reminders), "events": (CalendarEvent, EventOut)}
+
+
+async def seed(items):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), users(1))
+        await conn.execute(insert(Calendar), [{"calendar_id": 1, "user_id": 1, "calendar_name": "Home"}])
+        await conn.execute(insert(Todo), [
+            {
+                "user_id": 1, "title": f"Todo {n}", "description": "Pick up the dry cleaning before six",
+                "due_date": START + timedelta(hours=n), "status": "Pending",
+            }
+            for n in range(items)
+        ])
+        await conn.execute(insert(Reminder), [
+            {
+                "user_id": 1, "title": f"Reminder {n}", "description": "Pay the electricity bill",
+                "reminder_datetime": START + timedelta(hours=n), "priority": "medium",
+                "recurrence_rule": "FREQ=MONTHLY" if n % 10 == 0 else None,
+            }
+            for n in range(items)
+        ])
+        await conn.execute(insert(CalendarEvent), [
+            {
+                "calendar_id": 1, "title": f"Event {n}", "description": "Weekly sync",
+                "start_datetime": START + timedelta(hours=n), "end_datetime": START + timedelta(hours=n, minutes=45),
+            }
+            for n in range(items)
+        ])
+
+
+def timed(encode, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 2), body
+
+
+async def measure(table, schema, args):
+    async with SessionLocal() as session:
+        rows = (await session.execute(select(*(getattr(table, field) for field in schema.model_fields)))).all()
+        full = (await session.execute(select(*table.__table__.columns))).all()
+    adapter = TypeAdapter(List[schema])
+    mappings = [row._mapping for row in rows]
+
+    def fast_stdlib():
+        orjson, lib.responses.orjson = lib.responses.orjson, None
+        try:
+            return FastJSONResponse(records(rows)).body
+        finally:
+            lib.responses.orjson = orjson
+
+    encoders = {
+        "pydantic": lambda: adapter.dump_json(adapter.validate_python(mappings)),
+        "jsonable_encoder": lambda: JSONResponse(jsonable_encoder([dict(mapping) for mapping in mappings])).body,
+        "fast": lambda: FastJSONResponse(records(rows)).body,
+        "fast_stdlib": fast_stdlib,
+    }
+    report = {"items": len(rows), "ms": {}}
+    bodies = {}
+    for name, encode in encoders.items():
+        report["ms"][name], bodies[name] = timed(encode, args.repeat)
+    assert json.loads(bodies["fast"]) == json.loads(bodies["pydantic"]) == json.loads(bodies["fast_stdlib"])
+    report["speedup_vs_pydantic"] = round(report["ms"]["pydantic"] / report["ms"]["fast"], 1)
+    report["bytes"] = len(bodies["fast"])
+    report["all_columns_bytes"] = len(FastJSONResponse(records(full)).body)
+    return report
+
+
+async def main(args):
+    await seed(args.items)
+    report = {"orjson": lib.responses.orjson is not None}
+    for name, (table, schema) in LISTS.items():
+        report[name] = await measure(table, schema, args)
+    await get_engine().dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+"""Database statements per 10k deliveries with and without the delivery
+settings cache.
+
+Runs the database side of the delivery pipeline for ``--deliveries``
+reminders owned by ``--users`` users: enqueueing outbox rows in
+scheduler-sized batches, then loading each batch for the SMTP and
+WhatsApp senders (no messages are sent). Each pass counts the SQL
+statements executed, once with a cold cache that then warms up and
+once with caching disabled. A last pass fires ``--stampede`` concurrent
+lookups at one cold key to show they share a single load.
+
+    python -m benchmarks.settings_cache
+    python -m benchmarks.settings_cache --users 2000 --deliveries 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.env import users as seed_users
+
+from datetime import datetime
+
+from sqlalchemy import delete, event, insert, select
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import (
+    Base,
+    DeliveryChannel,
+    Reminder,
+    ReminderForDelivery,
+    SmtpShipping,
+    User,
+    WhatsappSettings,
+)
+from services.outbox import CHANNEL_EMAIL, CHANNEL_WHATSAPP, enqueue
+from services.scheduler import DueReminder
+from services.settings_cache import DeliverySettingsCache
+from services.smtp_delivery import SmtpDeliveryEngine
+from services.whatsapp_delivery import WhatsappDeliveryClient
+
+START = datetime(2030, 1, 1)
+
+
+async def seed(users, deliveries):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(DeliveryChannel), [
+            {"channel_id": 1, "channel_name": CHANNEL_EMAIL, "is_active": True},
+            {"channel_id": 2, "channel_name": CHANNEL_WHATSAPP, "is_active": True},
+        ])
+        await conn.execute(insert(User), seed_users(users, phone_numbers=True))
+        await conn.execute(insert(SmtpShipping), [
+            {"user_id": i, "smtp_server": "smtp.example.com", "port": 587, "username": f"user{i}", "password_hash": "secret", "is_active": True}
+            for i in range(1, users + 1)
+        ])
+        await conn.execute(insert(WhatsappSettings), [
+            {"user_id": i, "api_key": "key", "phone_number_id": f"pn{i}", "is_active": True}
+            for i in range(1, users + 1) if i % 2
+        ])
+        await conn.execute(insert(Reminder), [
+            {"reminder_id": i, "user_id": 1 + i % users, "title": f"Reminder {i}", "reminder_datetime": START, "status": "queued"}
+            for i in range(1, deliveries + 1)
+        ])
+
+
+async def run_pipeline(cache, users, deliveries, batch_size):
+    async with SessionLocal() as session:
+        await session.execute(delete(ReminderForDelivery))
+        await session.commit()
+    smtp = SmtpDeliveryEngine(SessionLocal, settings_cache=cache)
+    whatsapp = WhatsappDeliveryClient(SessionLocal, base_url="http://unused", settings_cache=cache)
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(get_engine().sync_engine, "before_cursor_execute", listener)
+    started = time.perf_counter()
+    for offset in range(1, deliveries + 1, batch_size):
+        batch = [
+            DueReminder(reminder_id, 1 + reminder_id % users, START)
+            for reminder_id in range(offset, min(offset + batch_size, deliveries + 1))
+        ]
+        async with SessionLocal() as session:
+            await enqueue(session, batch, settings_cache=cache)
+            await session.commit()
+    enqueue_statements = len(statements)
+    async with SessionLocal() as session:
+        rows = (await session.execute(
+            select(ReminderForDelivery.delivery_id, ReminderForDelivery.channel_id).order_by(ReminderForDelivery.delivery_id)
+        )).all()
+    del statements[enqueue_statements:]
+    by_channel = {1: [], 2: []}
+    for delivery_id, channel_id in rows:
+        by_channel[channel_id].append(delivery_id)
+    for sender, delivery_ids in ((smtp, by_channel[1]), (whatsapp, by_channel[2])):
+        for offset in range(0, len(delivery_ids), batch_size):
+            await sender._load(delivery_ids[offset:offset + batch_size])
+    elapsed = time.perf_counter() - started
+    event.remove(get_engine().sync_engine, "before_cursor_execute", listener)
+    await smtp.close()
+    await whatsapp.close()
+    settings_statements = sum(
+        1 for statement in statements
+        if "FROM smtp_settings" in statement or "FROM whatsapp_settings" in statement or "FROM delivery_channels" in statement
+    )
+    return {
+        "delivery_rows": len(rows),
+        "statements": len(statements),
+        "settings_statements": settings_statements,
+        "statements_per_10k_deliveries": round(len(statements) / len(rows) * 10000, 1),
+        "seconds": round(elapsed, 2),
+        "enqueue_statements": enqueue_statements,
+        "cache": cache.stats(),
+    }
+
+
+async def stampede(concurrency):
+    cache = DeliverySettingsCache()
+    async with SessionLocal() as session:
+        await asyncio.gather(*(cache.smtp_settings(session, [1]) for _ in range(concurrency)))
+    return cache.stats()
+
+
+async def main(args):
+    await seed(args.users, args.deliveries)
+    report = {"users": args.users, "reminders": args.deliveries, "batch_size": args.batch_size}
+    report["cached"] = await run_pipeline(DeliverySettingsCache(), args.users, args.deliveries, args.batch_size)
+    report["uncached"] = await run_pipeline(DeliverySettingsCache(max_size=0), args.users, args.deliveries, args.batch_size)
+    report["stampede"] = await stampede(args.stampede)
+    await get_engine().dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--deliveries", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--stampede", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""SMTP delivery throughput against a local aiosmtpd server.
+
+Compares the pooled engine with connect-per-message by setting
+``max_messages=1`` on the pool.
+
+    python -m benchmarks.smtp_delivery --messages 2000 --users 20
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+from benchmarks.env import email, users as seed_users
+
+from datetime import datetime
+
+from aiosmtpd.controller import Controller
+from sqlalchemy import insert, update
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, DeliveryChannel, Reminder, ReminderForDelivery, SmtpShipping, User
+from services.deliveries import DELIVERY_PENDING
+from services.smtp_delivery import SmtpConnectionPool, SmtpDeliveryEngine
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+async def seed(users, messages, port):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as session:
+        session.add(DeliveryChannel(channel_id=1, channel_name="email"))
+        await session.execute(insert(User), seed_users(users))
+        await session.execute(insert(SmtpShipping), [
+            {"user_id": u, "smtp_server": "127.0.0.1", "port": port, "username": email(u),
+             "password_hash": "", "is_active": True}
+            for u in range(1, users + 1)
+        ])
+        await session.execute(insert(Reminder), [
+            {"reminder_id": i, "user_id": i % users + 1, "title": f"Reminder {i}",
+             "description": "Benchmark reminder", "reminder_datetime": datetime(2030, 1, 1)}
+            for i in range(1, messages + 1)
+        ])
+        await session.execute(insert(ReminderForDelivery), [
+            {"delivery_id": i, "reminder_id": i, "channel_id": 1, "delivery_status": DELIVERY_PENDING}
+            for i in range(1, messages + 1)
+        ])
+        await session.commit()
+
+
+async def run(label, pool, messages, batch_size):
+    async with SessionLocal() as session:
+        await session.execute(update(ReminderForDelivery).values(delivery_status=DELIVERY_PENDING, sent_at=None))
+        await session.commit()
+    engine = SmtpDeliveryEngine(SessionLocal, pool)
+    sent = 0
+    started = time.perf_counter()
+    for offset in range(1, messages + 1, batch_size):
+        results = await engine.deliver(list(range(offset, min(offset + batch_size, messages + 1))))
+        sent += sum(result.status == "sent" for result in results)
+    elapsed = time.perf_counter() - started
+    await engine.close()
+    return {"mode": label, "sent": sent, "connects": pool.connects, "seconds": round(elapsed, 2),
+            "messages_per_sec": round(sent / elapsed, 1)}
+
+
+async def main(args):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        await seed(args.users, args.messages, port)
+        results = [
+            await run("connect-per-message", SmtpConnectionPool(max_per_host=args.per_host, max_messages=1),
+                      args.messages, args.batch_size),
+            await run("pooled", SmtpConnectionPool(max_per_host=args.per_host), args.messages, args.batch_size),
+        ]
+    finally:
+        controller.stop()
+        await get_engine().dispose()
+    print(json.dumps({"server_received": handler.received, "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
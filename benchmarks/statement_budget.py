@@ -0,0 +1,146 @@
+"""Check that every endpoint stays within its SQL statement budget.
+
+Seeds one user with ``--rows`` todos, reminders (each with delivery and
+log rows) and calendar events, then calls every endpoint once and
+counts the statements it executes. An endpoint that walks a
+relationship row by row grows with ``--rows`` and blows its budget; the
+lazy-load detector runs in ``raise`` mode as well, so such a loop fails
+with ``NPlusOneError`` even within budget. Exits non-zero on any
+violation, so it can gate CI.
+
+    python -m benchmarks.statement_budget
+    python -m benchmarks.statement_budget --rows 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import benchmarks.env
+os.environ.setdefault("NPLUSONE_MODE", "raise")
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from benchmarks.asgi import consume
+from lib.db.connection import get_engine
+from lib.db.models import (
+    Base,
+    Calendar,
+    CalendarEvent,
+    DeliveryChannel,
+    Reminder,
+    ReminderForDelivery,
+    ReminderLog,
+    Todo,
+    User,
+)
+from main import app
+from routers.auth import create_access_token
+from services.passwords import get_password_hasher
+
+START = datetime(2030, 1, 1)
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+FEED_TOKEN = "bench-feed-token"
+
+# (method, path, query string, JSON or NDJSON body, max statements).
+ENDPOINTS = [
+    ("POST", "/auth/register", "", {"firstname": "New", "lastname": "User", "email": "new@example.com", "password": "pw", "contactNo": 5550000}, 1),
+    ("POST", "/auth/login", "", {"username": EMAIL, "password": PASSWORD}, 1),
+    ("GET", "/todos", "limit=50", None, 1),
+    ("GET", "/todos", "stream=ndjson", None, 1),
+    ("POST", "/todos", "", {"title": "t", "description": "d", "due_date": "2030-02-01T09:00:00"}, 1),
+    ("POST", "/todos/import", "format=ndjson", [{"title": f"imported {i}"} for i in range(100)], 1),
+    ("GET", "/reminders", "limit=50", None, 1),
+    ("GET", "/reminders", "stream=json", None, 1),
+    ("POST", "/reminders", "", {"title": "r", "reminder_datetime": "2030-02-01T09:00:00"}, 1),
+    ("POST", "/reminders", "", {"title": "daily", "reminder_datetime": "2030-02-01T09:00:00", "recurrence_rule": "FREQ=DAILY"}, 1),
+    ("POST", "/reminders/import", "format=ndjson", [{"title": f"imported {i}", "reminder_datetime": "2030-03-01T09:00:00"} for i in range(100)], 1),
+    ("GET", "/reminders/occurrences", "start=2030-01-01T00:00:00&end=2030-03-01T00:00:00", None, 1),
+    ("GET", "/reminders/1/history", "start=2026-01-01T00:00:00&end=2026-12-31T00:00:00", None, 3),
+    ("POST", "/calendars", "", {"calendar_name": "Work"}, 1),
+    ("POST", "/calendars/1/events", "", {"title": "e", "start_datetime": "2030-01-05T09:00:00", "end_datetime": "2030-01-05T10:00:00"}, 3),
+    ("PUT", "/calendars/1/events/1", "", {"title": "moved", "start_datetime": "2030-01-06T09:00:00", "end_datetime": "2030-01-06T11:00:00"}, 4),
+    ("GET", "/calendars/events", "start=2030-01-01T00:00:00&end=2030-02-01T00:00:00", None, 2),
+    ("GET", "/calendars/events/day", "Date=5&month=1&year=2030", None, 2),
+    ("GET", "/calendars/1/feed", "", None, 1),
+    ("GET", f"/calendars/feeds/{FEED_TOKEN}.ics", "", None, 2),
+    ("PUT", "/auth/change-password", "", {"username": EMAIL, "email": EMAIL, "previouspassword": PASSWORD, "newpassword": "changed"}, 2),
+    ("PUT", "/auth/reset-password", "", {"username": EMAIL, "email": EMAIL, "previouspassword": "changed", "newpassword": PASSWORD}, 2),
+    ("POST", "/auth/forgot-password", "", {"username": EMAIL, "email": EMAIL, "otp": 0, "newpassword": PASSWORD}, 2),
+]
+
+
+async def seed(rows):
+    password = await get_password_hasher().hash(PASSWORD)
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{"user_id": 1, "name": "Bench", "email": EMAIL, "password": password}])
+        await conn.execute(insert(DeliveryChannel), [{"channel_id": 1, "channel_name": "email", "is_active": True}])
+        await conn.execute(insert(Todo), [
+            {"user_id": 1, "title": f"todo {i}", "due_date": START + timedelta(hours=i), "status": "Pending"}
+            for i in range(rows)
+        ])
+        await conn.execute(insert(Reminder), [
+            {"reminder_id": i + 1, "user_id": 1, "title": f"reminder {i}", "reminder_datetime": START + timedelta(hours=i), "status": "pending"}
+            for i in range(rows)
+        ])
+        await conn.execute(insert(ReminderForDelivery), [
+            {"reminder_id": i + 1, "channel_id": 1, "delivery_status": "sent"} for i in range(rows)
+        ])
+        await conn.execute(insert(ReminderLog), [
+            {"reminder_id": i + 1, "original_text": f"reminder {i}"} for i in range(rows)
+        ])
+        await conn.execute(insert(Calendar), [{"calendar_id": 1, "user_id": 1, "calendar_name": "Home", "feed_token": FEED_TOKEN}])
+        await conn.execute(insert(CalendarEvent), [
+            {
+                "calendar_id": 1, "title": f"event {i}", "start_datetime": START + timedelta(hours=i),
+                "end_datetime": START + timedelta(hours=i + 1), "related_reminder_id": i + 1,
+            }
+            for i in range(rows)
+        ])
+
+
+def encode(body):
+    if body is None:
+        return b"", ()
+    if isinstance(body, list):
+        return "".join(json.dumps(row) + "\n" for row in body).encode(), ((b"content-type", b"application/x-ndjson"),)
+    return json.dumps(body).encode(), ((b"content-type", b"application/json"),)
+
+
+async def main(args):
+    await seed(args.rows)
+    statements = []
+    event.listen(get_engine().sync_engine, "after_cursor_execute", lambda *_: statements.append(1))
+    auth = (b"authorization", f"Bearer {create_access_token({'sub': EMAIL})}".encode())
+
+    results = []
+    for method, path, query, body, budget in ENDPOINTS:
+        payload, headers = encode(body)
+        # Warm the token cache (password changes empty it), so budgets
+        # count the endpoint's own statements.
+        await consume(app, "/todos", b"limit=1", (auth,))
+        statements.clear()
+        status, _, _, _ = await consume(app, path, query.encode(), (auth, *headers), method=method, body=payload)
+        results.append({
+            "endpoint": f"{method} {path}" + (f"?{query}" if query else ""),
+            "status": status,
+            "statements": len(statements),
+            "budget": budget,
+            "ok": status < 400 and len(statements) <= budget,
+        })
+    await get_engine().dispose()
+    get_password_hasher().shutdown()
+    failures = [result for result in results if not result["ok"]]
+    print(json.dumps({"rows": args.rows, "failures": len(failures), "endpoints": results}, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,168 @@
+"""Generator calls, cost and latency of AI reminder text with and without
+the content-addressed cache.
+
+Seeds ``--logs`` reminder logs whose text is drawn Zipf-style from a
+set of common phrases in varying case and spacing, then fills in their
+AI text three ways with a fake generator that sleeps
+``--call-ms + --item-ms * batch`` per call:
+
+- naive: one generator call per log;
+- pipeline: the batch job through a cold cache;
+- rerun: the same job with an empty process cache, so every text comes
+  from the ``generated_texts`` table.
+
+An online pass fires ``--online`` concurrent single-text requests to
+show deduplication and micro-batching latency. Cost is the number of
+generator calls and input characters sent. Every mode keeps at most
+``--concurrency`` generator calls in flight, as a backend's rate limit
+would.
+
+    python -m benchmarks.text_generation
+    python -m benchmarks.text_generation --logs 20000 --call-ms 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from benchmarks.env import users
+
+from datetime import datetime
+
+from sqlalchemy import delete, insert, update
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, GeneratedText, Reminder, ReminderLog, User
+from services.text_generation import FakeGenerator, TextGenerationService, fill_reminder_logs
+
+PHRASES = [
+    "Pay rent", "Team standup", "Take medication", "Call mom", "Water the plants", "Gym",
+    "Submit timesheet", "Pick up groceries", "Dentist appointment", "Renew car insurance",
+    "Pay credit card bill", "Weekly review", "Take out the trash", "Book flights", "Doctor appointment",
+    "Walk the dog", "Backup laptop", "Read for 30 minutes", "Send invoice", "Pay electricity bill",
+]
+
+
+def variants(rng, count):
+    """``count`` texts: common phrases Zipf-weighted, in random case and
+    spacing, plus a long tail of one-off texts."""
+    phrases = PHRASES + [f"{phrase} for project {n}" for phrase in PHRASES for n in range(10)]
+    weights = [1 / rank for rank in range(1, len(phrases) + 1)]
+    texts = []
+    for i in range(count):
+        if rng.random() < 0.05:
+            texts.append(f"One-off task number {i}")
+            continue
+        text = rng.choices(phrases, weights)[0]
+        style = rng.randrange(4)
+        text = text.lower() if style == 1 else text.upper() if style == 2 else text
+        texts.append(text.replace(" ", "  ") + " " if style == 3 else text)
+    return texts
+
+
+async def seed(texts):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), users(1))
+        await conn.execute(insert(Reminder), [
+            {"reminder_id": 1, "user_id": 1, "title": "bench", "reminder_datetime": datetime(2030, 1, 1)}
+        ])
+        await conn.execute(insert(ReminderLog), [{"reminder_id": 1, "original_text": text} for text in texts])
+
+
+async def reset_logs(clear_cache=False):
+    async with get_engine().begin() as conn:
+        await conn.execute(update(ReminderLog).values(ai_generated_text=None))
+        if clear_cache:
+            await conn.execute(delete(GeneratedText))
+
+
+def cost(generator):
+    return {"generator_calls": generator.calls, "items_generated": generator.items, "input_chars": generator.input_chars}
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+async def naive(texts, generator, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text):
+        requested = time.perf_counter()
+        async with slots:
+            await generator.generate([text])
+        latencies.append(time.perf_counter() - requested)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in texts))
+    return {"seconds": round(time.perf_counter() - started, 3), **percentiles(latencies), **cost(generator)}
+
+
+async def pipeline(generator, batch_size, concurrency):
+    service = TextGenerationService(SessionLocal, generator, max_concurrency=concurrency)
+    started = time.perf_counter()
+    filled = await fill_reminder_logs(SessionLocal, service, batch_size=batch_size)
+    return {"seconds": round(time.perf_counter() - started, 3), "filled": filled, **cost(generator), **service.stats()}
+
+
+async def online(texts, generator, concurrency):
+    service = TextGenerationService(SessionLocal, generator, max_concurrency=concurrency)
+    latencies = []
+
+    async def one(text):
+        started = time.perf_counter()
+        await service.generate(text)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in texts))
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        **percentiles(latencies),
+        **cost(generator),
+        **service.stats(),
+    }
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    texts = variants(rng, args.logs)
+    await seed(texts)
+    latency = {"call_latency": args.call_ms / 1000, "item_latency": args.item_ms / 1000}
+    report = {"logs": args.logs, "distinct_texts": len(set(texts))}
+
+    report["naive"] = await naive(texts, FakeGenerator(**latency), args.concurrency)
+    report["pipeline"] = await pipeline(FakeGenerator(**latency), args.batch_size, args.concurrency)
+    await reset_logs()
+    report["rerun"] = await pipeline(FakeGenerator(**latency), args.batch_size, args.concurrency)
+    await reset_logs(clear_cache=True)
+    online_texts = variants(rng, args.online)
+    report["online_naive"] = await naive(online_texts, FakeGenerator(**latency), args.concurrency)
+    report["online"] = await online(online_texts, FakeGenerator(**latency), args.concurrency)
+    report["savings"] = {
+        "generator_calls_pct": round((1 - report["pipeline"]["generator_calls"] / report["naive"]["generator_calls"]) * 100, 1),
+        "input_chars_pct": round((1 - report["pipeline"]["input_chars"] / report["naive"]["input_chars"]) * 100, 1),
+        "wall_time_pct": round((1 - report["pipeline"]["seconds"] / report["naive"]["seconds"]) * 100, 1),
+    }
+    await get_engine().dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=int, default=5000)
+    parser.add_argument("--online", type=int, default=500)
+    parser.add_argument("--call-ms", type=float, default=50.0)
+    parser.add_argument("--item-ms", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""Sustained WhatsApp sends/sec against a local stub of the Cloud API.
+
+The stub adds ``--latency-ms`` to every request and answers 429 with
+Retry-After once an account goes over ``--server-limit`` requests in a
+one-second window.
+
+    python -m benchmarks.whatsapp_delivery --messages 3000 --accounts 30
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+
+from benchmarks.env import users
+
+from datetime import datetime
+
+import httpx
+import uvicorn
+from sqlalchemy import insert
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from lib.db.connection import SessionLocal, get_engine
+from lib.db.models import Base, DeliveryChannel, Reminder, ReminderForDelivery, User, WhatsappSettings
+from services.deliveries import DELIVERY_PENDING
+from services.whatsapp_delivery import WhatsappDeliveryClient
+
+
+def stub_app(latency, limit):
+    windows = {}
+    stats = {"requests": 0, "throttled": 0}
+
+    async def messages(request):
+        stats["requests"] += 1
+        account = request.path_params["phone_number_id"]
+        second = int(time.monotonic())
+        window = windows.get(account)
+        if window is None or window[0] != second:
+            window = windows[account] = [second, 0]
+        window[1] += 1
+        await asyncio.sleep(latency)
+        if window[1] > limit:
+            stats["throttled"] += 1
+            return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": "1"})
+        return JSONResponse({"messages": [{"id": "wamid.stub"}]})
+
+    async def stats_view(request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/{phone_number_id}/messages", messages, methods=["POST"]),
+        Route("/stats", stats_view),
+    ])
+
+
+def serve_stub(port, latency, limit):
+    # Runs in its own process so the stub does not compete with the
+    # client for the event loop.
+    uvicorn.run(stub_app(latency, limit), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def seed(accounts, messages):
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as session:
+        session.add(DeliveryChannel(channel_id=1, channel_name="whatsapp"))
+        await session.execute(insert(User), users(accounts, phone_numbers=True))
+        await session.execute(insert(WhatsappSettings), [
+            {"user_id": u, "api_key": f"key{u}", "phone_number_id": f"pn{u}", "is_active": True}
+            for u in range(1, accounts + 1)
+        ])
+        await session.execute(insert(Reminder), [
+            {"reminder_id": i, "user_id": i % accounts + 1, "title": f"Reminder {i}",
+             "reminder_datetime": datetime(2030, 1, 1)}
+            for i in range(1, messages + 1)
+        ])
+        await session.execute(insert(ReminderForDelivery), [
+            {"delivery_id": i, "reminder_id": i, "channel_id": 1, "delivery_status": DELIVERY_PENDING}
+            for i in range(1, messages + 1)
+        ])
+        await session.commit()
+
+
+async def main(args):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    stub = multiprocessing.Process(
+        target=serve_stub, args=(port, args.latency_ms / 1000, args.server_limit), daemon=True,
+    )
+    stub.start()
+    base_url = f"http://127.0.0.1:{port}"
+
+    await seed(args.accounts, args.messages)
+    async with httpx.AsyncClient(base_url=base_url) as probe:
+        while True:
+            try:
+                await probe.get("/stats")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    client = WhatsappDeliveryClient(
+        SessionLocal, base_url=base_url, rate_per_account=args.rate_per_account,
+    )
+    started = time.perf_counter()
+    results = await client.deliver(list(range(1, args.messages + 1)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+    async with httpx.AsyncClient(base_url=base_url) as probe:
+        stats = (await probe.get("/stats")).json()
+    stub.terminate()
+    await get_engine().dispose()
+
+    sent = sum(result.status == "sent" for result in results)
+    print(json.dumps({
+        "messages": args.messages,
+        "accounts": args.accounts,
+        "sent": sent,
+        "client_429s": client.throttled,
+        "server_requests": stats["requests"],
+        "seconds": round(elapsed, 2),
+        "sends_per_sec": round(sent / elapsed, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--accounts", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--server-limit", type=int, default=20)
+    parser.add_argument("--rate-per-account", type=float, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,20 @@
+"""Request datetimes normalized to the naive UTC the database stores.
+
+Columns are naive ``DateTime`` and hold UTC. A request value with an
+offset (``Z``, ``+05:30``) is converted to UTC and the offset dropped; a
+naive value is taken as UTC already. Comparing the two kinds directly
+raises ``TypeError``, so every datetime accepted from a client goes
+through ``UTCDatetime``.
+"""
+from datetime import datetime, timezone
+from typing import Annotated
+from pydantic import AfterValidator
+
+
+def naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+UTCDatetime = Annotated[datetime, AfterValidator(naive_utc)]
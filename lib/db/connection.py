@@ -1,14 +1,223 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from lib.db.pool import InstrumentedQueuePool
+from lib.db.replicas import ReadYourWrites, ReplicaSet
 from dotenv import load_dotenv
 import os
-load_dotenv()
 
-db_url = os.environ.get("MYSQL_URL")
+# Async driver used for each backend; MYSQL_URL may name the sync driver
+# (mysql+pymysql://) because alembic still runs on it.
+ASYNC_DRIVERS = {
+    "mysql": "aiomysql",
+    "sqlite": "aiosqlite",
+}
 
-if not db_url:
-    raise ValueError("MYSQL_URL environment variable not set")
+# Engine defaults per DB_PROFILE. Every value can be overridden by the
+# matching DB_* environment variable (see ENV_OVERRIDES).
+PROFILES = {
+    "dev": {
+        "echo": True,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "warm_connections": 1,
+    },
+    "prod": {
+        "echo": False,
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "warm_connections": 20,
+    },
+}
 
-engine = create_engine(db_url, echo=True)
+ENV_OVERRIDES = {
+    "echo": ("DB_ECHO", "bool"),
+    "pool_size": ("DB_POOL_SIZE", "int"),
+    "max_overflow": ("DB_MAX_OVERFLOW", "int"),
+    "pool_timeout": ("DB_POOL_TIMEOUT", "float"),
+    "pool_recycle": ("DB_POOL_RECYCLE", "int"),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", "bool"),
+    "warm_connections": ("DB_POOL_WARM", "int"),
+}
+
+
+def _parse(value, kind):
+    if kind == "bool":
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if kind == "int":
+        return int(value)
+    return float(value)
+
+
+def to_async_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"Unsupported database backend: {backend}")
+    return url.set(drivername=f"{backend}+{driver}")
+
+
+def engine_settings(profile=None):
+    profile = profile or os.environ.get("DB_PROFILE", "dev")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE: {profile}")
+    settings = dict(PROFILES[profile])
+    for key, (env_name, kind) in ENV_OVERRIDES.items():
+        value = os.environ.get(env_name)
+        if value is not None and value != "":
+            settings[key] = _parse(value, kind)
+    return settings
+
+
+def create_engine_from_settings(url, settings, name="primary"):
+    url = to_async_url(url)
+    options = {"echo": settings["echo"]}
+    # In-memory SQLite lives inside a single connection, so it keeps the
+    # driver's default StaticPool and ignores the pool settings.
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_logging_name=name,
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_recycle=settings["pool_recycle"],
+            pool_pre_ping=settings["pool_pre_ping"],
+        )
+    return create_async_engine(url, **options)
+
+
+class LazySessionmaker(async_sessionmaker):
+    """async_sessionmaker that builds the engine on the first session, so
+    modules can import ``SessionLocal`` without touching the database."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+_engine = None
+_settings = None
+_replicas = None
+_read_your_writes = None
+
+SessionLocal = LazySessionmaker(expire_on_commit=False)
+
+def database_url():
+    load_dotenv()
+    url = os.environ.get("MYSQL_URL")
+    if not url:
+        raise ValueError("MYSQL_URL environment variable not set")
+    return url
 
 def get_engine():
-    return engine
+    """The process's engine, created on first use from MYSQL_URL and the
+    DB_PROFILE settings."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine_from_settings(database_url(), get_settings())
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+def get_settings():
+    global _settings
+    if _settings is None:
+        load_dotenv()
+        _settings = engine_settings()
+    return _settings
+
+async def get_session():
+    """FastAPI dependency yielding one AsyncSession per request."""
+    async with SessionLocal() as session:
+        yield session
+
+
+def replica_urls():
+    """MYSQL_REPLICA_URLS, comma separated; may be empty."""
+    load_dotenv()
+    return [url.strip() for url in os.environ.get("MYSQL_REPLICA_URLS", "").split(",") if url.strip()]
+
+def get_replicas():
+    """The process's read replicas, one engine (and pool) each with the
+    primary's DB_PROFILE settings."""
+    global _replicas
+    if _replicas is None:
+        settings = get_settings()
+        engines = {
+            f"replica{i}": create_engine_from_settings(url, settings, name=f"replica{i}")
+            for i, url in enumerate(replica_urls(), 1)
+        }
+        _replicas = ReplicaSet(engines, retry_after=float(os.environ.get("DB_REPLICA_RETRY_AFTER", 30)))
+    return _replicas
+
+def get_read_your_writes():
+    global _read_your_writes
+    if _read_your_writes is None:
+        _read_your_writes = ReadYourWrites(window=float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", 5)))
+    return _read_your_writes
+
+def set_writer(session, key):
+    """Pin ``key``'s reads to the primary for a while once ``session``
+    commits a write."""
+    session.info["writer"] = key
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _pin_writer(session):
+    if session.info.pop("wrote", False) and session.info.get("writer") is not None:
+        get_read_your_writes().note_write(session.info["writer"])
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
+
+@asynccontextmanager
+async def read_session(key=None):
+    """A session for read-only work, on the next healthy replica.
+
+    Falls back to the primary when no replicas are configured or healthy,
+    or when ``key`` wrote within the read-your-writes window. A replica
+    that refuses the connection is marked down and the next one tried, so
+    a failed replica costs one connect attempt, not a failed request.
+    """
+    if key is None or not get_read_your_writes().pinned(key):
+        replicas = get_replicas()
+        for engine in replicas.candidates():
+            session = SessionLocal(bind=engine)
+            try:
+                await session.connection()
+            except (DBAPIError, OSError):
+                await session.close()
+                replicas.mark_down(engine)
+                continue
+            replicas.record_read(engine)
+            async with session:
+                yield session
+            return
+    async with SessionLocal() as session:
+        yield session
+
+async def get_replica_session():
+    """FastAPI dependency like ``get_session`` for unauthenticated
+    read-only endpoints; see ``read_session``."""
+    async with read_session() as session:
+        yield session
@@ -0,0 +1,111 @@
+"""N+1 detector for lazy relationship loads.
+
+The model relationships are declared ``lazy="raise_on_sql"``, so a lazy
+load only happens where a query opts back in with ``lazyload()``. The
+detector counts those per relationship within a tracked scope, a
+request or a worker batch, and reports a relationship once it has been
+lazy-loaded ``NPLUSONE_THRESHOLD`` times: the signature of a loop over
+rows touching a relationship one row at a time. ``NPLUSONE_MODE`` is
+``off`` (the default), ``log`` or ``raise``; ``raise`` is meant for
+development and the statement budget harness.
+"""
+import contextvars
+import logging
+import os
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "log", "raise")
+
+
+class NPlusOneError(RuntimeError):
+    pass
+
+
+def detector_settings():
+    mode = os.environ.get("NPLUSONE_MODE", "off").strip().lower() or "off"
+    if mode not in MODES:
+        raise ValueError(f"Unknown NPLUSONE_MODE: {mode}")
+    return mode, int(os.environ.get("NPLUSONE_THRESHOLD", 2))
+
+
+class LazyLoadTracker:
+    def __init__(self, label, mode="log", threshold=2):
+        self.label = label
+        self.mode = mode
+        self.threshold = threshold
+        self.loads = Counter()
+        self.reported = []
+
+    def describe(self):
+        return self.label() if callable(self.label) else self.label
+
+    def record(self, relationship):
+        self.loads[relationship] += 1
+        if self.loads[relationship] != self.threshold:
+            return
+        self.reported.append(relationship)
+        message = (
+            f"{relationship} lazy-loaded {self.threshold} times in {self.describe()}; "
+            "load it with selectinload() or joinedload()"
+        )
+        if self.mode == "raise":
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+_tracker = contextvars.ContextVar("lazy_load_tracker", default=None)
+
+
+@contextmanager
+def track_lazy_loads(label, mode=None, threshold=None):
+    """Track lazy loads for the duration of the block. ``mode`` and
+    ``threshold`` default to the environment settings; in ``off`` mode
+    nothing is tracked and None is yielded."""
+    env_mode, env_threshold = detector_settings()
+    mode = mode or env_mode
+    if mode == "off":
+        yield None
+        return
+    tracker = LazyLoadTracker(label, mode, threshold or env_threshold)
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_lazy_load(orm_execute_state):
+    tracker = _tracker.get()
+    if tracker is None or not orm_execute_state.is_relationship_load:
+        return
+    if orm_execute_state.lazy_loaded_from is not None:
+        tracker.record(str(orm_execute_state.loader_strategy_path.prop))
+
+
+class LazyLoadMiddleware:
+    """Pure ASGI middleware tracking lazy loads per request, labelled by
+    method and matched route."""
+
+    def __init__(self, app, mode=None, threshold=None):
+        env_mode, env_threshold = detector_settings()
+        self.app = app
+        self.mode = mode or env_mode
+        self.threshold = threshold or env_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        def label():
+            route = scope.get("route")
+            return f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+
+        with track_lazy_loads(label, self.mode, self.threshold):
+            await self.app(scope, receive, send)
@@ -1,16 +1,20 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# Relationships raise instead of lazy-loading: a query that walks one
+# loads it up front with selectinload() (collections) or joinedload()
+# (references), so a loop over rows can't turn into one query per row.
+
 
 class User(Base):
     __tablename__ = "users"
     __table_args__ = {'mysql_engine': 'InnoDB'}
     
-    user_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(255), nullable=False)
     annual = Column(String(100), nullable=True)
     phone_number = Column(String(20), nullable=True)
@@ -19,79 +23,129 @@ class User(Base):
     email = Column(String(50), nullable=False, unique=True)
     password = Column(String(512), nullable=False)
     # Relationships
-    reminders = relationship("Reminder", back_populates="user")
-    todos = relationship("Todo", back_populates="user")
-    smtp_settings = relationship("SmtpShipping", back_populates="user")
-    whatsapp_settings = relationship("WhatsappSettings", back_populates="user")
-    calendars = relationship("Calendar", back_populates="user")
+    reminders = relationship("Reminder", back_populates="user", lazy="raise_on_sql")
+    todos = relationship("Todo", back_populates="user", lazy="raise_on_sql")
+    smtp_settings = relationship("SmtpShipping", back_populates="user", lazy="raise_on_sql")
+    whatsapp_settings = relationship("WhatsappSettings", back_populates="user", lazy="raise_on_sql")
+    calendars = relationship("Calendar", back_populates="user", lazy="raise_on_sql")
 
 
 class Reminder(Base):
     __tablename__ = "reminders"
-    __table_args__ = {'mysql_engine': 'InnoDB'}
-    
-    reminder_id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        Index("ix_reminders_user_id_reminder_datetime", "user_id", "reminder_datetime"),
+        Index("ix_reminders_status_reminder_datetime", "status", "reminder_datetime"),
+        Index("ix_reminders_status_updated_at", "status", "updated_at"),
+        {'mysql_engine': 'InnoDB'},
+    )
+    
+    reminder_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     title = Column(String(500), nullable=False)
     description = Column(Text, nullable=True)
+    # For a recurring reminder this is the next occurrence still to fire; the
+    # scheduler advances it after each one, so "due next" stays an index seek.
     reminder_datetime = Column(DateTime, nullable=False)
     priority = Column(String(20), nullable=True)
-    status = Column(String(50), nullable=True)
+    status = Column(String(50), nullable=True, default="pending")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Lets the scheduler pick up reminders written since its last scan.
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    recurrence_rule = Column(String(500), nullable=True)
+    recurrence_start = Column(DateTime, nullable=True)
     
     # Relationships
-    user = relationship("User", back_populates="reminders")
-    logs = relationship("ReminderLog", back_populates="reminder")
-    deliveries = relationship("ReminderForDelivery", back_populates="reminder")
-    calendar_events = relationship("CalendarEvent", back_populates="related_reminder")
+    user = relationship("User", back_populates="reminders", lazy="raise_on_sql")
+    logs = relationship("ReminderLog", back_populates="reminder", lazy="raise_on_sql")
+    deliveries = relationship("ReminderForDelivery", back_populates="reminder", lazy="raise_on_sql")
+    calendar_events = relationship("CalendarEvent", back_populates="related_reminder", lazy="raise_on_sql")
 
 
 class ReminderLog(Base):
     __tablename__ = "reminder_logs"
-    __table_args__ = {'mysql_engine': 'InnoDB'}
+    __table_args__ = (
+        Index("ix_reminder_logs_created_at", "created_at"),
+        Index("ix_reminder_logs_reminder_id_created_at", "reminder_id", "created_at"),
+        {'mysql_engine': 'InnoDB'},
+    )
     
-    id_log_id = Column(Integer, primary_key=True, index=True)
+    id_log_id = Column(Integer, primary_key=True)
     reminder_id = Column(Integer, ForeignKey("reminders.reminder_id"), nullable=False)
     original_text = Column(Text, nullable=True)
     ai_generated_text = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    reminder = relationship("Reminder", back_populates="logs")
+    reminder = relationship("Reminder", back_populates="logs", lazy="raise_on_sql")
+
+
+class GeneratedText(Base):
+    """AI rewrites of reminder text, keyed by a hash of the generator and
+    the normalized source text, so every reminder with the same text
+    shares one row."""
+    __tablename__ = "generated_texts"
+    __table_args__ = {'mysql_engine': 'InnoDB'}
+    
+    text_hash = Column(String(64), primary_key=True)
+    generator = Column(String(100), nullable=False)
+    source_text = Column(Text, nullable=False)
+    generated_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class DeliveryChannel(Base):
     __tablename__ = "delivery_channels"
     __table_args__ = {'mysql_engine': 'InnoDB'}
     
-    channel_id = Column(Integer, primary_key=True, index=True)
+    channel_id = Column(Integer, primary_key=True)
     channel_name = Column(String(100), nullable=False)
     is_active = Column(Boolean, default=True)
+    # Deliveries due for one user within this many seconds of each other
+    # go out as a single digest message; 0 sends each one on its own.
+    digest_window_seconds = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
-    deliveries = relationship("ReminderForDelivery", back_populates="channel")
+    deliveries = relationship("ReminderForDelivery", back_populates="channel", lazy="raise_on_sql")
 
 
 class ReminderForDelivery(Base):
     __tablename__ = "reminder_deliveries"
-    __table_args__ = {'mysql_engine': 'InnoDB'}
-    
-    delivery_id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        Index("ix_reminder_deliveries_reminder_id_channel_id", "reminder_id", "channel_id"),
+        Index("ix_reminder_deliveries_delivery_status_delivery_id", "delivery_status", "delivery_id"),
+        Index("ix_reminder_deliveries_created_at", "created_at"),
+        {'mysql_engine': 'InnoDB'},
+    )
+    
+    delivery_id = Column(Integer, primary_key=True)
     reminder_id = Column(Integer, ForeignKey("reminders.reminder_id"), nullable=False)
     channel_id = Column(Integer, ForeignKey("delivery_channels.channel_id"), nullable=False)
     delivery_status = Column(String(50), nullable=True)
     sent_at = Column(DateTime, nullable=True)
+    # When the row was enqueued; retention ages rows by it. NULL on rows
+    # enqueued before the column existed.
+    created_at = Column(DateTime, nullable=True, default=datetime.utcnow)
+    # Not claimed before this time: the end of the digest window the row
+    # was enqueued into. NULL when its channel sends without digests.
+    not_before = Column(DateTime, nullable=True)
+    # Outbox lease: the worker holding the row and until when.
+    locked_by = Column(String(64), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
-    reminder = relationship("Reminder", back_populates="deliveries")
-    channel = relationship("DeliveryChannel", back_populates="deliveries")
+    reminder = relationship("Reminder", back_populates="deliveries", lazy="raise_on_sql")
+    channel = relationship("DeliveryChannel", back_populates="deliveries", lazy="raise_on_sql")
 
 
 class Todo(Base):
     __tablename__ = "todos"
-    __table_args__ = {'mysql_engine': 'InnoDB'}
+    __table_args__ = (
+        Index("ix_todos_user_id_due_date", "user_id", "due_date"),
+        {'mysql_engine': 'InnoDB'},
+    )
     
-    todo_id = Column(Integer, primary_key=True, index=True)
+    todo_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     title = Column(String(500), nullable=False)
     description = Column(Text, nullable=True)
@@ -100,14 +154,14 @@ class Todo(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    user = relationship("User", back_populates="todos")
+    user = relationship("User", back_populates="todos", lazy="raise_on_sql")
 
 
 class SmtpShipping(Base):
     __tablename__ = "smtp_settings"
     __table_args__ = {'mysql_engine': 'InnoDB'}
     
-    smtp_id = Column(Integer, primary_key=True, index=True)
+    smtp_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     smtp_server = Column(String(255), nullable=False)
     port = Column(Integer, nullable=False)
@@ -116,42 +170,52 @@ class SmtpShipping(Base):
     is_active = Column(Boolean, default=True)
     
     # Relationships
-    user = relationship("User", back_populates="smtp_settings")
+    user = relationship("User", back_populates="smtp_settings", lazy="raise_on_sql")
 
 
 class WhatsappSettings(Base):
     __tablename__ = "whatsapp_settings"
     __table_args__ = {'mysql_engine': 'InnoDB'}
     
-    wa_id = Column(Integer, primary_key=True, index=True)
+    wa_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     api_key = Column(String(500), nullable=False)
     phone_number_id = Column(String(100), nullable=False)
     is_active = Column(Boolean, default=True)
     
     # Relationships
-    user = relationship("User", back_populates="whatsapp_settings")
+    user = relationship("User", back_populates="whatsapp_settings", lazy="raise_on_sql")
 
 
 class Calendar(Base):
     __tablename__ = "calendars"
     __table_args__ = {'mysql_engine': 'InnoDB'}
     
-    calendar_id = Column(Integer, primary_key=True, index=True)
+    calendar_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     calendar_name = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Longest event duration ever stored in this calendar. Range queries use
+    # it to put a lower bound on start_datetime so the index range is finite.
+    max_event_seconds = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped on every event change; the ICS feed's ETag is derived from it.
+    change_counter = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, nullable=True)
+    feed_token = Column(String(64), nullable=True, unique=True)
     
     # Relationships
-    user = relationship("User", back_populates="calendars")
-    events = relationship("CalendarEvent", back_populates="calendar")
+    user = relationship("User", back_populates="calendars", lazy="raise_on_sql")
+    events = relationship("CalendarEvent", back_populates="calendar", lazy="raise_on_sql")
 
 
 class CalendarEvent(Base):
     __tablename__ = "calendar_events"
-    __table_args__ = {'mysql_engine': 'InnoDB'}
+    __table_args__ = (
+        Index("ix_calendar_events_calendar_id_start_datetime", "calendar_id", "start_datetime"),
+        {'mysql_engine': 'InnoDB'},
+    )
     
-    event_id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, primary_key=True)
     calendar_id = Column(Integer, ForeignKey("calendars.calendar_id"), nullable=False)
     title = Column(String(500), nullable=False)
     description = Column(Text, nullable=True)
@@ -160,5 +224,5 @@ class CalendarEvent(Base):
     related_reminder_id = Column(Integer, ForeignKey("reminders.reminder_id"), nullable=True)
     
     # Relationships
-    calendar = relationship("Calendar", back_populates="events")
-    related_reminder = relationship("Reminder", back_populates="calendar_events")
\ No newline at end of file
+    calendar = relationship("Calendar", back_populates="events", lazy="raise_on_sql")
+    related_reminder = relationship("Reminder", back_populates="calendar_events", lazy="raise_on_sql")
\ No newline at end of file
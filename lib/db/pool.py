@@ -0,0 +1,90 @@
+import asyncio
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """Checkout wait time and saturation counters for one connection pool."""
+
+    def __init__(self, name):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pool = None
+
+    def observe_wait(self, seconds):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        if seconds > self.wait_seconds_max:
+            self.wait_seconds_max = seconds
+
+    def snapshot(self):
+        capacity = checked_out = 0
+        if self.pool is not None:
+            capacity = self.pool.capacity
+            checked_out = self.pool.checkedout()
+        return {
+            "pool": self.name,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            "checked_out": checked_out,
+            "capacity": capacity,
+            "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+        }
+
+
+_metrics = {}
+
+def get_pool_metrics(name):
+    if name not in _metrics:
+        _metrics[name] = PoolMetrics(name)
+    return _metrics[name]
+
+def all_pool_metrics():
+    return [metrics.snapshot() for metrics in _metrics.values()]
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited.
+
+    Metrics are keyed by ``logging_name`` so they survive ``dispose()``,
+    which rebuilds the pool through ``recreate()``.
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, **kw):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kw)
+        self.capacity = pool_size + max(max_overflow, 0)
+        self.metrics = get_pool_metrics(self.logging_name or "default")
+        self.metrics.pool = self
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - started)
+
+
+async def warm_pool(engine, connections):
+    """Open ``connections`` connections at once so the pool holds them
+    before the first request arrives, then hand them back.
+
+    Connections beyond ``pool_size`` would be discarded on check-in, so
+    the count is capped there."""
+    if isinstance(engine.pool, AsyncAdaptedQueuePool):
+        connections = min(connections, engine.pool.size())
+    conns = [engine.connect() for _ in range(connections)]
+    try:
+        await asyncio.gather(*(conn.start() for conn in conns))
+        await asyncio.gather(*(conn.exec_driver_sql("SELECT 1") for conn in conns))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns), return_exceptions=True)
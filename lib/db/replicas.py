@@ -0,0 +1,104 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+
+
+class ReplicaSet:
+    """Round-robin over read replica engines (a name -> engine dict),
+    skipping unhealthy ones.
+
+    A replica that fails to connect, or whose connection drops, is marked
+    down for ``retry_after`` seconds; after that the next read tries it
+    again and either brings it back or marks it down for another period.
+    With no healthy replica, ``candidates()`` is empty and reads go to
+    the primary.
+    """
+
+    def __init__(self, engines, retry_after=30.0):
+        self.names = {id(engine): name for name, engine in engines.items()}
+        self.engines = list(engines.values())
+        self.retry_after = retry_after
+        self._down_until = {}
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.reads = {id(engine): 0 for engine in self.engines}
+        self.failovers = {id(engine): 0 for engine in self.engines}
+        for engine in self.engines:
+            event.listen(engine.sync_engine, "handle_error", self._disconnect_listener(engine))
+
+    def _disconnect_listener(self, engine):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.mark_down(engine)
+        return handle_error
+
+    def candidates(self):
+        """Healthy replicas, starting from the next one in rotation."""
+        if not self.engines:
+            return []
+        now = time.monotonic()
+        start = next(self._next) % len(self.engines)
+        rotated = self.engines[start:] + self.engines[:start]
+        with self._lock:
+            return [engine for engine in rotated if self._down_until.get(id(engine), 0) <= now]
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down_until[id(engine)] = time.monotonic() + self.retry_after
+            self.failovers[id(engine)] += 1
+
+    def record_read(self, engine):
+        self.reads[id(engine)] += 1
+
+    def stats(self):
+        now = time.monotonic()
+        return [
+            {
+                "replica": self.names[id(engine)],
+                "healthy": int(self._down_until.get(id(engine), 0) <= now),
+                "reads": self.reads[id(engine)],
+                "failovers": self.failovers[id(engine)],
+            }
+            for engine in self.engines
+        ]
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+class ReadYourWrites:
+    """Keys (user ids) that wrote in the last ``window`` seconds.
+
+    Their reads go to the primary until replication has had time to catch
+    up. Bounded LRU; the map is per process, so a read served by another
+    worker right after a write can still be stale by up to the replicas'
+    lag.
+    """
+
+    def __init__(self, window=5.0, max_size=100000):
+        self.window = window
+        self.max_size = max_size
+        self._until = OrderedDict()
+        self._lock = threading.Lock()
+
+    def note_write(self, key):
+        if self.window <= 0:
+            return
+        with self._lock:
+            self._until[key] = time.monotonic() + self.window
+            self._until.move_to_end(key)
+            while len(self._until) > self.max_size:
+                self._until.popitem(last=False)
+
+    def pinned(self, key):
+        with self._lock:
+            until = self._until.get(key)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._until[key]
+                return False
+            return True
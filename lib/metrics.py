@@ -0,0 +1,262 @@
+"""In-process metrics exported in the Prometheus text format.
+
+Metrics are plain counters, gauges and fixed-bucket histograms keyed by
+label values, updated from the event loop without locks. ``render()``
+writes every registered metric plus whatever the registered collectors
+return, so existing ``stats()``/``snapshot()`` style counters can be
+exported without being rewritten.
+"""
+import contextvars
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def samples(self):
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in self._series.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self._series[labels] = self._series.get(labels, 0) - amount
+
+    def set(self, *labels, value):
+        self._series[labels] = value
+
+    def samples(self):
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in self._series.items()]
+
+
+class Histogram(_Metric):
+    """Counts per bucket are stored non-cumulatively and summed on render,
+    so ``observe`` is one bisect and two additions."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', _number(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._metrics.get(name) or self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._metrics.get(name) or self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, name, collector):
+        """``collector()`` returns metrics built fresh at scrape time. A
+        collector added again under the same name replaces the old one."""
+        self._collectors[name] = collector
+
+    def render(self):
+        lines = []
+        metrics = list(self._metrics.values())
+        for collector in self._collectors.values():
+            metrics.extend(collector())
+        for metric in metrics:
+            samples = metric.samples()
+            if samples:
+                lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+
+def snapshot_gauges(prefix, rows, label=None):
+    """Gauges for the numeric fields of ``stats()``-style dicts, one
+    series per row, labelled by the row's ``label`` field if given."""
+    gauges = {}
+    for row in rows:
+        labels = (row[label],) if label else ()
+        for key, value in row.items():
+            if key == label or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            gauge = gauges.get(key)
+            if gauge is None:
+                gauge = gauges[key] = Gauge(f"{prefix}_{key}", f"{prefix.replace('_', ' ')} {key.replace('_', ' ')}.", (label,) if label else ())
+            gauge.set(*labels, value=value)
+    return list(gauges.values())
+
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_duration = registry.histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being handled.")
+http_response_size = registry.histogram("http_response_size_bytes", "HTTP response body size.", ("method", "route"), SIZE_BUCKETS)
+http_db_statements = registry.histogram(
+    "http_request_db_statements", "Database statements run per HTTP request.", ("method", "route"), COUNT_BUCKETS
+)
+http_db_duration = registry.histogram("http_request_db_seconds", "Database time per HTTP request.", ("method", "route"))
+db_statements = registry.counter("db_statements_total", "Database statements executed.", ("engine",))
+db_duration = registry.histogram("db_statement_duration_seconds", "Database statement latency.", ("engine",))
+
+
+class RequestStats:
+    __slots__ = ("db_statements", "db_seconds")
+
+    def __init__(self):
+        self.db_statements = 0
+        self.db_seconds = 0.0
+
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine, name="primary"):
+    """Time every statement on ``engine`` (an AsyncEngine or Engine), and
+    add it to the current request's stats when there is one. SQLAlchemy
+    runs the sync engine in a greenlet that shares the request's context,
+    so the context variable set by the middleware is visible here."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        db_statements.inc(name)
+        db_duration.observe(name, value=elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_statements += 1
+            stats.db_seconds += elapsed
+
+    def failed(exception_context):
+        started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+    listeners = {"before_cursor_execute": before, "after_cursor_execute": after, "handle_error": failed}
+    for event_name, listener in listeners.items():
+        event.listen(sync_engine, event_name, listener)
+    return listeners
+
+
+def uninstrument_engine(engine, listeners):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    for name, listener in listeners.items():
+        event.remove(sync_engine, name, listener)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status, response size,
+    in-flight requests and per-request database work.
+
+    The route label is the matched path template (``/todos/{todo_id}``),
+    never the raw path, so label cardinality stays bounded; unmatched
+    requests are labelled ``unmatched``. Latency runs until the last body
+    chunk is sent, so streamed responses are measured in full.
+    """
+
+    def __init__(self, app, exclude=("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        size = 0
+        started = time.perf_counter()
+        http_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            _request_stats.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", None) or "unmatched")
+            http_requests.inc(*labels, str(status))
+            http_duration.observe(*labels, value=elapsed)
+            http_response_size.observe(*labels, value=size)
+            http_db_statements.observe(*labels, value=stats.db_statements)
+            http_db_duration.observe(*labels, value=stats.db_seconds)
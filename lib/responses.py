@@ -0,0 +1,48 @@
+"""JSON responses that skip the response-model round trip.
+
+A route that returns ``FastJSONResponse`` is sent as-is: FastAPI does not
+validate it against the route's ``response_model`` (still declared, so
+the schema stays in the docs) or run ``jsonable_encoder`` over it. Rows
+go from ``Result.all()`` to bytes through ``records()``, without ORM
+objects or Pydantic models in between, so the route itself must select
+exactly the schema's columns. orjson does the encoding when installed,
+the standard library otherwise.
+"""
+import enum
+import json
+from datetime import date, datetime, time
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """Compact JSON bytes; datetimes as ISO 8601, as Pydantic writes them."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
+
+
+def records(rows):
+    """Plain dicts for SQLAlchemy ``Row`` tuples, keyed by column label.
+    Zipping with the labels is several times faster than ``Row._asdict()``."""
+    if not rows:
+        return []
+    fields = rows[0]._fields
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
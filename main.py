@@ -1,7 +1,125 @@
+"""The app factory. Importing this module has no side effects: routers
+are imported by ``create_app()``, and the engine, JWT secret and bcrypt
+pool are set up by the lifespan when the server starts.
+
+    uvicorn main:app
+    uvicorn --factory main:create_app
+
+Push streams (``/push/events``, ``/push/ws``) stay open until the client
+leaves, so give the server a ``--timeout-graceful-shutdown`` or it will
+wait on them forever when stopped, and ``--ws-per-message-deflate false``:
+compressing the small event frames costs a zlib context per WebSocket.
+Startup fails unless ``PUSH_BROKER`` is set; with more than one process
+(the scheduler and outbox workers run in their own) it must be ``redis``
+for their events to reach clients.
+"""
+import logging
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
 from fastapi import FastAPI
-from routers.auth import auth_router
+from fastapi.responses import PlainTextResponse
+from lib.db.connection import get_engine, get_replicas, get_settings
+from lib.db.loading import LazyLoadMiddleware, detector_settings
+from lib.db.pool import all_pool_metrics, warm_pool
+from lib.metrics import MetricsMiddleware, instrument_engine, registry, snapshot_gauges, uninstrument_engine
+from services.passwords import get_password_hasher
+from services.push import get_push_hub
+from services.settings_cache import get_delivery_settings_cache
+from services.token_cache import get_token_cache
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from routers.auth import jwt_secret
+
+    jwt_secret()
+    get_password_hasher().start()
+    engine = get_engine()
+    listeners = instrument_engine(engine)
+    await warm_pool(engine, get_settings()["warm_connections"])
+    replicas = get_replicas()
+    replica_listeners = []
+    for name, replica in zip(replicas.names.values(), replicas.engines):
+        replica_listeners.append((replica, instrument_engine(replica, name)))
+        try:
+            await warm_pool(replica, get_settings()["warm_connections"])
+        except Exception as err:
+            # A replica that is down at boot is skipped until it recovers.
+            logger.warning("Could not connect to %s, marking it down: %s", name, err)
+            replicas.mark_down(replica)
+    await get_push_hub().start()
+    yield
+    await get_push_hub().stop()
+    for replica, replica_listener in replica_listeners:
+        uninstrument_engine(replica, replica_listener)
+    await replicas.dispose()
+    uninstrument_engine(engine, listeners)
+    await engine.dispose()
+    get_password_hasher().shutdown()
+
+
+async def prometheus_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def db_pool_metrics():
+    return all_pool_metrics()
+
+async def auth_cache_metrics():
+    return get_token_cache().stats()
+
+async def delivery_settings_metrics():
+    return get_delivery_settings_cache().stats()
+
+async def db_replica_metrics():
+    return get_replicas().stats()
+
+async def push_metrics():
+    return get_push_hub().stats()
+
+
+def create_app():
+    load_dotenv()
+    from routers.auth import auth_router
+    from routers.calendar import calendar_router
+    from routers.push import push_router
+    from routers.remdinder import reminder_router
+    from routers.todo import todo_router
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(MetricsMiddleware)
+    if detector_settings()[0] != "off":
+        app.add_middleware(LazyLoadMiddleware)
+
+    registry.add_collector("db_pool", lambda: snapshot_gauges("db_pool", all_pool_metrics(), label="pool"))
+    registry.add_collector("db_replicas", lambda: snapshot_gauges("db_replicas", get_replicas().stats(), label="replica"))
+    registry.add_collector("auth_token_cache", lambda: snapshot_gauges("auth_token_cache", [get_token_cache().stats()]))
+    registry.add_collector(
+        "delivery_settings_cache", lambda: snapshot_gauges("delivery_settings_cache", [get_delivery_settings_cache().stats()])
+    )
+    registry.add_collector("push", lambda: snapshot_gauges("push", [get_push_hub().stats()]))
+
+    app.include_router(auth_router)
+    app.include_router(todo_router)
+    app.include_router(reminder_router)
+    app.include_router(calendar_router)
+    app.include_router(push_router)
 
-app = FastAPI()
+    app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/metrics/db-pool", db_pool_metrics, methods=["GET"])
+    app.add_api_route("/metrics/db-replicas", db_replica_metrics, methods=["GET"])
+    app.add_api_route("/metrics/auth-cache", auth_cache_metrics, methods=["GET"])
+    app.add_api_route("/metrics/delivery-settings", delivery_settings_metrics, methods=["GET"])
+    app.add_api_route("/metrics/push", push_metrics, methods=["GET"])
+    return app
 
-app.include_router(auth_router)
 
+def __getattr__(name):
+    # ``main.app`` is built on first access, for ``uvicorn main:app`` and
+    # ``from main import app``.
+    global app
+    if name == "app":
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,24 +1,21 @@
 from fastapi import Depends, HTTPException, status, APIRouter
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 from fastapi.security import OAuth2PasswordBearer
-from bcrypt import gensalt, hashpw, checkpw
-from sqlalchemy.orm import Session
-from lib.db.connection import get_engine
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from lib.db.connection import get_session, read_session, set_writer
 from lib.db.models import User
-from pydantic_core import ValidationError
+from services.passwords import PasswordHasherBusy, get_password_hasher
+from services.token_cache import AuthenticatedUser, get_token_cache
 from dotenv import load_dotenv
 import os 
 
-engine = get_engine()
-load_dotenv()
-
-db = Session(engine)
-
 # JWT configuration
-SECRET_KEY = os.getenv("JWT_SECRET")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
@@ -54,12 +51,48 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class RegisteredUser(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    user_id: int
+    name: str
+    email: str
+
+class PasswordChanged(BaseModel):
+    detail: str = "Password updated"
+
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return checkpw(plain_password.encode('utf-8'), hashed_password)
+@lru_cache(maxsize=1)
+def jwt_secret():
+    """JWT_SECRET, read once; the app's lifespan calls this so a missing
+    secret fails the boot rather than the first login."""
+    load_dotenv()
+    secret = os.getenv("JWT_SECRET")
+    if not secret:
+        raise ValueError("JWT_SECRET environment variable not set")
+    return secret
+
+hasher_busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many password operations in progress, retry shortly",
+    headers={"Retry-After": "1"},
+)
+
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await get_password_hasher().verify(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise hasher_busy_exception
 
-def get_password_hash(password):
-    return hashpw(password.encode('utf-8'), gensalt())
+async def get_password_hash(password):
+    try:
+        return await get_password_hasher().hash(password)
+    except PasswordHasherBusy:
+        raise hasher_busy_exception
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalar_one_or_none()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -68,32 +101,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, jwt_secret(), algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def user_for_token(token: str, db: AsyncSession):
+    """The user a JWT belongs to, through the token cache; ``db`` is only
+    queried on a cache miss."""
+    token_cache = get_token_cache()
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, jwt_secret(), algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = users_db.get(username)
+    user = await get_user_by_email(db, username)
     if user is None:
         raise credentials_exception
-    return user
+    current_user = AuthenticatedUser(user_id=user.user_id, email=user.email, name=user.name)
+    token_cache.put(token, payload, current_user)
+    return current_user
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_session)
+):
+    current_user = await user_for_token(token, db)
+    set_writer(db, current_user.user_id)
+    return current_user
+
+async def get_read_session(current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Session for read-only endpoints: a replica, unless the caller wrote
+    within the read-your-writes window."""
+    async with read_session(current_user.user_id) as session:
+        yield session
 
 # Endpoints
 @auth_router.post("/login", response_model=Token)
-async def login_user(user: User_login):
-    db_user = users_db.get(user.username)
-    if not db_user or not verify_password(user.password, db_user["password"]):
+async def login_user(user: User_login, db: AsyncSession = Depends(get_session)):
+    db_user = await get_user_by_email(db, user.username)
+    if not db_user or not await verify_password(user.password, db_user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -101,58 +156,62 @@ async def login_user(user: User_login):
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": db_user.email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@auth_router.post("/register")
-async def registration(user: User_register.model_construct):
-    print(user)
-    validated_user = user
-    try:
-        validated_user = User_register.model_validate(user)
-    except ValidationError as err:
-        raise err
-
-    hashed_password = get_password_hash(validated_user.password)
-    new_user = User(name=(validated_user.firstname + validated_user.lastname), phone_number=validated_user.contactNo, email=validated_user.email, password=hashed_password)
+@auth_router.post("/register", response_model=RegisteredUser)
+async def registration(user: User_register, db: AsyncSession = Depends(get_session)):
+    hashed_password = await get_password_hash(user.password)
+    new_user = User(name=(user.firstname + user.lastname), phone_number=str(user.contactNo), email=user.email, password=hashed_password)
 
     db.add(new_user)
 
-    db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
 
-    return user.model_dump()
+    return RegisteredUser.model_validate(new_user)
 
-@auth_router.put("/change-password")
+@auth_router.put("/change-password", response_model=PasswordChanged)
 async def update_password(
     changepassword: ChangePassword,
-    current_user: dict = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
 ):
-    if current_user["username"] != changepassword.username or current_user["email"] != changepassword.email:
+    if current_user.email != changepassword.email:
         raise HTTPException(status_code=403, detail="Not authorized to change this user's password")
-    if not verify_password(changepassword.previouspassword, current_user["password"]):
+    user = await db.get(User, current_user.user_id)
+    if not await verify_password(changepassword.previouspassword, user.password):
         raise HTTPException(status_code=400, detail="Incorrect previous password")
-    hashed_password = get_password_hash(changepassword.newpassword)  # In real app, use new password
-    users_db[current_user["username"]]["password"] = hashed_password
-    return {"changepassword": changepassword.model_dump()}
-
-@auth_router.post("/forgot-password")
-async def forgot_password(password: ForgotPassword):
-    user = users_db.get(password.email)
-    if not user or user["username"] != password.email:
+    user.password = await get_password_hash(changepassword.newpassword)
+    await db.commit()
+    get_token_cache().invalidate_user(user.user_id)
+    return PasswordChanged()
+
+@auth_router.post("/forgot-password", response_model=PasswordChanged)
+async def forgot_password(password: ForgotPassword, db: AsyncSession = Depends(get_session)):
+    user = await get_user_by_email(db, password.email)
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
     # Simulate OTP verification (in production, validate OTP)
-    hashed_password = get_password_hash(password.newpassword)
-    users_db[password.email]["password"] = hashed_password
-    return password.model_dump()
+    user.password = await get_password_hash(password.newpassword)
+    await db.commit()
+    get_token_cache().invalidate_user(user.user_id)
+    return PasswordChanged()
 
-@auth_router.put("/reset-password")  # Fixed typo from 'reset-paasword'
+@auth_router.put("/reset-password", response_model=PasswordChanged)  # Fixed typo from 'reset-paasword'
 async def reset_password(
     resetpassword: ChangePassword,
-    current_user: dict = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
 ):
-    if current_user["username"] != resetpassword.username or current_user["email"] != resetpassword.email:
+    if current_user.email != resetpassword.email:
         raise HTTPException(status_code=403, detail="Not authorized to reset this user's password")
-    hashed_password = get_password_hash(resetpassword.previouspassword)  # In real app, use new password
-    users_db[current_user["username"]]["password"] = hashed_password
-    return {"changepassword": resetpassword.model_dump()}
\ No newline at end of file
+    user = await db.get(User, current_user.user_id)
+    user.password = await get_password_hash(resetpassword.newpassword)
+    await db.commit()
+    get_token_cache().invalidate_user(user.user_id)
+    return PasswordChanged()
@@ -1,9 +1,230 @@
-from pydantic import BaseModel
-from fastapi import FastAPI
+import secrets
+from datetime import datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, model_validator
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from lib.datetimes import UTCDatetime
+from lib.db.connection import get_replica_session, get_session, read_session
+from lib.db.models import Calendar, CalendarEvent, Reminder
+from lib.responses import FastJSONResponse, records
+from routers.auth import get_current_user, get_read_session
+from services.ics import feed_etag, feed_last_modified, http_date, iter_calendar, not_modified
+from services.token_cache import AuthenticatedUser
+
+calendar_router = APIRouter(prefix="/calendars", tags=["calendars"])
 
 class coloumns(BaseModel):
     Date : int
     month : int
     year : int
-    
-    
\ No newline at end of file
+
+class NewCalendar(BaseModel):
+    calendar_name: str
+
+class CalendarOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    calendar_id: int
+    calendar_name: str
+
+class NewEvent(BaseModel):
+    title: str
+    description: Optional[str] = None
+    start_datetime: UTCDatetime
+    end_datetime: UTCDatetime
+    related_reminder_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.end_datetime < self.start_datetime:
+            raise ValueError("end_datetime must not be before start_datetime")
+        return self
+
+class EventOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    event_id: int
+    calendar_id: int
+    title: str
+    description: Optional[str] = None
+    start_datetime: datetime
+    end_datetime: datetime
+    related_reminder_id: Optional[int] = None
+
+async def get_owned_calendar(db: AsyncSession, calendar_id: int, user_id: int):
+    calendar = await db.get(Calendar, calendar_id)
+    if calendar is None or calendar.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendar not found")
+    return calendar
+
+async def check_related_reminder(db: AsyncSession, reminder_id: Optional[int], user_id: int):
+    """404 unless ``reminder_id`` is empty or one of the user's reminders."""
+    if reminder_id is None:
+        return
+    owned = await db.scalar(
+        select(Reminder.reminder_id).where(Reminder.reminder_id == reminder_id, Reminder.user_id == user_id)
+    )
+    if owned is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reminder not found")
+
+async def record_event_change(db: AsyncSession, calendar_id: int, event: NewEvent):
+    """Bump the calendar's change counter and widen max_event_seconds to
+    cover ``event``, in one UPDATE."""
+    duration = int((event.end_datetime - event.start_datetime).total_seconds())
+    await db.execute(
+        update(Calendar)
+        .where(Calendar.calendar_id == calendar_id)
+        .values(
+            change_counter=Calendar.change_counter + 1,
+            updated_at=datetime.utcnow(),
+            max_event_seconds=case((Calendar.max_event_seconds < duration, duration), else_=Calendar.max_event_seconds),
+        )
+    )
+
+async def find_overlapping_events(db: AsyncSession, user_id: int, start: datetime, end: datetime, calendar_ids=None):
+    """Events in the user's calendars that overlap [start, end).
+
+    An event overlaps when it starts before ``end`` and ends after
+    ``start``. No event in these calendars lasts longer than their largest
+    ``max_event_seconds``, so an overlapping event also starts at or after
+    ``start - max_event_seconds``. That lower bound turns the search into
+    a bounded range on ix_calendar_events_calendar_id_start_datetime.
+    Returns ``Row`` tuples with the EventOut fields.
+    """
+    calendars = select(Calendar.calendar_id, Calendar.max_event_seconds).where(Calendar.user_id == user_id)
+    if calendar_ids:
+        calendars = calendars.where(Calendar.calendar_id.in_(calendar_ids))
+    rows = (await db.execute(calendars)).all()
+    if not rows:
+        return []
+    longest = max(max_seconds for _, max_seconds in rows)
+    query = overlapping_events_query([calendar_id for calendar_id, _ in rows], longest, start, end)
+    return (await db.execute(query)).all()
+
+def overlapping_events_query(calendar_ids, longest: int, start: datetime, end: datetime):
+    """Events in ``calendar_ids``, none longer than ``longest`` seconds,
+    overlapping [start, end); see find_overlapping_events."""
+    return (
+        select(*(getattr(CalendarEvent, field) for field in EventOut.model_fields))
+        .where(
+            CalendarEvent.calendar_id.in_(calendar_ids),
+            CalendarEvent.start_datetime >= start - timedelta(seconds=longest),
+            CalendarEvent.start_datetime < end,
+            CalendarEvent.end_datetime > start,
+        )
+        .order_by(CalendarEvent.start_datetime, CalendarEvent.event_id)
+    )
+
+@calendar_router.post("", response_model=CalendarOut)
+async def create_calendar(
+    newcalendar: NewCalendar,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    calendar = Calendar(
+        user_id=current_user.user_id,
+        calendar_name=newcalendar.calendar_name,
+        feed_token=secrets.token_urlsafe(32),
+    )
+    db.add(calendar)
+    await db.commit()
+    return CalendarOut.model_validate(calendar)
+
+@calendar_router.post("/{calendar_id}/events", response_model=EventOut)
+async def create_event(
+    calendar_id: int,
+    newevent: NewEvent,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    await get_owned_calendar(db, calendar_id, current_user.user_id)
+    await check_related_reminder(db, newevent.related_reminder_id, current_user.user_id)
+    event = CalendarEvent(calendar_id=calendar_id, **newevent.model_dump())
+    db.add(event)
+    await record_event_change(db, calendar_id, newevent)
+    await db.commit()
+    return EventOut.model_validate(event)
+
+@calendar_router.put("/{calendar_id}/events/{event_id}", response_model=EventOut)
+async def update_event(
+    calendar_id: int,
+    event_id: int,
+    newevent: NewEvent,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    await get_owned_calendar(db, calendar_id, current_user.user_id)
+    event = await db.get(CalendarEvent, event_id)
+    if event is None or event.calendar_id != calendar_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+    await check_related_reminder(db, newevent.related_reminder_id, current_user.user_id)
+    for field, value in newevent.model_dump().items():
+        setattr(event, field, value)
+    await record_event_change(db, calendar_id, newevent)
+    await db.commit()
+    return EventOut.model_validate(event)
+
+@calendar_router.get("/events", response_model=List[EventOut])
+async def events_in_range(
+    start: UTCDatetime,
+    end: UTCDatetime,
+    calendar_id: Optional[List[int]] = Query(None),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session)
+):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return FastJSONResponse(records(await find_overlapping_events(db, current_user.user_id, start, end, calendar_id)))
+
+@calendar_router.get("/events/day", response_model=List[EventOut])
+async def events_on_day(
+    day: coloumns = Depends(),
+    calendar_id: Optional[List[int]] = Query(None),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session)
+):
+    try:
+        start = datetime(day.year, day.month, day.Date)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return FastJSONResponse(records(await find_overlapping_events(db, current_user.user_id, start, start + timedelta(days=1), calendar_id)))
+
+@calendar_router.get("/{calendar_id}/feed")
+async def calendar_feed_url(
+    calendar_id: int,
+    request: Request,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    """The secret subscription URL for a calendar's ICS feed."""
+    calendar = await get_owned_calendar(db, calendar_id, current_user.user_id)
+    if calendar.feed_token is None:
+        calendar.feed_token = secrets.token_urlsafe(32)
+        await db.commit()
+    return {"feed_url": str(request.url_for("calendar_feed", feed_token=calendar.feed_token))}
+
+@calendar_router.get("/feeds/{feed_token}.ics", name="calendar_feed")
+async def calendar_feed(
+    feed_token: str,
+    request: Request,
+    db: AsyncSession = Depends(get_replica_session)
+):
+    """ICS feed for calendar clients. The token in the URL is the only
+    credential, since subscription clients can't send a bearer token.
+
+    The ETag and Last-Modified come from the calendars row alone, so a
+    client polling an unchanged feed gets a 304 without the events table
+    being read.
+    """
+    calendar = (await db.execute(select(Calendar).where(Calendar.feed_token == feed_token))).scalar_one_or_none()
+    if calendar is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendar not found")
+    etag = feed_etag(calendar)
+    last_modified = feed_last_modified(calendar)
+    headers = {"ETag": etag, "Last-Modified": http_date(last_modified), "Cache-Control": "private, no-cache"}
+    if not_modified(request.headers, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return StreamingResponse(iter_calendar(read_session, calendar), media_type="text/calendar; charset=utf-8", headers=headers)
@@ -0,0 +1,116 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse
+from lib.db.connection import SessionLocal
+from routers.auth import user_for_token
+from services.push import PING, get_push_hub
+
+push_router = APIRouter(prefix="/push", tags=["push"])
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+]
+SSE_RETRY_MS = 5000
+
+
+def bearer_token(headers, token):
+    """The bearer token from the Authorization header, else ``?token=``
+    (browsers cannot set headers on EventSource or WebSocket)."""
+    scheme, _, value = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and value:
+        return value
+    return token
+
+
+async def authenticate(token):
+    """Resolve the connection's user once; the session is closed before
+    the connection starts streaming."""
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    async with SessionLocal() as db:
+        return await user_for_token(token, db)
+
+
+async def _until_disconnect(receive, disconnect="http.disconnect"):
+    while (await receive())["type"] != disconnect:
+        pass
+
+
+class EventStream:
+    """``GET /push/events``: Server-Sent Events stream of reminder.due and
+    delivery.status events for the current user.
+
+    A plain ASGI endpoint rather than a StreamingResponse: an idle stream
+    then holds this coroutine and one pending ``receive()``, not the
+    dependency and task-group frames of a regular route, about a third
+    less memory per connection.
+    """
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope)
+        try:
+            user = await authenticate(bearer_token(request.headers, request.query_params.get("token")))
+        except HTTPException as exc:
+            await JSONResponse({"detail": exc.detail}, exc.status_code, exc.headers)(scope, receive, send)
+            return
+        hub = get_push_hub()
+        subscription = hub.subscribe(user.user_id)
+        disconnected = asyncio.ensure_future(_until_disconnect(receive))
+        disconnected.add_done_callback(lambda _: subscription.close())
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+            await send({"type": "http.response.body", "body": f"retry: {SSE_RETRY_MS}\n\n".encode(), "more_body": True})
+            while (messages := await subscription.next()) is not None:
+                if messages is PING:
+                    body = b": ping\n\n"
+                else:
+                    body = "".join(f"event: {event_type}\ndata: {data}\n\n" for event_type, data in messages).encode()
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            hub.unsubscribe(subscription)
+
+
+# add_route() and add_websocket_route() do not apply the router's prefix.
+push_router.add_route(f"{push_router.prefix}/events", EventStream(), methods=["GET"])
+
+
+class EventSocket:
+    """``/push/ws``: the same events as ``/push/events``, one JSON text
+    frame each, as a plain ASGI endpoint for the same reason. Keep-alives
+    are left to the server's WebSocket pings."""
+
+    async def __call__(self, scope, receive, send):
+        websocket = WebSocket(scope, receive, send)
+        try:
+            user = await authenticate(bearer_token(websocket.headers, websocket.query_params.get("token")))
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        await websocket.accept()
+        hub = get_push_hub()
+        subscription = hub.subscribe(user.user_id)
+        # Clients don't send anything; read only to notice the disconnect.
+        disconnected = asyncio.ensure_future(_until_disconnect(receive, "websocket.disconnect"))
+        disconnected.add_done_callback(lambda _: subscription.close())
+        try:
+            while (messages := await subscription.next()) is not None:
+                if messages is PING:
+                    continue
+                for _, data in messages:
+                    await websocket.send_text(data)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            disconnected.cancel()
+            hub.unsubscribe(subscription)
+
+
+push_router.add_websocket_route(f"{push_router.prefix}/ws", EventSocket())
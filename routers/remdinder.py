@@ -0,0 +1,252 @@
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from lib.datetimes import UTCDatetime
+from lib.db.connection import get_session, read_session
+from lib.db.models import Reminder, ReminderForDelivery, ReminderLog
+from lib.responses import FastJSONResponse, records
+from routers.auth import get_current_user, get_read_session
+from routers.todo import PeriorityEnum
+from services.bulk_import import ImportFormatError, detect_format, import_records, iter_records
+from services.pagination import MEDIA_TYPES, InvalidCursor, decode_cursor, fetch_page, stream_rows
+from services.recurrence import RecurrenceError, next_occurrence, occurrences
+from services.retention import archived_rows, retention_settings
+from services.token_cache import AuthenticatedUser
+
+reminder_router = APIRouter(prefix="/reminders", tags=["reminders"])
+
+class Reminders(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    reminder_id: int
+    title: str
+    description: Optional[str] = None
+    reminder_datetime: datetime
+    priority: Optional[str] = None
+    status: Optional[str] = None
+    recurrence_rule: Optional[str] = None
+
+class ReminderPage(BaseModel):
+    items: List[Reminders]
+    next_cursor: Optional[str] = None
+
+class NewReminder(BaseModel):
+    title: str
+    description: Optional[str] = None
+    reminder_datetime: UTCDatetime
+    priority: Optional[PeriorityEnum] = None
+    recurrence_rule: Optional[str] = None
+
+class Occurrence(BaseModel):
+    reminder_id: int
+    title: str
+    occurs_at: datetime
+
+class ReminderLogEntry(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
+    id_log_id: int
+    original_text: Optional[str] = None
+    ai_generated_text: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class DeliveryEntry(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
+    delivery_id: int
+    channel_id: int
+    delivery_status: Optional[str] = None
+    sent_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    attempts: int = 0
+
+class ReminderHistory(BaseModel):
+    logs: List[ReminderLogEntry]
+    deliveries: List[DeliveryEntry]
+
+MAX_HISTORY_WINDOW = timedelta(days=366)
+MAX_OCCURRENCES_WINDOW = timedelta(days=42)
+MAX_OCCURRENCES_PER_RULE = 1000
+
+class ReminderImportRow(BaseModel):
+    model_config = ConfigDict(extra="ignore", use_enum_values=True)
+
+    title: str
+    description: Optional[str] = None
+    reminder_datetime: UTCDatetime
+    priority: Optional[PeriorityEnum] = None
+
+@reminder_router.post("/import")
+async def import_reminders(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    try:
+        fmt = detect_format(request.headers.get("content-type"), format)
+    except ImportFormatError as err:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(err))
+    return await import_records(
+        db,
+        Reminder,
+        ReminderImportRow,
+        iter_records(request.stream(), fmt),
+        {"user_id": current_user.user_id},
+        chunk_size=chunk_size,
+    )
+
+@reminder_router.post("", response_model=Reminders)
+async def adding_new_reminder(
+    newreminder: NewReminder,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    first = newreminder.reminder_datetime
+    if newreminder.recurrence_rule:
+        try:
+            first = next_occurrence(newreminder.recurrence_rule, newreminder.reminder_datetime, first, inclusive=True)
+        except RecurrenceError as err:
+            raise HTTPException(status_code=422, detail=str(err))
+        if first is None:
+            raise HTTPException(status_code=422, detail="Recurrence rule has no occurrences")
+    reminder = Reminder(
+        user_id=current_user.user_id,
+        title=newreminder.title,
+        description=newreminder.description,
+        reminder_datetime=first,
+        priority=newreminder.priority.value if newreminder.priority else None,
+        recurrence_rule=newreminder.recurrence_rule,
+        recurrence_start=newreminder.reminder_datetime if newreminder.recurrence_rule else None,
+    )
+    db.add(reminder)
+    await db.commit()
+    return Reminders.model_validate(reminder)
+
+@reminder_router.get("/occurrences", response_model=List[Occurrence])
+async def reminder_occurrences(
+    start: UTCDatetime,
+    end: UTCDatetime,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """One-off reminders in the window plus recurring ones expanded over it.
+
+    Recurring reminders are expanded from their next pending occurrence,
+    so occurrences that already fired are not listed. The window may span
+    at most six weeks (a month grid), and each rule lists at most its
+    first ``MAX_OCCURRENCES_PER_RULE`` occurrences in it.
+    """
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > MAX_OCCURRENCES_WINDOW:
+        raise HTTPException(status_code=400, detail="window must not exceed 42 days")
+    result = []
+    rows = await db.execute(
+        select(Reminder.reminder_id, Reminder.title, Reminder.reminder_datetime, Reminder.recurrence_rule, Reminder.recurrence_start)
+        .where(
+            Reminder.user_id == current_user.user_id,
+            Reminder.reminder_datetime < end,
+            (Reminder.reminder_datetime >= start) | Reminder.recurrence_rule.isnot(None),
+        )
+    )
+    for reminder_id, title, next_at, rule, rule_start in rows:
+        if rule is None:
+            result.append({"reminder_id": reminder_id, "title": title, "occurs_at": next_at})
+            continue
+        try:
+            expanded = islice(occurrences(rule, rule_start or next_at, max(start, next_at), end, resume=next_at), MAX_OCCURRENCES_PER_RULE)
+            result.extend({"reminder_id": reminder_id, "title": title, "occurs_at": at} for at in expanded)
+        except RecurrenceError:
+            result.append({"reminder_id": reminder_id, "title": title, "occurs_at": next_at})
+    result.sort(key=lambda occurrence: (occurrence["occurs_at"], occurrence["reminder_id"]))
+    return FastJSONResponse(result)
+
+def reminders_query(user_id: int, status_filter: Optional[str] = None, priority: Optional[PeriorityEnum] = None):
+    """The user's reminders with the Reminders fields, unordered; list_reminders pages it."""
+    query = select(*(getattr(Reminder, field) for field in Reminders.model_fields)).where(Reminder.user_id == user_id)
+    if status_filter is not None:
+        query = query.where(Reminder.status == status_filter)
+    if priority is not None:
+        query = query.where(Reminder.priority == priority.value)
+    return query
+
+@reminder_router.get("", response_model=ReminderPage)
+async def list_reminders(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    priority: Optional[PeriorityEnum] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """Reminders by (reminder_datetime, reminder_id). Paged and streamed
+    the same way as GET /todos."""
+    query = reminders_query(current_user.user_id, status_filter, priority)
+    try:
+        if cursor is not None:
+            decode_cursor(cursor)
+        if stream:
+            return StreamingResponse(
+                stream_rows(partial(read_session, current_user.user_id), query, Reminder.reminder_datetime, Reminder.reminder_id, cursor, stream),
+                media_type=MEDIA_TYPES[stream],
+            )
+        items, next_cursor = await fetch_page(db, query, Reminder.reminder_datetime, Reminder.reminder_id, cursor, limit)
+    except InvalidCursor as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return FastJSONResponse({"items": records(items), "next_cursor": next_cursor})
+
+
+def log_history_query(reminder_id: int, start: datetime, end: datetime):
+    return select(ReminderLog.__table__).where(
+        ReminderLog.reminder_id == reminder_id, ReminderLog.created_at >= start, ReminderLog.created_at < end
+    )
+
+def delivery_history_query(reminder_id: int, start: datetime, end: datetime):
+    occurred = func.coalesce(ReminderForDelivery.created_at, ReminderForDelivery.sent_at)
+    return select(ReminderForDelivery.__table__).where(
+        ReminderForDelivery.reminder_id == reminder_id,
+        (occurred.is_(None)) | ((occurred >= start) & (occurred < end)),
+    )
+
+@reminder_router.get("/{reminder_id}/history", response_model=ReminderHistory)
+async def reminder_history(
+    reminder_id: int,
+    start: UTCDatetime,
+    end: UTCDatetime,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """Logs and deliveries of one reminder in ``[start, end)``, from the
+    hot tables and the retention archive. The window may span at most a
+    year, since archived months are read from files."""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > MAX_HISTORY_WINDOW:
+        raise HTTPException(status_code=400, detail="window must not exceed 366 days")
+    owned = await db.scalar(
+        select(Reminder.reminder_id).where(Reminder.reminder_id == reminder_id, Reminder.user_id == current_user.user_id)
+    )
+    if owned is None:
+        raise HTTPException(status_code=404, detail="Reminder not found")
+    logs = (await db.execute(log_history_query(reminder_id, start, end))).mappings().all()
+    deliveries = (await db.execute(delivery_history_query(reminder_id, start, end))).mappings().all()
+    # A row can be in both while an archival batch is between writing its
+    # file and deleting; the hot copy wins.
+    archive_dir = retention_settings()["archive_dir"]
+    log_rows = {row["id_log_id"]: row for row in await archived_rows(archive_dir, ReminderLog.__tablename__, start, end, reminder_id)}
+    log_rows.update((row["id_log_id"], row) for row in logs)
+    delivery_rows = {row["delivery_id"]: row for row in await archived_rows(archive_dir, ReminderForDelivery.__tablename__, start, end, reminder_id)}
+    delivery_rows.update((row["delivery_id"], row) for row in deliveries)
+    return ReminderHistory(
+        logs=[ReminderLogEntry.model_validate(row) for _, row in sorted(log_rows.items())],
+        deliveries=[DeliveryEntry.model_validate(row) for _, row in sorted(delivery_rows.items())],
+    )
@@ -1,11 +1,24 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import
+from datetime import datetime
+from functools import partial
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from lib.datetimes import UTCDatetime
+from lib.db.connection import get_session, read_session
+from lib.db.models import Todo
+from lib.responses import FastJSONResponse, records
+from routers.auth import get_current_user, get_read_session
+from services.bulk_import import ImportFormatError, detect_format, import_records, iter_records
+from services.pagination import MEDIA_TYPES, InvalidCursor, decode_cursor, fetch_page, stream_rows
+from services.token_cache import AuthenticatedUser
 import enum
 
-app = FastAPI()
+todo_router = APIRouter(prefix="/todos", tags=["todos"])
 
-# Enumeration portion 
+# Enumeration portion
 class PeriorityEnum(str, enum.Enum):
     low = "low"
     medium = "medium"
@@ -14,20 +27,102 @@ class PeriorityEnum(str, enum.Enum):
 class StatusEnum(str, enum.Enum):
     pending = "Pending"
     inPrograss = "In Prograss"
-    completed = "Completed"     
+    completed = "Completed"
 
 class Todos(BaseModel):
-    __tablename__ = "todos"
-    todo_id = 
+    model_config = ConfigDict(from_attributes=True)
+
+    todo_id: int
+    title: str
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    status: Optional[str] = None
+
+class TodoPage(BaseModel):
+    items: List[Todos]
+    next_cursor: Optional[str] = None
 
 class NewTask(BaseModel):
-    user_id: str
     title: str
     description: str
-    due_date: int
-    status: str
+    due_date: UTCDatetime
+    status: StatusEnum = StatusEnum.pending
+
+class TodoImportRow(BaseModel):
+    model_config = ConfigDict(extra="ignore", use_enum_values=True, validate_default=True)
+
+    title: str
+    description: Optional[str] = None
+    due_date: Optional[UTCDatetime] = None
+    status: StatusEnum = StatusEnum.pending
+
+@todo_router.post("", response_model=Todos)
+async def adding_new_task(
+    newtask: NewTask,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    new_task = Todo(
+        user_id=current_user.user_id,
+        title=newtask.title,
+        description=newtask.description,
+        due_date=newtask.due_date,
+        status=newtask.status.value,
+    )
+    db.add(new_task)
+    await db.commit()
+    return Todos.model_validate(new_task)
+
+@todo_router.post("/import")
+async def import_tasks(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session)
+):
+    try:
+        fmt = detect_format(request.headers.get("content-type"), format)
+    except ImportFormatError as err:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(err))
+    return await import_records(
+        db,
+        Todo,
+        TodoImportRow,
+        iter_records(request.stream(), fmt),
+        {"user_id": current_user.user_id},
+        chunk_size=chunk_size,
+    )
+
+def todos_query(user_id: int, status_filter: Optional[StatusEnum] = None):
+    """The user's todos with the Todos fields, unordered; list_tasks pages it."""
+    query = select(*(getattr(Todo, field) for field in Todos.model_fields)).where(Todo.user_id == user_id)
+    if status_filter is not None:
+        query = query.where(Todo.status == status_filter.value)
+    return query
 
-@app.post("/todos")
-def adding_new_task(newtask: NewTask):
-    new_task = newtask.model_drop()
-    return new_task
\ No newline at end of file
+@todo_router.get("", response_model=TodoPage)
+async def list_tasks(
+    status_filter: Optional[StatusEnum] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """Todos by (due_date, todo_id), undated ones first. Pass the returned
+    ``next_cursor`` back as ``cursor`` for the next page, or set ``stream``
+    to get every remaining row in one streamed body."""
+    query = todos_query(current_user.user_id, status_filter)
+    try:
+        if cursor is not None:
+            decode_cursor(cursor)
+        if stream:
+            return StreamingResponse(
+                stream_rows(partial(read_session, current_user.user_id), query, Todo.due_date, Todo.todo_id, cursor, stream),
+                media_type=MEDIA_TYPES[stream],
+            )
+        items, next_cursor = await fetch_page(db, query, Todo.due_date, Todo.todo_id, cursor, limit)
+    except InvalidCursor as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return FastJSONResponse({"items": records(items), "next_cursor": next_cursor})
@@ -0,0 +1,216 @@
+import codecs
+import csv
+import json
+from collections import deque
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+
+CONTENT_TYPES = {
+    "application/x-ndjson": FORMAT_NDJSON,
+    "application/jsonl": FORMAT_NDJSON,
+    "application/json-seq": FORMAT_NDJSON,
+    "text/csv": FORMAT_CSV,
+}
+
+# Longest line, or CSV record with its quoted line breaks, in characters.
+MAX_RECORD_LENGTH = 1 << 20
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class RecordTooLong(ImportFormatError):
+    pass
+
+
+class _NeedMore(Exception):
+    pass
+
+
+def detect_format(content_type, requested=None):
+    if requested:
+        if requested not in (FORMAT_NDJSON, FORMAT_CSV):
+            raise ImportFormatError(f"Unsupported import format: {requested}")
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in CONTENT_TYPES:
+        raise ImportFormatError(f"Unsupported content type: {media_type or 'none'}")
+    return CONTENT_TYPES[media_type]
+
+
+async def iter_lines(chunks, max_length=MAX_RECORD_LENGTH):
+    """Split a byte stream into decoded lines, holding at most one partial
+    line between chunks. Raises ``RecordTooLong`` for a line longer than
+    ``max_length`` characters instead of buffering it."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if len(line) > max_length:
+                raise RecordTooLong(f"line longer than {max_length} characters")
+            yield line
+        if len(pending) > max_length:
+            raise RecordTooLong(f"line longer than {max_length} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+class _LineFeed:
+    """The input of a ``csv.reader``, fed lines as they arrive.
+
+    csv.reader pulls lines synchronously and forgets a half-parsed record
+    when its input raises. So running dry in the middle of a record
+    raises ``_NeedMore`` and puts the record's lines back, to be parsed
+    again from its first line once more have arrived; ``max_length``
+    bounds what that can cost.
+    """
+
+    def __init__(self, max_length):
+        self.lines = deque()
+        self.record = []
+        self.record_length = 0
+        self.max_length = max_length
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            if self.closed:
+                raise StopIteration
+            self.lines.extendleft(reversed(self.record))
+            self.take_record()
+            raise _NeedMore
+        line = self.lines.popleft()
+        self.record.append(line)
+        self.record_length += len(line)
+        if self.record_length > self.max_length:
+            raise RecordTooLong(f"record longer than {self.max_length} characters")
+        return line + "\n"
+
+    def take_record(self):
+        """Number of lines the record just read spans."""
+        lines = len(self.record)
+        self.record = []
+        self.record_length = 0
+        return lines
+
+
+def _read_csv(reader, feed):
+    """Yield ``(lines, values)`` for each record the lines fed so far
+    complete; ``values`` is an error message if the record is malformed."""
+    while feed.lines or feed.closed:
+        try:
+            values = next(reader)
+        except (_NeedMore, StopIteration):
+            return
+        except csv.Error as err:
+            values = "unterminated quoted field" if "unexpected end of data" in str(err) else f"invalid CSV: {err}"
+        yield feed.take_record(), values
+
+
+async def iter_records(chunks, fmt, max_length=MAX_RECORD_LENGTH):
+    """Yield ``(line_no, record)`` from an NDJSON or CSV byte stream.
+
+    ``record`` is a dict, or an error message if the line itself could not
+    be parsed. CSV needs a header row; a quoted CSV field may span lines,
+    and the record is numbered by its first. A line or CSV record longer
+    than ``max_length`` characters is reported and ends the import, since
+    where it ends cannot be known without reading it.
+    """
+    line_no = 0
+    if fmt == FORMAT_NDJSON:
+        try:
+            async for line in iter_lines(chunks, max_length):
+                line_no += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as err:
+                    yield line_no, f"invalid JSON: {err}"
+                    continue
+                yield line_no, record if isinstance(record, dict) else "expected a JSON object"
+        except RecordTooLong as err:
+            yield line_no + 1, str(err)
+        return
+
+    feed = _LineFeed(max_length)
+    reader = csv.reader(feed, strict=True)
+    header = None
+    try:
+        lines = iter_lines(chunks, max_length)
+        while not feed.closed:
+            try:
+                feed.lines.append(await anext(lines))
+            except StopAsyncIteration:
+                feed.closed = True
+            for spanned, values in _read_csv(reader, feed):
+                start = line_no + 1
+                line_no += spanned
+                if isinstance(values, str):
+                    yield start, values
+                    continue
+                if not values or (len(values) == 1 and not values[0].strip()):
+                    continue
+                if header is None:
+                    header = [name.strip() for name in values]
+                    continue
+                if len(values) != len(header):
+                    yield start, f"expected {len(header)} columns, got {len(values)}"
+                    continue
+                yield start, {name: (value if value != "" else None) for name, value in zip(header, values)}
+    except RecordTooLong as err:
+        yield line_no + 1, str(err)
+
+
+async def import_records(session, model, row_model, records, fixed_values, chunk_size=1000, max_errors=100):
+    """Validate records with ``row_model`` and insert them into ``model``
+    in multi-row INSERTs of ``chunk_size`` rows, committing each chunk.
+
+    ``fixed_values`` (e.g. the owning user_id) is added to every row. A
+    missing value (an empty CSV cell, a JSON null) for a field with a
+    default takes the default. At most ``max_errors`` error details are
+    kept, so a bad upload can't grow the report without bound.
+    """
+    report = {"inserted": 0, "rejected": 0, "errors": [], "errors_truncated": False}
+    chunk = []
+    defaulted = {name for name, field in row_model.model_fields.items() if not field.is_required()}
+
+    def reject(line_no, detail):
+        report["rejected"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"line": line_no, "detail": detail})
+        else:
+            report["errors_truncated"] = True
+
+    async def flush():
+        await session.execute(insert(model), chunk)
+        await session.commit()
+        report["inserted"] += len(chunk)
+        chunk.clear()
+
+    async for line_no, record in records:
+        if isinstance(record, str):
+            reject(line_no, record)
+            continue
+        record = {key: value for key, value in record.items() if value is not None or key not in defaulted}
+        try:
+            row = row_model.model_validate(record)
+        except ValidationError as err:
+            reject(line_no, err.errors(include_url=False, include_context=False, include_input=False))
+            continue
+        chunk.append({**row.model_dump(mode="python"), **fixed_values})
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+    return report
@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import update
+from lib.db.models import ReminderForDelivery
+
+DELIVERY_PENDING = "pending"
+DELIVERY_IN_PROGRESS = "in_progress"
+DELIVERY_SENT = "sent"
+DELIVERY_FAILED = "failed"
+
+
+@dataclass
+class DeliveryResult:
+    delivery_id: int
+    status: str
+    sent_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+def digest_text(items):
+    """Body of a digest: the reminders sent together as one message, as
+    ``(title, description)`` pairs."""
+    lines = [f"{len(items)} reminders:"]
+    lines.extend(f"- {title}: {description}" if description else f"- {title}" for title, description in items)
+    return "\n".join(lines)
+
+
+async def record_results(session_factory, results):
+    """Write delivery outcomes back to ``reminder_deliveries`` in one
+    executemany UPDATE keyed by primary key."""
+    if not results:
+        return
+    async with session_factory() as session:
+        await session.execute(
+            update(ReminderForDelivery),
+            [
+                {"delivery_id": result.delivery_id, "delivery_status": result.status, "sent_at": result.sent_at}
+                for result in results
+            ],
+        )
+        await session.commit()
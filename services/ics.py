@@ -0,0 +1,152 @@
+"""iCalendar (RFC 5545) serialization of calendar feeds.
+
+Events are written one VEVENT at a time from a server-side cursor, so a
+feed's memory use does not depend on how many events it has. Event
+times are stored as naive UTC and written with a ``Z`` suffix.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from sqlalchemy import and_, select
+from lib.db.models import Calendar, CalendarEvent, Reminder
+
+PRODID = "-//Orbion//Reminder App//EN"
+
+
+def escape_text(value):
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """Fold a content line to 75 octets, continuation lines starting with a space."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return encoded + b"\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Don't split inside a UTF-8 sequence.
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut])
+        encoded = encoded[cut:]
+        limit = 74
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def format_utc(value):
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def feed_etag(calendar):
+    return f'W/"{calendar.calendar_id}-{calendar.change_counter}"'
+
+
+def feed_last_modified(calendar):
+    return (calendar.updated_at or calendar.created_at or datetime(1970, 1, 1)).replace(microsecond=0)
+
+
+def http_date(value):
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def not_modified(headers, etag, last_modified):
+    """Whether the request's validators match, per RFC 9110 section 13.2.2:
+    If-None-Match wins over If-Modified-Since when both are sent."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        opaque = etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified <= since.replace(tzinfo=None)
+    return False
+
+
+def vevent(row, stamp):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{row.event_id}@orbion",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{format_utc(row.start_datetime)}",
+        f"DTEND:{format_utc(row.end_datetime)}",
+        f"SUMMARY:{escape_text(row.title)}",
+    ]
+    if row.description:
+        lines.append(f"DESCRIPTION:{escape_text(row.description)}")
+    if row.reminder_datetime is not None:
+        lines += [
+            "BEGIN:VALARM",
+            "ACTION:DISPLAY",
+            f"DESCRIPTION:{escape_text(row.reminder_title)}",
+            f"TRIGGER;VALUE=DATE-TIME:{format_utc(row.reminder_datetime)}",
+            "END:VALARM",
+        ]
+    lines.append("END:VEVENT")
+    return b"".join(fold(line) for line in lines)
+
+
+def events_query(calendar_id):
+    """Events with their related one-off reminder. Recurring reminders are
+    left out: the scheduler moves their next occurrence without touching
+    the calendar, which would leave the feed's ETag stale. Only reminders
+    of the calendar's owner are joined, so a foreign related_reminder_id
+    can never leak another account's reminder into the feed."""
+    return (
+        select(
+            CalendarEvent.event_id,
+            CalendarEvent.title,
+            CalendarEvent.description,
+            CalendarEvent.start_datetime,
+            CalendarEvent.end_datetime,
+            Reminder.title.label("reminder_title"),
+            Reminder.reminder_datetime,
+        )
+        .join(Calendar, Calendar.calendar_id == CalendarEvent.calendar_id)
+        .outerjoin(
+            Reminder,
+            and_(
+                Reminder.reminder_id == CalendarEvent.related_reminder_id,
+                Reminder.user_id == Calendar.user_id,
+                Reminder.recurrence_rule.is_(None),
+            ),
+        )
+        .where(CalendarEvent.calendar_id == calendar_id)
+        .order_by(CalendarEvent.start_datetime, CalendarEvent.event_id)
+    )
+
+
+async def iter_calendar(session_factory, calendar, yield_per=1000, flush_bytes=64 * 1024):
+    """Yield the feed in chunks of at least ``flush_bytes``, one per
+    ``yield_per`` rows fetched."""
+    stamp = format_utc(feed_last_modified(calendar))
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{escape_text(calendar.calendar_name)}",
+    ]
+    buffer = bytearray(b"".join(fold(line) for line in header))
+    async with session_factory() as session:
+        result = await session.stream(events_query(calendar.calendar_id).execution_options(yield_per=yield_per))
+        async for partition in result.partitions():
+            for row in partition:
+                buffer += vevent(row, stamp)
+            if len(buffer) >= flush_bytes:
+                yield bytes(buffer)
+                buffer.clear()
+    buffer += fold("END:VCALENDAR")
+    yield bytes(buffer)
@@ -0,0 +1,361 @@
+"""Delivery outbox: ``reminder_deliveries`` used as a durable work queue.
+
+Rows are enqueued as pending in the transaction that fires their
+reminder. Workers claim batches under a lease, heartbeat while sending,
+and write outcomes back only for rows they still hold.
+
+On channels with a digest window, rows are held back until the end of
+the window their user's first pending row opened, so a burst of
+reminders due close together is claimed at once and sent as a single
+digest message. Run a worker with:
+
+    python -m services.outbox --worker-id node1-w1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from functools import partial
+from sqlalchemy import and_, bindparam, case, func, insert, or_, select, update
+from lib.db.models import Reminder, ReminderForDelivery
+from services.deliveries import (
+    DELIVERY_FAILED,
+    DELIVERY_IN_PROGRESS,
+    DELIVERY_PENDING,
+    DELIVERY_SENT,
+    DeliveryResult,
+)
+from services.settings_cache import get_delivery_settings_cache
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_EMAIL = "email"
+CHANNEL_WHATSAPP = "whatsapp"
+
+deliveries = ReminderForDelivery.__table__
+
+
+async def enqueue(session, due_reminders, settings_cache=None):
+    """Insert a pending delivery for every active channel the reminder's
+    owner has settings for. Meant to be the scheduler's ``deliver``
+    callback, so the rows commit together with the reminder status.
+    Channels and settings are read through the delivery settings cache."""
+    settings_cache = settings_cache or get_delivery_settings_cache()
+    user_ids = {due.user_id for due in due_reminders}
+    delivery_channels = await settings_cache.channels(session)
+    channels = delivery_channels.active
+    lookups = {CHANNEL_EMAIL: settings_cache.smtp_settings, CHANNEL_WHATSAPP: settings_cache.whatsapp_accounts}
+    targets = {}
+    for name, lookup in lookups.items():
+        if name not in channels:
+            continue
+        for user_id, settings in (await lookup(session, user_ids)).items():
+            if settings is not None:
+                targets.setdefault(user_id, []).append(channels[name])
+    now = datetime.utcnow()
+    windows = {
+        channel_id: timedelta(seconds=delivery_channels.digest_windows.get(channel_id, 0))
+        for channel_id in channels.values()
+    }
+    digest_channels = [channel_id for channel_id, window in windows.items() if window]
+    open_digests = await _open_digests(session, user_ids, digest_channels, now) if digest_channels else {}
+    values = []
+    for due in due_reminders:
+        for channel_id in targets.get(due.user_id, ()):
+            not_before = None
+            if windows[channel_id]:
+                not_before = open_digests.setdefault((due.user_id, channel_id), now + windows[channel_id])
+            values.append({
+                "reminder_id": due.reminder_id,
+                "channel_id": channel_id,
+                "delivery_status": DELIVERY_PENDING,
+                "not_before": not_before,
+            })
+    if values:
+        await session.execute(insert(ReminderForDelivery), values)
+    return len(values)
+
+
+async def _open_digests(session, user_ids, channel_ids, now):
+    """The end of each (user, channel) digest window still collecting
+    rows: pending rows held back past ``now``."""
+    rows = await session.execute(
+        select(Reminder.user_id, deliveries.c.channel_id, func.max(deliveries.c.not_before))
+        .join(Reminder, Reminder.reminder_id == deliveries.c.reminder_id)
+        .where(
+            deliveries.c.delivery_status == DELIVERY_PENDING,
+            deliveries.c.not_before > now,
+            deliveries.c.channel_id.in_(channel_ids),
+            Reminder.user_id.in_(user_ids),
+        )
+        .group_by(Reminder.user_id, deliveries.c.channel_id)
+    )
+    return {(user_id, channel_id): not_before for user_id, channel_id, not_before in rows}
+
+
+def _claimable(now):
+    return or_(
+        and_(
+            deliveries.c.delivery_status == DELIVERY_PENDING,
+            or_(deliveries.c.not_before.is_(None), deliveries.c.not_before <= now),
+        ),
+        and_(deliveries.c.delivery_status == DELIVERY_IN_PROGRESS, deliveries.c.locked_until < now),
+    )
+
+
+def claimable_query(now, limit):
+    """``(delivery_id, channel_id)`` of the first ``limit`` claimable deliveries."""
+    return (
+        select(deliveries.c.delivery_id, deliveries.c.channel_id)
+        .where(_claimable(now))
+        .order_by(deliveries.c.delivery_id)
+        .limit(limit)
+    )
+
+
+async def claim(session_factory, worker_id, limit, lease):
+    """Lease up to ``limit`` claimable deliveries to ``worker_id``.
+
+    Claimable means pending, or in progress under an expired lease.
+    Returns ``(delivery_id, channel_id)`` pairs. On MySQL the rows are
+    picked with ``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent
+    workers skip each other's rows instead of queueing on them. SQLite
+    has no row locks and serializes writers; there a single
+    ``UPDATE ... RETURNING`` picks and leases the rows in one step.
+    """
+    now = datetime.utcnow()
+    lease_values = {
+        "delivery_status": DELIVERY_IN_PROGRESS,
+        "locked_by": worker_id,
+        "locked_until": now + lease,
+    }
+    async with session_factory() as session:
+        if session.bind.dialect.name == "sqlite":
+            picked = claimable_query(now, limit).with_only_columns(deliveries.c.delivery_id).scalar_subquery()
+            rows = (await session.execute(
+                update(deliveries)
+                .where(deliveries.c.delivery_id.in_(picked))
+                .values(**lease_values)
+                .returning(deliveries.c.delivery_id, deliveries.c.channel_id)
+            )).all()
+        else:
+            rows = (await session.execute(claimable_query(now, limit).with_for_update(skip_locked=True))).all()
+            if rows:
+                await session.execute(
+                    update(deliveries)
+                    .where(deliveries.c.delivery_id.in_([row[0] for row in rows]))
+                    .values(**lease_values)
+                )
+        await session.commit()
+    return [tuple(row) for row in rows]
+
+
+async def extend_lease(session_factory, worker_id, delivery_ids, lease):
+    """Heartbeat: push the lease out on rows this worker still holds."""
+    async with session_factory() as session:
+        await session.execute(
+            update(deliveries)
+            .where(deliveries.c.delivery_id.in_(delivery_ids), deliveries.c.locked_by == worker_id)
+            .values(locked_until=datetime.utcnow() + lease)
+        )
+        await session.commit()
+
+
+async def complete(session_factory, worker_id, results, max_attempts=3):
+    """Record outcomes in as few UPDATEs as possible.
+
+    Rows sent in one digest share their ``sent_at`` and are updated by
+    one ``IN`` statement; other sent rows go in an executemany, and all
+    failures in one more statement. Failures go back to pending until
+    ``max_attempts`` is reached. Rows whose lease was taken over by
+    another worker are left alone.
+    """
+    by_sent_at = {}
+    for result in results:
+        if result.status == DELIVERY_SENT:
+            by_sent_at.setdefault(result.sent_at, []).append(result.delivery_id)
+    digests = [(sent_at, ids) for sent_at, ids in by_sent_at.items() if len(ids) > 1]
+    sent = [
+        {"b_id": ids[0], "b_sent_at": sent_at}
+        for sent_at, ids in by_sent_at.items() if len(ids) == 1
+    ]
+    failed = [result.delivery_id for result in results if result.status != DELIVERY_SENT]
+    done = {
+        "delivery_status": DELIVERY_SENT,
+        "attempts": deliveries.c.attempts + 1,
+        "locked_by": None,
+        "locked_until": None,
+    }
+    async with session_factory() as session:
+        for sent_at, ids in digests:
+            await session.execute(
+                update(deliveries)
+                .where(deliveries.c.delivery_id.in_(ids), deliveries.c.locked_by == worker_id)
+                .values(sent_at=sent_at, **done)
+            )
+        if sent:
+            await session.execute(
+                update(deliveries)
+                .where(deliveries.c.delivery_id == bindparam("b_id"), deliveries.c.locked_by == worker_id)
+                .values(sent_at=bindparam("b_sent_at"), **done),
+                sent,
+            )
+        if failed:
+            await session.execute(
+                update(deliveries)
+                .where(deliveries.c.delivery_id.in_(failed), deliveries.c.locked_by == worker_id)
+                .values(
+                    delivery_status=case(
+                        (deliveries.c.attempts + 1 >= max_attempts, DELIVERY_FAILED),
+                        else_=DELIVERY_PENDING,
+                    ),
+                    attempts=deliveries.c.attempts + 1,
+                    locked_by=None,
+                    locked_until=None,
+                )
+            )
+        await session.commit()
+
+
+class OutboxWorker:
+    """Claims delivery batches and hands them to the sender for their channel.
+
+    ``senders`` maps a channel name to an object with
+    ``send_deliveries(delivery_ids)`` returning DeliveryResult objects,
+    like SmtpDeliveryEngine and WhatsappDeliveryClient. On channels with
+    a digest window it is called with ``digest=True``. ``notify(results)``,
+    if given, is awaited after each batch's outcomes are recorded.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        senders,
+        worker_id=None,
+        batch_size=100,
+        lease=timedelta(seconds=60),
+        poll_interval=1.0,
+        max_attempts=3,
+        settings_cache=None,
+        notify=None,
+    ):
+        self.session_factory = session_factory
+        self.senders = senders
+        self.notify = notify
+        self.settings_cache = settings_cache or get_delivery_settings_cache()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.processed = 0
+        self._running = False
+
+    async def _channels(self):
+        async with self.session_factory() as session:
+            return await self.settings_cache.channels(session)
+
+    async def _heartbeat(self, delivery_ids):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                await extend_lease(self.session_factory, self.worker_id, delivery_ids, self.lease)
+            except Exception:
+                logger.exception("Extending the lease on %d deliveries failed", len(delivery_ids))
+
+    async def run_once(self):
+        """Claim and process one batch. Returns the number of rows claimed."""
+        claimed = await claim(self.session_factory, self.worker_id, self.batch_size, self.lease)
+        if not claimed:
+            return 0
+        channels = await self._channels()
+        by_channel = {}
+        for delivery_id, channel_id in claimed:
+            by_channel.setdefault(channel_id, []).append(delivery_id)
+        heartbeat = asyncio.create_task(self._heartbeat([row[0] for row in claimed]))
+        try:
+            results = []
+            for channel_id, delivery_ids in by_channel.items():
+                channel_name = channels.names.get(channel_id)
+                sender = self.senders.get(channel_name)
+                if sender is None:
+                    logger.error("No sender for channel %r; failing %d deliveries", channel_name, len(delivery_ids))
+                    results.extend(DeliveryResult(delivery_id, DELIVERY_FAILED) for delivery_id in delivery_ids)
+                    continue
+                try:
+                    if channels.digest_windows.get(channel_id):
+                        results.extend(await sender.send_deliveries(delivery_ids, digest=True))
+                    else:
+                        results.extend(await sender.send_deliveries(delivery_ids))
+                except Exception:
+                    # Counted as a failed attempt, so a delivery that
+                    # always breaks the sender ends up failed instead of
+                    # taking down every worker that claims it.
+                    logger.exception("Sending %d %s deliveries failed", len(delivery_ids), channel_name)
+                    results.extend(DeliveryResult(delivery_id, DELIVERY_FAILED) for delivery_id in delivery_ids)
+        finally:
+            heartbeat.cancel()
+        await complete(self.session_factory, self.worker_id, results, self.max_attempts)
+        self.processed += len(claimed)
+        if self.notify is not None:
+            try:
+                await self.notify(results)
+            except Exception:
+                logger.exception("Notifying %d delivery outcomes failed", len(results))
+        return len(claimed)
+
+    async def run(self):
+        self._running = True
+        while self._running:
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                # Rows claimed by the failed batch go back to the pool
+                # when their lease expires.
+                logger.exception("Outbox batch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
+
+
+async def _main(args):
+    from lib.db.connection import SessionLocal, get_engine
+    from services.push import get_publisher_hub, publish_delivery_results
+    from services.smtp_delivery import SmtpDeliveryEngine
+    from services.whatsapp_delivery import WhatsappDeliveryClient
+
+    senders = {
+        CHANNEL_EMAIL: SmtpDeliveryEngine(SessionLocal),
+        CHANNEL_WHATSAPP: WhatsappDeliveryClient(SessionLocal),
+    }
+    hub = get_publisher_hub()
+    if hub is not None:
+        await hub.start()
+    worker = OutboxWorker(
+        SessionLocal, senders, worker_id=args.worker_id, batch_size=args.batch_size,
+        lease=timedelta(seconds=args.lease_seconds), poll_interval=args.poll_interval,
+        notify=partial(publish_delivery_results, hub, SessionLocal) if hub else None,
+    )
+    try:
+        await worker.run()
+    finally:
+        for sender in senders.values():
+            await sender.close()
+        if hub is not None:
+            await hub.stop()
+        await get_engine().dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a delivery outbox worker.")
+    parser.add_argument("--worker-id")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--lease-seconds", type=float, default=60)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
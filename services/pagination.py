@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from lib.responses import dumps, records
+
+STREAM_JSON = "json"
+STREAM_NDJSON = "ndjson"
+
+MEDIA_TYPES = {STREAM_JSON: "application/json", STREAM_NDJSON: "application/x-ndjson"}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    payload = [sort_value.isoformat() if sort_value is not None else None, row_id]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+        if not isinstance(row_id, int):
+            raise TypeError("row id must be an integer")
+        return (datetime.fromisoformat(sort_value) if sort_value is not None else None), row_id
+    except (ValueError, TypeError) as err:
+        raise InvalidCursor("Invalid cursor") from err
+
+
+def after_cursor(sort_column, id_column, cursor):
+    """Rows after ``cursor`` in ``(sort_column, id_column)`` order.
+
+    NULLs sort first in ascending order on both MySQL and SQLite, so a NULL
+    cursor continues through the remaining NULL rows and then every
+    non-NULL one, while a non-NULL cursor never matches NULLs. The
+    ``>=`` term gives the index scan a start key.
+    """
+    sort_value, row_id = cursor
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > row_id), sort_column.isnot(None))
+    return and_(sort_column >= sort_value, or_(sort_column > sort_value, id_column > row_id))
+
+
+def keyset(query, sort_column, id_column, cursor=None):
+    if cursor is not None:
+        query = query.where(after_cursor(sort_column, id_column, decode_cursor(cursor)))
+    return query.order_by(sort_column, id_column)
+
+
+async def fetch_page(session, query, sort_column, id_column, cursor, limit):
+    """One page of ``query`` as ``Row`` tuples and the cursor for the next
+    one (None on the last page). One extra row is read to tell whether
+    there is a next page."""
+    rows = (await session.execute(keyset(query, sort_column, id_column, cursor).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor(last[sort_column.key], last[id_column.key])
+    return rows, next_cursor
+
+
+async def stream_rows(session_factory, query, sort_column, id_column, cursor, fmt, yield_per=500):
+    """Serialize ``query`` row by row as a JSON array or NDJSON, one object
+    per row keyed by column label.
+
+    Rows come from a server-side cursor ``yield_per`` at a time, so memory
+    stays flat however many rows match. The session is opened here rather
+    than taken from the request, because the body is written after the
+    endpoint has returned.
+    """
+    query = keyset(query, sort_column, id_column, cursor).execution_options(yield_per=yield_per)
+    separator = b"\n" if fmt == STREAM_NDJSON else b","
+    async with session_factory() as session:
+        result = await session.stream(query)
+        if fmt == STREAM_JSON:
+            yield b"["
+        first = True
+        async for partition in result.partitions():
+            chunk = separator.join(dumps(record) for record in records(partition))
+            if fmt == STREAM_JSON and not first:
+                chunk = separator + chunk
+            elif fmt == STREAM_NDJSON:
+                chunk += separator
+            first = False
+            yield chunk
+        if fmt == STREAM_JSON:
+            yield b"]"
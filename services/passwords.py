@@ -0,0 +1,92 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from bcrypt import checkpw, gensalt, hashpw
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full and the call was rejected."""
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return hashpw(password, gensalt(rounds))
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    return checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a bounded worker pool.
+
+    At most ``workers`` calls run at once and at most ``max_queue`` more
+    may wait for a slot; anything beyond that raises PasswordHasherBusy
+    instead of piling up behind a login burst. ``executor="inline"``
+    runs bcrypt on the calling thread, for comparisons and scripts.
+    """
+
+    def __init__(self, workers=4, max_queue=64, rounds=12, executor="thread"):
+        if executor not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.executor_kind = executor
+        self._executor = None
+        self._slots = asyncio.Semaphore(workers)
+        self._pending = 0
+
+    @property
+    def queue_depth(self):
+        return max(self._pending - self.workers, 0)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def start(self):
+        """Create the worker pool now rather than on the first call."""
+        if self.executor_kind != "inline":
+            self._get_executor()
+
+    async def _run(self, fn, *args):
+        if self.executor_kind == "inline":
+            return fn(*args)
+        if self._pending >= self.workers + self.max_queue:
+            raise PasswordHasherBusy()
+        self._pending += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(_hash, password.encode('utf-8'), self.rounds)
+        return hashed.decode('utf-8')
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_hasher = None
+
+def get_password_hasher():
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(
+            workers=int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)),
+            max_queue=int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 64)),
+            rounds=int(os.environ.get("BCRYPT_ROUNDS", 12)),
+            executor=os.environ.get("PASSWORD_HASH_EXECUTOR", "thread"),
+        )
+    return _hasher
@@ -0,0 +1,308 @@
+"""Push of reminder events to connected clients.
+
+Each SSE or WebSocket connection holds one ``Subscription`` on the
+process's ``PushHub``, keyed by user. Publishers (the scheduler, outbox
+workers) hand events to a broker, which delivers them to the hub of
+every API process; the hub serializes each event once and appends it
+to the user's subscriptions. ``PUSH_BROKER`` must be set:
+``RedisBroker`` (``redis``, needs the ``redis`` package) fans out
+across processes and nodes; ``LocalBroker`` (``local``) only reaches the
+current process, so the scheduler and outbox workers, which run in
+their own, push nothing with it.
+
+An idle subscription is a few small objects and no task or timer: one
+hub-wide heartbeat wakes every connection to send a keep-alive.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import select
+from lib.db.models import Reminder, ReminderForDelivery
+
+logger = logging.getLogger(__name__)
+
+REMINDER_DUE = "reminder.due"
+DELIVERY_STATUS = "delivery.status"
+
+# next() returns this when a keep-alive is due and nothing was published.
+PING = ()
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def encode_event(event):
+    """``(type, json)`` for an event dict with a ``type`` key."""
+    return event["type"], json.dumps(event, separators=(",", ":"), default=_encode)
+
+
+class Subscription:
+    """One connection's buffer of encoded events.
+
+    At most ``max_pending`` events are kept for a slow client; older ones
+    are dropped and counted.
+    """
+
+    __slots__ = ("user_id", "max_pending", "dropped", "closed", "_events", "_waiter", "_ping")
+
+    def __init__(self, user_id, max_pending):
+        self.user_id = user_id
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.closed = False
+        self._events = None
+        self._waiter = None
+        self._ping = False
+
+    def push(self, message):
+        if self._events is None:
+            self._events = deque()
+        self._events.append(message)
+        if len(self._events) > self.max_pending:
+            self._events.popleft()
+            self.dropped += 1
+        self._wake()
+
+    def ping(self):
+        self._ping = True
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def next(self):
+        """The pending ``(type, json)`` messages, ``PING`` for a keep-alive,
+        or None once closed."""
+        while not self.closed:
+            if self._events:
+                messages, self._events = list(self._events), None
+                return messages
+            if self._ping:
+                self._ping = False
+                return PING
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return None
+
+
+class LocalBroker:
+    """Delivers published events to this process's hub only."""
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, user_id, message):
+        self._deliver(user_id, message)
+
+    async def stop(self):
+        pass
+
+
+class RedisBroker:
+    """Fans events out to every node over one Redis pub/sub channel.
+
+    If the subscription drops, the listener resubscribes with exponential
+    backoff up to ``max_backoff`` seconds; events published meanwhile are
+    lost, as pub/sub keeps nothing. Messages that do not decode are
+    logged and skipped."""
+
+    def __init__(self, url, channel="orbion:push", max_backoff=30.0):
+        self.url = url
+        self.channel = channel
+        self.max_backoff = max_backoff
+        self._redis = None
+        self._listener = None
+
+    async def start(self, deliver):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(self.url)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(pubsub, deliver))
+
+    async def _listen(self, pubsub, deliver):
+        delay = 0.5
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self._redis.pubsub()
+                    await pubsub.subscribe(self.channel)
+                    logger.info("Resubscribed to %s", self.channel)
+                async for item in pubsub.listen():
+                    if item["type"] != "message":
+                        continue
+                    delay = 0.5
+                    try:
+                        user_id, event_type, data = json.loads(item["data"])
+                    except (TypeError, ValueError) as err:
+                        logger.warning("Skipping malformed push message on %s: %s", self.channel, err)
+                        continue
+                    deliver(user_id, (event_type, data))
+            except Exception:
+                logger.exception("Push subscription to %s failed; retrying in %.1fs", self.channel, delay)
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+                pubsub = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+
+    async def publish(self, user_id, message):
+        await self._redis.publish(self.channel, json.dumps([user_id, *message]))
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+class PushHub:
+    def __init__(self, broker=None, max_pending=100, heartbeat=25.0):
+        self.broker = broker or LocalBroker()
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self.published = 0
+        self.delivered = 0
+        self._subscriptions = {}
+        self._connections = 0
+        self._heartbeat_task = None
+
+    async def start(self):
+        await self.broker.start(self.dispatch)
+        if self._heartbeat_task is None and self.heartbeat > 0:
+            self._heartbeat_task = asyncio.create_task(self._beat())
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+        await self.broker.stop()
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for subscriptions in self._subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.ping()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.max_pending)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        self._connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+        self._connections -= 1
+
+    async def publish(self, user_id, event):
+        """Send ``event`` (a dict with a ``type``) to ``user_id``'s
+        connections on every node."""
+        self.published += 1
+        await self.broker.publish(user_id, encode_event(event))
+
+    def dispatch(self, user_id, message):
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.push(message)
+            self.delivered += 1
+
+    def stats(self):
+        return {
+            "connections": self._connections,
+            "users": len(self._subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(s.dropped for subscriptions in self._subscriptions.values() for s in subscriptions),
+        }
+
+
+async def publish_due(hub, batch):
+    """Push a reminder.due event for each fired ``DueReminder``."""
+    for due in batch:
+        await hub.publish(due.user_id, {"type": REMINDER_DUE, "reminder_id": due.reminder_id, "due_at": due.due_at})
+
+
+async def publish_delivery_results(hub, session_factory, results):
+    """Push a delivery.status event for each ``DeliveryResult``, looking up
+    the owning users in one query."""
+    if not results:
+        return
+    async with session_factory() as session:
+        owners = {
+            delivery_id: (reminder_id, user_id)
+            for delivery_id, reminder_id, user_id in await session.execute(
+                select(ReminderForDelivery.delivery_id, Reminder.reminder_id, Reminder.user_id)
+                .join(Reminder, Reminder.reminder_id == ReminderForDelivery.reminder_id)
+                .where(ReminderForDelivery.delivery_id.in_([result.delivery_id for result in results]))
+            )
+        }
+    for result in results:
+        if result.delivery_id not in owners:
+            continue
+        reminder_id, user_id = owners[result.delivery_id]
+        await hub.publish(user_id, {
+            "type": DELIVERY_STATUS,
+            "delivery_id": result.delivery_id,
+            "reminder_id": reminder_id,
+            "status": result.status,
+            "sent_at": result.sent_at,
+        })
+
+
+_hub = None
+
+def get_push_hub():
+    global _hub
+    if _hub is None:
+        load_dotenv()
+        backend = os.environ.get("PUSH_BROKER")
+        if not backend:
+            raise ValueError("PUSH_BROKER environment variable not set (redis, or local for a single process)")
+        if backend == "local":
+            broker = LocalBroker()
+        elif backend == "redis":
+            broker = RedisBroker(os.environ.get("PUSH_REDIS_URL", "redis://localhost:6379/0"))
+        else:
+            raise ValueError(f"Unknown PUSH_BROKER: {backend}")
+        _hub = PushHub(
+            broker,
+            max_pending=int(os.environ.get("PUSH_MAX_PENDING", 100)),
+            heartbeat=float(os.environ.get("PUSH_HEARTBEAT_SECONDS", 25)),
+        )
+    return _hub
+
+
+def get_publisher_hub():
+    """The hub a scheduler or outbox worker process publishes through, or
+    None if ``PUSH_BROKER=local``: no client subscribes in those
+    processes, so nothing they published would arrive."""
+    hub = get_push_hub()
+    if isinstance(hub.broker, LocalBroker):
+        logger.warning("PUSH_BROKER is local; events from this process will not reach clients")
+        return None
+    return hub
@@ -0,0 +1,70 @@
+import re
+from functools import lru_cache
+from dateutil.rrule import DAILY, HOURLY, MINUTELY, MONTHLY, WEEKLY, YEARLY, rrule, rrulestr
+
+ALLOWED_FREQUENCIES = {YEARLY, MONTHLY, WEEKLY, DAILY, HOURLY, MINUTELY}
+
+
+# RFC 5545 UNTIL in UTC ("...Z"). Rules are anchored at naive UTC
+# datetimes, which dateutil will not compare with an aware UNTIL.
+_UTC_UNTIL = re.compile(r"(UNTIL=\d{8}(?:T\d{6})?)Z", re.IGNORECASE)
+
+
+class RecurrenceError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def parse_rule(text, start):
+    """Parse an RRULE body such as ``FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR``
+    anchored at ``start``. Rules that can fire more than once a minute
+    (SECONDLY, or more than one BYSECOND) are rejected. A UTC ``UNTIL``
+    is read as naive UTC like ``start``. Parsed rules are cached, since
+    the scheduler re-reads the same few rules constantly."""
+    body = text.strip()
+    if body.upper().startswith("RRULE:"):
+        body = body[6:]
+    body = _UTC_UNTIL.sub(r"\1", body)
+    try:
+        rule = rrulestr(body, dtstart=start)
+    except (ValueError, TypeError) as err:
+        raise RecurrenceError(f"Invalid recurrence rule: {err}")
+    if not isinstance(rule, rrule):
+        raise RecurrenceError("Expected a single RRULE")
+    if rule._freq not in ALLOWED_FREQUENCIES or len(rule._bysecond or ()) > 1:
+        raise RecurrenceError("Recurrence must not be more frequent than once a minute")
+    return rule
+
+
+def _resumed(text, start, resume):
+    """The rule re-anchored at ``resume``, a known occurrence.
+
+    dateutil always iterates from dtstart, which gets slower the older the
+    rule is. Re-anchoring at an occurrence yields the same later
+    occurrences: the fields dtstart fills in are the same on every
+    occurrence, and an occurrence lies in a valid INTERVAL period. COUNT
+    is counted from dtstart, so counted rules are not re-anchored.
+    """
+    rule = parse_rule(text, start)
+    if resume is None or resume <= start or rule._count is not None:
+        return rule
+    return parse_rule(text, resume)
+
+
+def next_occurrence(text, start, after, inclusive=False, resume=None):
+    """The first occurrence after ``after``, or None once the rule is exhausted."""
+    return _resumed(text, start, resume).after(after, inc=inclusive)
+
+
+def occurrences(text, start, window_start, window_end, resume=None):
+    """Yield occurrences in ``[window_start, window_end)``.
+
+    Occurrences are generated one at a time from the first one at or after
+    ``window_start``, so only the requested window is ever expanded.
+    ``resume``, if given, must be an occurrence no later than
+    ``window_start``.
+    """
+    for occurrence in _resumed(text, start, resume).xafter(window_start, inc=True):
+        if occurrence >= window_end:
+            return
+        yield occurrence
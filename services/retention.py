@@ -0,0 +1,230 @@
+"""Retention for the append-only ``reminder_logs`` and ``reminder_deliveries``.
+
+Rows older than the retention age are copied into gzipped NDJSON files
+under the archive directory, one directory per table, month and
+``reminder_id`` bucket:
+
+    archive/reminder_deliveries/2030-01/17/000000000001-000000001000.ndjson.gz
+
+and then deleted from the hot table. Reading one reminder's history opens
+only its bucket's files. Each batch is the next ``batch_size`` archivable
+rows in primary key order, written to its files (atomically, via a
+temporary name) and deleted by primary key in its own short transaction,
+so the archiver never holds locks the delivery path needs. A crash
+between writing and deleting leaves the rows in place; the next run
+rewrites the same files. Deliveries are archived only once final (sent
+or failed). Rows enqueued before ``reminder_deliveries.created_at``
+existed are aged by ``sent_at``, or archived as ``undated`` when they
+have neither.
+
+    python -m services.retention --days 90
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable
+from sqlalchemy import and_, delete, or_, select
+from lib.db.models import ReminderForDelivery, ReminderLog
+from services.deliveries import DELIVERY_FAILED, DELIVERY_SENT
+
+logger = logging.getLogger(__name__)
+
+UNDATED = "undated"
+ARCHIVE_BUCKETS = 64
+
+
+@dataclass(frozen=True)
+class RetentionSpec:
+    table: object
+    id_column: object
+    time_columns: tuple
+    # archivable(cutoff): the WHERE clause selecting rows ready to archive.
+    archivable: Callable
+
+    @property
+    def name(self):
+        return self.table.name
+
+    def occurred_at(self, row):
+        """The row's age, from the first time column that is set."""
+        for column in self.time_columns:
+            value = row[column.key]
+            if value is not None:
+                return value
+        return None
+
+
+logs = ReminderLog.__table__
+deliveries = ReminderForDelivery.__table__
+
+
+def _archivable_log(cutoff):
+    return logs.c.created_at < cutoff
+
+
+def _archivable_delivery(cutoff):
+    c = deliveries.c
+    return and_(
+        c.delivery_status.in_([DELIVERY_SENT, DELIVERY_FAILED]),
+        or_(
+            c.created_at < cutoff,
+            and_(c.created_at.is_(None), or_(c.sent_at < cutoff, c.sent_at.is_(None))),
+        ),
+    )
+
+
+SPECS = {
+    logs.name: RetentionSpec(logs, logs.c.id_log_id, (logs.c.created_at,), _archivable_log),
+    deliveries.name: RetentionSpec(
+        deliveries, deliveries.c.delivery_id, (deliveries.c.created_at, deliveries.c.sent_at), _archivable_delivery
+    ),
+}
+
+
+def _month(value):
+    return value.strftime("%Y-%m") if value is not None else UNDATED
+
+
+def _bucket(reminder_id):
+    return f"{reminder_id % ARCHIVE_BUCKETS:02d}"
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _write_archive(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".tmp"
+    with gzip.open(partial, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps({key: _encode(value) for key, value in row.items()}, separators=(",", ":")))
+            f.write("\n")
+    os.replace(partial, path)
+
+
+def archive_path(archive_dir, table_name, month, bucket, first_id, last_id):
+    return os.path.join(archive_dir, table_name, month, bucket, f"{first_id:012d}-{last_id:012d}.ndjson.gz")
+
+
+async def archive_table(session_factory, spec, cutoff, archive_dir, batch_size=1000, pause=0.05, max_rows=None):
+    """Move rows of ``spec``'s table older than ``cutoff`` into archive
+    files, ``batch_size`` rows per transaction, sleeping ``pause``
+    seconds between batches. Returns the number of rows archived."""
+    archived = 0
+    after = 0
+    while max_rows is None or archived < max_rows:
+        limit = batch_size if max_rows is None else min(batch_size, max_rows - archived)
+        async with session_factory() as session:
+            rows = (await session.execute(
+                select(spec.table)
+                .where(spec.archivable(cutoff), spec.id_column > after)
+                .order_by(spec.id_column)
+                .limit(limit)
+            )).mappings().all()
+        if not rows:
+            break
+        by_file = {}
+        for row in rows:
+            key = (_month(spec.occurred_at(row)), _bucket(row["reminder_id"]))
+            by_file.setdefault(key, []).append(dict(row))
+        for (month, bucket), file_rows in by_file.items():
+            ids = [row[spec.id_column.key] for row in file_rows]
+            path = archive_path(archive_dir, spec.name, month, bucket, ids[0], ids[-1])
+            await asyncio.to_thread(_write_archive, path, file_rows)
+        ids = [row[spec.id_column.key] for row in rows]
+        async with session_factory() as session:
+            await session.execute(delete(spec.table).where(spec.id_column.in_(ids)))
+            await session.commit()
+        archived += len(rows)
+        after = ids[-1]
+        if len(rows) < limit:
+            break
+        await asyncio.sleep(pause)
+    return archived
+
+
+async def run_retention(session_factory, days, archive_dir, batch_size=1000, pause=0.05, now=None):
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    return {
+        name: await archive_table(session_factory, spec, cutoff, archive_dir, batch_size, pause)
+        for name, spec in SPECS.items()
+    }
+
+
+def _months(start, end):
+    month = date(start.year, start.month, 1)
+    while month <= end.date():
+        yield month.strftime("%Y-%m")
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _read_archive(archive_dir, spec, start, end, reminder_id):
+    rows = []
+    bucket = _bucket(reminder_id)
+    for month in [*_months(start, end), UNDATED]:
+        directory = os.path.join(archive_dir, spec.name, month, bucket)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".ndjson.gz"):
+                continue
+            with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    if row["reminder_id"] != reminder_id:
+                        continue
+                    for column in spec.time_columns:
+                        if row.get(column.key) is not None:
+                            row[column.key] = datetime.fromisoformat(row[column.key])
+                    occurred = spec.occurred_at(row)
+                    if occurred is None or start <= occurred < end:
+                        rows.append(row)
+    return rows
+
+
+async def archived_rows(archive_dir, table_name, start, end, reminder_id):
+    """Archived rows of ``table_name`` for one reminder whose time falls
+    in ``[start, end)``, plus its undated ones. Only the reminder's
+    bucket in the months of the window is read."""
+    return await asyncio.to_thread(_read_archive, archive_dir, SPECS[table_name], start, end, reminder_id)
+
+
+def retention_settings():
+    return {
+        "days": int(os.environ.get("RETENTION_DAYS", 90)),
+        "archive_dir": os.environ.get("RETENTION_ARCHIVE_DIR", "archive"),
+        "batch_size": int(os.environ.get("RETENTION_BATCH_SIZE", 1000)),
+    }
+
+
+async def _main(args):
+    from lib.db.connection import SessionLocal, get_engine
+
+    settings = retention_settings()
+    try:
+        archived = await run_retention(
+            SessionLocal,
+            args.days or settings["days"],
+            args.archive_dir or settings["archive_dir"],
+            batch_size=args.batch_size or settings["batch_size"],
+            pause=args.pause,
+        )
+        logger.info("Archived %s", archived)
+    finally:
+        await get_engine().dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old reminder logs and deliveries.")
+    parser.add_argument("--days", type=int)
+    parser.add_argument("--archive-dir")
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--pause", type=float, default=0.05)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from sqlalchemy import or_, select, update
+from lib.db.models import Reminder
+from services.outbox import enqueue
+from services.recurrence import RecurrenceError, next_occurrence
+
+logger = logging.getLogger(__name__)
+
+REMINDER_PENDING = "pending"
+REMINDER_QUEUED = "queued"
+
+
+@dataclass(frozen=True)
+class DueReminder:
+    reminder_id: int
+    user_id: int
+    due_at: datetime
+
+
+class SystemClock:
+    def now(self):
+        return datetime.utcnow()
+
+    async def sleep(self, seconds, wakeup: asyncio.Event):
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=max(seconds, 0))
+        except asyncio.TimeoutError:
+            pass
+
+
+def window_query(until, since=None, cursor=None, limit=5000):
+    """A keyset page of pending reminders due in ``[since, until)``,
+    after ``cursor``, a ``(reminder_datetime, reminder_id)`` pair."""
+    query = select(Reminder.reminder_id, Reminder.user_id, Reminder.reminder_datetime).where(
+        Reminder.status == REMINDER_PENDING, Reminder.reminder_datetime < until
+    )
+    if since is not None:
+        query = query.where(Reminder.reminder_datetime >= since)
+    if cursor is not None:
+        query = query.where(
+            or_(
+                Reminder.reminder_datetime > cursor[0],
+                (Reminder.reminder_datetime == cursor[0]) & (Reminder.reminder_id > cursor[1]),
+            )
+        )
+    return query.order_by(Reminder.reminder_datetime, Reminder.reminder_id).limit(limit)
+
+
+def changed_query(changed_since, until):
+    """Pending reminders due before ``until`` written since ``changed_since``."""
+    return select(Reminder.reminder_id, Reminder.user_id, Reminder.reminder_datetime).where(
+        Reminder.status == REMINDER_PENDING,
+        Reminder.updated_at >= changed_since,
+        Reminder.reminder_datetime < until,
+    )
+
+
+class ReminderScheduler:
+    """Fires pending reminders from an in-memory min-heap.
+
+    Reminders due before ``loaded_until`` are held in the heap; the next
+    ``window`` of them is read from the database ``prefetch`` before the
+    current one runs out, in keyset pages of ``page_size`` rows. Between
+    deadlines the loop sleeps until the earliest one instead of polling.
+
+    Reminders written after their window was loaded (by the API, an
+    import, another scheduler) are picked up by ``rescan()`` every
+    ``rescan_interval``, which reads pending reminders whose
+    ``updated_at`` is newer than the last scan, less ``rescan_overlap``
+    for transactions that committed late and for clock skew between
+    hosts. ``schedule()``/``cancel()`` feed changes in directly.
+    Superseded heap entries are skipped when popped rather than removed
+    eagerly; an entry left behind by a reminder that moved, fired or was
+    deleted is dropped when claiming it fails.
+
+    Due reminders are claimed in batches of up to ``batch_size``: their
+    status moves from pending to queued (a recurring reminder stays
+    pending and its ``reminder_datetime`` moves to the next occurrence
+    after now, so occurrences missed while nothing was running fire
+    once, not once each), but only where the row is still pending and
+    due. Of two schedulers racing for a reminder, only the one whose
+    UPDATE matched fires it. The claimed reminders are handed to
+    ``deliver(session, batch)`` in the same transaction, so whatever it
+    writes through ``session`` commits atomically with the claim; by
+    default that is ``services.outbox.enqueue``, which inserts their
+    pending deliveries. Waking ``linger`` after a deadline lets reminders due
+    close together share a batch at the cost of that much extra skew.
+    ``notify(batch)``, if given, is awaited once the batch has committed,
+    e.g. to push reminder.due events to clients.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        deliver=enqueue,
+        clock=None,
+        window=timedelta(minutes=15),
+        prefetch=timedelta(minutes=1),
+        page_size=5000,
+        batch_size=500,
+        linger=timedelta(milliseconds=50),
+        notify=None,
+        rescan_interval=timedelta(seconds=5),
+        rescan_overlap=timedelta(seconds=30),
+    ):
+        self.session_factory = session_factory
+        self.deliver = deliver
+        self.notify = notify
+        self.clock = clock or SystemClock()
+        self.window = window
+        self.prefetch = prefetch
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.linger = linger
+        self.rescan_interval = rescan_interval
+        self.rescan_overlap = rescan_overlap
+        self.loaded_until = None
+        self.scanned_at = None
+        self.next_rescan = None
+        self.fired = 0
+        self._heap = []
+        self._scheduled = {}
+        self._wakeup = asyncio.Event()
+        self._running = False
+
+    @property
+    def pending(self):
+        return len(self._scheduled)
+
+    def schedule(self, reminder_id, user_id, due_at):
+        """Add or move a reminder. Ignored if it falls past the loaded window;
+        the window load that covers it will pick it up."""
+        if self.loaded_until is None or due_at >= self.loaded_until:
+            self._scheduled.pop(reminder_id, None)
+            return
+        entry = (due_at, reminder_id, user_id)
+        self._scheduled[reminder_id] = entry
+        if len(self._heap) > 2 * len(self._scheduled) + 1024:
+            self._heap = list(self._scheduled.values())
+            heapq.heapify(self._heap)
+        else:
+            heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, reminder_id):
+        self._scheduled.pop(reminder_id, None)
+
+    async def load_window(self, until):
+        """Load pending reminders due before ``until`` that are not loaded yet.
+
+        The first call has no lower bound, so reminders that came due
+        while nothing was running fire straight away. Later calls only read
+        past ``loaded_until``; ``rescan()`` covers writes below it.
+        """
+        since = self.loaded_until
+        if self.scanned_at is None:
+            self.scanned_at = self.clock.now()
+        cursor = None
+        loaded = 0
+        try:
+            async with self.session_factory() as session:
+                while True:
+                    rows = (await session.execute(window_query(until, since, cursor, self.page_size))).all()
+                    for reminder_id, user_id, due_at in rows:
+                        entry = (due_at, reminder_id, user_id)
+                        self._scheduled[reminder_id] = entry
+                        self._heap.append(entry)
+                    loaded += len(rows)
+                    if len(rows) < self.page_size:
+                        break
+                    cursor = (rows[-1][2], rows[-1][0])
+        finally:
+            # Pages read before a failure stay loaded; the retry reads
+            # them again and supersedes these entries.
+            heapq.heapify(self._heap)
+        self.loaded_until = until
+        return loaded
+
+    async def rescan(self):
+        """Schedule pending reminders inside the loaded window that were
+        written since the last scan."""
+        started = self.clock.now()
+        async with self.session_factory() as session:
+            rows = (await session.execute(
+                changed_query(self.scanned_at - self.rescan_overlap, self.loaded_until)
+            )).all()
+        scheduled = 0
+        for reminder_id, user_id, due_at in rows:
+            if self._scheduled.get(reminder_id) != (due_at, reminder_id, user_id):
+                self.schedule(reminder_id, user_id, due_at)
+                scheduled += 1
+        self.scanned_at = started
+        return scheduled
+
+    def _pop_due(self, now):
+        batch = []
+        while self._heap and len(batch) < self.batch_size:
+            due_at, reminder_id, user_id = entry = self._heap[0]
+            if self._scheduled.get(reminder_id) is not entry:
+                heapq.heappop(self._heap)
+                continue
+            if due_at > now:
+                break
+            heapq.heappop(self._heap)
+            del self._scheduled[reminder_id]
+            batch.append(DueReminder(reminder_id, user_id, due_at))
+        return batch
+
+    def _advance(self, due, rule, start, now):
+        try:
+            return next_occurrence(rule, start, max(due.due_at, now), resume=due.due_at)
+        except RecurrenceError:
+            logger.exception("Reminder %d has an invalid recurrence rule; not rescheduling", due.reminder_id)
+            return None
+
+    async def _claim(self, session, ids, now):
+        """Mark one-off reminders queued where they are still pending and
+        due; returns the ids this UPDATE claimed."""
+        guard = (Reminder.status == REMINDER_PENDING, Reminder.reminder_datetime <= now)
+        claim = update(Reminder).values(status=REMINDER_QUEUED).execution_options(synchronize_session=False)
+        result = await session.execute(claim.where(Reminder.reminder_id.in_(ids), *guard))
+        if result.rowcount == len(ids):
+            return set(ids)
+        # Some were taken by another scheduler, or moved or deleted since
+        # they were loaded: find out which by claiming one at a time.
+        await session.rollback()
+        claimed = set()
+        for reminder_id in ids:
+            result = await session.execute(claim.where(Reminder.reminder_id == reminder_id, *guard))
+            if result.rowcount:
+                claimed.add(reminder_id)
+        return claimed
+
+    async def _dispatch(self, batch):
+        now = self.clock.now()
+        rescheduled = []
+        async with self.session_factory() as session:
+            rules = {
+                reminder_id: (rule, start)
+                for reminder_id, rule, start in await session.execute(
+                    select(Reminder.reminder_id, Reminder.recurrence_rule, Reminder.recurrence_start).where(
+                        Reminder.reminder_id.in_([due.reminder_id for due in batch]),
+                        Reminder.recurrence_rule.isnot(None),
+                    )
+                )
+            }
+            finished = []
+            advancing = []
+            for due in batch:
+                following = None
+                if due.reminder_id in rules:
+                    rule, start = rules[due.reminder_id]
+                    following = self._advance(due, rule, start or due.due_at, now)
+                if following is None:
+                    finished.append(due.reminder_id)
+                else:
+                    advancing.append((due, following))
+            claimed = await self._claim(session, finished, now) if finished else set()
+            for due, following in advancing:
+                result = await session.execute(
+                    update(Reminder)
+                    .where(
+                        Reminder.reminder_id == due.reminder_id,
+                        Reminder.status == REMINDER_PENDING,
+                        Reminder.reminder_datetime == due.due_at,
+                    )
+                    .values(reminder_datetime=following)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    claimed.add(due.reminder_id)
+                    rescheduled.append(DueReminder(due.reminder_id, due.user_id, following))
+            batch = [due for due in batch if due.reminder_id in claimed]
+            if batch:
+                await self.deliver(session, batch)
+            await session.commit()
+        for due in rescheduled:
+            self.schedule(due.reminder_id, due.user_id, due.due_at)
+        self.fired += len(batch)
+        if batch and self.notify is not None:
+            try:
+                await self.notify(batch)
+            except Exception:
+                logger.exception("Notifying %d fired reminders failed", len(batch))
+
+    async def run(self):
+        """Fire reminders until ``stop()``. An iteration that raises (a
+        window load, rescan or dispatch) is logged and retried after a
+        second; a batch that failed to dispatch is rescheduled first."""
+        self._running = True
+        while self._running:
+            batch = []
+            try:
+                now = self.clock.now()
+                if self.loaded_until is None:
+                    await self.load_window(now + self.window)
+                elif now >= self.loaded_until - self.prefetch:
+                    await self.load_window(self.loaded_until + self.window)
+                if self.next_rescan is None or now >= self.next_rescan:
+                    await self.rescan()
+                    self.next_rescan = now + self.rescan_interval
+                batch = self._pop_due(now)
+                if batch:
+                    await self._dispatch(batch)
+                    continue
+            except Exception:
+                if batch:
+                    logger.exception("Reminder delivery failed, rescheduling %d reminders", len(batch))
+                    for due in batch:
+                        self.schedule(due.reminder_id, due.user_id, due.due_at)
+                else:
+                    logger.exception("Reminder scheduler iteration failed, retrying")
+                self._wakeup.clear()
+                await self.clock.sleep(1, self._wakeup)
+                continue
+            deadline = min(self.loaded_until - self.prefetch, self.next_rescan)
+            if self._heap:
+                deadline = min(deadline, self._heap[0][0] + self.linger)
+            self._wakeup.clear()
+            await self.clock.sleep((deadline - now).total_seconds(), self._wakeup)
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+
+async def _main(args):
+    from lib.db.connection import SessionLocal, get_engine
+    from services.push import get_publisher_hub, publish_due
+
+    hub = get_publisher_hub()
+    if hub is not None:
+        await hub.start()
+    scheduler = ReminderScheduler(
+        SessionLocal, window=timedelta(minutes=args.window_minutes), batch_size=args.batch_size,
+        rescan_interval=timedelta(seconds=args.rescan_interval),
+        notify=partial(publish_due, hub) if hub else None,
+    )
+    try:
+        await scheduler.run()
+    finally:
+        if hub is not None:
+            await hub.stop()
+        await get_engine().dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the reminder scheduler.")
+    parser.add_argument("--window-minutes", type=float, default=15)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rescan-interval", type=float, default=5.0)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
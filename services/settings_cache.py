@@ -0,0 +1,295 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from lib.db.models import DeliveryChannel, SmtpShipping, WhatsappSettings
+
+SMTP = "smtp"
+WHATSAPP = "whatsapp"
+CHANNELS = ("channels",)
+
+
+@dataclass(frozen=True)
+class SmtpSettings:
+    server: str
+    port: int
+    username: str
+    password: str
+
+    @property
+    def key(self):
+        return (self.server, self.port, self.username)
+
+    @classmethod
+    def from_model(cls, settings: SmtpShipping):
+        # password_hash holds the SMTP secret itself; a one-way hash could
+        # not be used to log in.
+        return cls(settings.smtp_server, settings.port, settings.username, settings.password_hash)
+
+
+@dataclass(frozen=True)
+class WhatsappAccount:
+    phone_number_id: str
+    api_key: str
+
+    @classmethod
+    def from_model(cls, settings: WhatsappSettings):
+        return cls(settings.phone_number_id, settings.api_key)
+
+
+@dataclass(frozen=True)
+class DeliveryChannels:
+    """``delivery_channels`` as lookups: active channel ids by name, every
+    channel's name by id, and each channel's digest window in seconds."""
+    active: dict
+    names: dict
+    digest_windows: dict
+
+
+class _Flight:
+    def __init__(self, keys):
+        self.keys = keys
+        self.future = asyncio.get_running_loop().create_future()
+        self.stale = set()
+
+
+class SettingsCache:
+    """Bounded LRU of settings with a TTL and single-flight loading.
+
+    ``get_many(keys, load)`` serves what it can from the cache and loads
+    the rest with one ``await load(missing)`` call, which returns a dict.
+    Keys the loader leaves out are cached as None, so "no settings" is
+    remembered too. A caller asking for a key that is already being
+    loaded waits for that load instead of starting its own, so a burst of
+    misses on one key costs one query. If the loading caller is
+    cancelled, its waiters load the keys themselves rather than fail. A
+    key invalidated while its load is in flight is returned to the
+    waiting callers but not cached.
+
+    The cache is per process; ``ttl`` bounds how long another process's
+    writes can go unseen.
+    """
+
+    def __init__(self, max_size=10000, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.load_seconds_max = 0.0
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    async def get_many(self, keys, load):
+        if self.max_size <= 0:
+            self.misses += len(keys)
+            return await self._load(list(keys), load)
+        values = {}
+        waiting = {}
+        missing = []
+        now = time.monotonic()
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                values[key] = entry[1]
+                self.hits += 1
+                continue
+            self.misses += 1
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                waiting[key] = flight
+            else:
+                missing.append(key)
+        if missing:
+            flight = _Flight(missing)
+            for key in missing:
+                self._inflight[key] = flight
+            try:
+                loaded = await self._load(missing, load)
+            except asyncio.CancelledError:
+                # Only the leader was cancelled, not its waiters: they
+                # see None and load the keys themselves.
+                flight.future.set_result(None)
+                raise
+            except Exception as err:
+                flight.future.set_exception(err)
+                # Mark the exception retrieved; waiters re-raise it themselves.
+                flight.future.exception()
+                raise
+            finally:
+                for key in missing:
+                    if self._inflight.get(key) is flight:
+                        del self._inflight[key]
+            flight.future.set_result(loaded)
+            expires_at = time.monotonic() + self.ttl
+            for key in missing:
+                if key not in flight.stale:
+                    self._store(key, loaded[key], expires_at)
+            values.update((key, loaded[key]) for key in missing)
+        retry = []
+        for key, flight in waiting.items():
+            loaded = await asyncio.shield(flight.future)
+            if loaded is None:
+                retry.append(key)
+            else:
+                values[key] = loaded[key]
+        if retry:
+            values.update(await self.get_many(retry, load))
+        return values
+
+    async def get(self, key, load):
+        return (await self.get_many([key], load))[key]
+
+    async def _load(self, keys, load):
+        started = time.perf_counter()
+        loaded = await load(keys)
+        elapsed = time.perf_counter() - started
+        self.loads += 1
+        self.load_seconds += elapsed
+        self.load_seconds_max = max(self.load_seconds_max, elapsed)
+        return {key: loaded.get(key) for key in keys}
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        flight = self._inflight.pop(key, None)
+        if flight is not None:
+            flight.stale.add(key)
+
+    def clear(self):
+        for key in list(self._entries) + list(self._inflight):
+            self.invalidate(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "load_ms_avg": round(self.load_seconds / self.loads * 1000, 3) if self.loads else 0.0,
+            "load_ms_max": round(self.load_seconds_max * 1000, 3),
+        }
+
+
+class DeliverySettingsCache(SettingsCache):
+    """Each user's active SMTP and WhatsApp settings, and the delivery
+    channels. Loads run on the caller's session."""
+
+    async def smtp_settings(self, session, user_ids):
+        """``{user_id: SmtpSettings or None}``."""
+        async def load(keys):
+            rows = await session.execute(
+                select(SmtpShipping)
+                .where(SmtpShipping.user_id.in_([user_id for _, user_id in keys]), SmtpShipping.is_active.is_(True))
+                .order_by(SmtpShipping.smtp_id)
+            )
+            loaded = {}
+            for settings in rows.scalars():
+                loaded.setdefault((SMTP, settings.user_id), SmtpSettings.from_model(settings))
+            return loaded
+
+        values = await self.get_many([(SMTP, user_id) for user_id in set(user_ids)], load)
+        return {user_id: value for (_, user_id), value in values.items()}
+
+    async def whatsapp_accounts(self, session, user_ids):
+        """``{user_id: WhatsappAccount or None}``."""
+        async def load(keys):
+            rows = await session.execute(
+                select(WhatsappSettings)
+                .where(WhatsappSettings.user_id.in_([user_id for _, user_id in keys]), WhatsappSettings.is_active.is_(True))
+                .order_by(WhatsappSettings.wa_id)
+            )
+            loaded = {}
+            for settings in rows.scalars():
+                loaded.setdefault((WHATSAPP, settings.user_id), WhatsappAccount.from_model(settings))
+            return loaded
+
+        values = await self.get_many([(WHATSAPP, user_id) for user_id in set(user_ids)], load)
+        return {user_id: value for (_, user_id), value in values.items()}
+
+    async def channels(self, session):
+        async def load(keys):
+            rows = (await session.execute(
+                select(
+                    DeliveryChannel.channel_id,
+                    DeliveryChannel.channel_name,
+                    DeliveryChannel.is_active,
+                    DeliveryChannel.digest_window_seconds,
+                )
+            )).all()
+            return {CHANNELS: DeliveryChannels(
+                active={name: channel_id for channel_id, name, is_active, _ in rows if is_active},
+                names={channel_id: name for channel_id, name, _, _ in rows},
+                digest_windows={channel_id: window or 0 for channel_id, _, _, window in rows},
+            )}
+
+        return await self.get(CHANNELS, load)
+
+    def invalidate_user(self, user_id):
+        self.invalidate((SMTP, user_id))
+        self.invalidate((WHATSAPP, user_id))
+
+
+_delivery_settings_cache = None
+
+def get_delivery_settings_cache():
+    global _delivery_settings_cache
+    if _delivery_settings_cache is None:
+        _delivery_settings_cache = DeliverySettingsCache(
+            max_size=int(os.environ.get("DELIVERY_SETTINGS_CACHE_SIZE", 10000)),
+            ttl=float(os.environ.get("DELIVERY_SETTINGS_CACHE_TTL", 60)),
+        )
+    return _delivery_settings_cache
+
+
+def _settings_keys(obj):
+    if isinstance(obj, DeliveryChannel):
+        return {CHANNELS}
+    kind = SMTP if isinstance(obj, SmtpShipping) else WHATSAPP if isinstance(obj, WhatsappSettings) else None
+    if kind is None:
+        return set()
+    # A changed user_id moves the settings between users; drop both.
+    previous = inspect(obj).attrs.user_id.history.deleted
+    return {(kind, user_id) for user_id in [obj.user_id, *previous] if user_id is not None}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_settings_writes(session, flush_context):
+    """Note which cached settings an ORM flush wrote. They are invalidated
+    once the transaction commits, so a rollback leaves the cache alone.
+    Core UPDATE/DELETE statements bypass this and need an explicit
+    ``invalidate``."""
+    keys = set()
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        keys |= _settings_keys(obj)
+    if keys:
+        session.info.setdefault("settings_cache_keys", set()).update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_settings_writes(session):
+    keys = session.info.pop("settings_cache_keys", ())
+    if keys and _delivery_settings_cache is not None:
+        for key in keys:
+            _delivery_settings_cache.invalidate(key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_settings_writes(session):
+    session.info.pop("settings_cache_keys", None)
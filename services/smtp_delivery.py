@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from email.message import EmailMessage
+import aiosmtplib
+from sqlalchemy import select
+from lib.db.models import Reminder, ReminderForDelivery, User
+from services.deliveries import DELIVERY_FAILED, DELIVERY_SENT, DeliveryResult, digest_text, record_results
+from services.settings_cache import SmtpSettings, get_delivery_settings_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _header(value):
+    """``value`` on one line: ``EmailMessage`` rejects header values
+    containing CR or LF."""
+    return " ".join(str(value).split())
+
+
+class _PooledConnection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class _HostPool:
+    def __init__(self, max_connections):
+        self.slots = asyncio.Semaphore(max_connections)
+        self.idle = deque()
+
+
+class SmtpConnectionPool:
+    """Authenticated SMTP connections kept per (server, port, username).
+
+    At most ``max_per_host`` connections per key are in use at once.
+    Idle connections are reused LIFO, and any connection idle longer than
+    ``idle_timeout`` is closed instead. Connections are also retired after
+    ``max_messages`` messages. A connection that raised while in use is
+    closed and never returned to the pool.
+    """
+
+    def __init__(self, max_per_host=4, idle_timeout=30.0, max_messages=100, timeout=30.0):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.connects = 0
+        self._hosts = {}
+
+    async def _connect(self, settings: SmtpSettings):
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.server,
+            port=settings.port,
+            use_tls=settings.port == 465,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if settings.password and smtp.supports_extension("auth"):
+            await smtp.login(settings.username, settings.password)
+        self.connects += 1
+        return _PooledConnection(smtp)
+
+    async def _close(self, conn):
+        try:
+            await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    @asynccontextmanager
+    async def connection(self, settings: SmtpSettings):
+        host = self._hosts.get(settings.key)
+        if host is None:
+            host = self._hosts[settings.key] = _HostPool(self.max_per_host)
+        async with host.slots:
+            conn = None
+            while host.idle:
+                candidate = host.idle.pop()
+                if time.monotonic() - candidate.last_used < self.idle_timeout and candidate.smtp.is_connected:
+                    conn = candidate
+                    break
+                await self._close(candidate)
+            if conn is None:
+                conn = await self._connect(settings)
+            try:
+                yield conn.smtp
+            except BaseException:
+                conn.smtp.close()
+                raise
+            conn.messages += 1
+            conn.last_used = time.monotonic()
+            if conn.messages >= self.max_messages:
+                await self._close(conn)
+            else:
+                host.idle.append(conn)
+
+    async def close(self):
+        for host in self._hosts.values():
+            while host.idle:
+                await self._close(host.idle.pop())
+        self._hosts.clear()
+
+
+class SmtpDeliveryEngine:
+    """Sends ``ReminderForDelivery`` rows over each user's active
+    ``SmtpShipping`` settings and writes the outcome back to the rows.
+    The settings come from ``settings_cache``, so steady traffic reads
+    only the deliveries themselves."""
+
+    def __init__(self, session_factory, pool=None, settings_cache=None):
+        self.session_factory = session_factory
+        self.pool = pool or SmtpConnectionPool()
+        self.settings_cache = settings_cache or get_delivery_settings_cache()
+
+    async def send(self, settings: SmtpSettings, message: EmailMessage):
+        try:
+            async with self.pool.connection(settings) as smtp:
+                await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # A pooled connection the server already dropped; retry once
+            # on a fresh one.
+            async with self.pool.connection(settings) as smtp:
+                await smtp.send_message(message)
+
+    async def _load(self, delivery_ids, digest=False):
+        """One ``(settings, email, items)`` job per delivery, or per user
+        when ``digest`` is set, keyed by the tuple of delivery ids it
+        covers. ``items`` are the ``(title, description)`` pairs to send."""
+        query = (
+            select(
+                ReminderForDelivery.delivery_id,
+                Reminder.title,
+                Reminder.description,
+                User.user_id,
+                User.email,
+            )
+            .join(Reminder, Reminder.reminder_id == ReminderForDelivery.reminder_id)
+            .join(User, User.user_id == Reminder.user_id)
+            .where(ReminderForDelivery.delivery_id.in_(delivery_ids))
+            .order_by(ReminderForDelivery.delivery_id)
+        )
+        async with self.session_factory() as session:
+            rows = (await session.execute(query)).all()
+            settings_by_user = await self.settings_cache.smtp_settings(session, [row.user_id for row in rows])
+        groups = {}
+        for delivery_id, title, description, user_id, email in rows:
+            smtp_settings = settings_by_user.get(user_id)
+            if smtp_settings is None:
+                continue
+            group = groups.setdefault(user_id if digest else delivery_id, (smtp_settings, email, [], []))
+            group[2].append(delivery_id)
+            group[3].append((title, description))
+        return {tuple(ids): (smtp_settings, email, items) for smtp_settings, email, ids, items in groups.values()}
+
+    @staticmethod
+    def _message(smtp_settings, email, items):
+        message = EmailMessage()
+        message["From"] = _header(smtp_settings.username)
+        message["To"] = _header(email)
+        if len(items) == 1:
+            title, description = items[0]
+            message["Subject"] = _header(title)
+            message.set_content(description or title)
+        else:
+            message["Subject"] = f"{len(items)} reminders"
+            message.set_content(digest_text(items))
+        return message
+
+    async def _attempt(self, delivery_ids, settings, email, items):
+        try:
+            message = self._message(settings, email, items)
+        except Exception as err:
+            logger.warning("SMTP delivery %s could not be built: %r", delivery_ids, err)
+            return [DeliveryResult(delivery_id, DELIVERY_FAILED, error=repr(err)) for delivery_id in delivery_ids]
+        try:
+            await self.send(settings, message)
+        except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as err:
+            logger.warning("SMTP delivery %s via %s:%s failed: %s", delivery_ids, settings.server, settings.port, err)
+            return [DeliveryResult(delivery_id, DELIVERY_FAILED, error=str(err)) for delivery_id in delivery_ids]
+        sent_at = datetime.utcnow()
+        return [DeliveryResult(delivery_id, DELIVERY_SENT, sent_at=sent_at) for delivery_id in delivery_ids]
+
+    async def send_deliveries(self, delivery_ids, digest=False):
+        """Send the given deliveries concurrently (bounded per host by the
+        pool) without recording them. With ``digest``, each user's
+        deliveries go out as one message. Deliveries whose user has no
+        active SMTP settings are marked failed."""
+        jobs = await self._load(delivery_ids, digest)
+        sent = await asyncio.gather(
+            *(self._attempt(ids, *job) for ids, job in jobs.items())
+        )
+        results = [result for group in sent for result in group]
+        covered = {delivery_id for ids in jobs for delivery_id in ids}
+        results.extend(
+            DeliveryResult(delivery_id, DELIVERY_FAILED, error="no active SMTP settings")
+            for delivery_id in delivery_ids if delivery_id not in covered
+        )
+        return results
+
+    async def deliver(self, delivery_ids):
+        """Send the given deliveries and write the outcomes back."""
+        results = await self.send_deliveries(delivery_ids)
+        await record_results(self.session_factory, results)
+        return results
+
+    async def close(self):
+        await self.pool.close()
@@ -0,0 +1,328 @@
+"""AI rewrites of reminder text behind a content-addressed cache.
+
+Source text is normalized (Unicode NFKC, whitespace collapsed, case
+folded) and hashed together with the generator's name, so "Pay rent",
+"pay  rent" and "Pay rent " share one ``generated_texts`` row, and
+switching generators never serves another model's output. Lookups go
+through a per-process LRU, then the table, and only then the generator.
+Misses from concurrent callers are gathered into micro-batches of up to
+``batch_size`` texts, and a key already being generated is never
+requested twice. At most ``max_concurrency`` generator calls run at
+once. ``TEXT_GENERATOR`` picks the backend; ``openai`` talks to any
+OpenAI-compatible ``/chat/completions`` endpoint (``OPENAI_BASE_URL``,
+``OPENAI_API_KEY``, ``TEXT_GENERATOR_MODEL``). Fill in
+``reminder_logs.ai_generated_text`` with:
+
+    TEXT_GENERATOR=openai python -m services.text_generation
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import unicodedata
+import httpx
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from lib.db.models import GeneratedText, ReminderLog
+from services.settings_cache import SettingsCache
+
+logger = logging.getLogger(__name__)
+
+generated_texts = GeneratedText.__table__
+reminder_logs = ReminderLog.__table__
+
+
+def clean_text(text):
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_key(generator_name, text):
+    """The cache key for ``text``; case and spacing don't change it."""
+    normalized = clean_text(text).casefold()
+    return hashlib.sha256(f"{generator_name}\0{normalized}".encode()).hexdigest()
+
+
+class FakeGenerator:
+    """Deterministic stand-in for a model backend, for tests and
+    benchmarks. Each call sleeps ``call_latency + item_latency * len(texts)``."""
+
+    name = "fake-v1"
+
+    def __init__(self, call_latency=0.0, item_latency=0.0, max_batch=32):
+        self.call_latency = call_latency
+        self.item_latency = item_latency
+        self.max_batch = max_batch
+        self.calls = 0
+        self.items = 0
+        self.input_chars = 0
+
+    async def generate(self, texts):
+        self.calls += 1
+        self.items += len(texts)
+        self.input_chars += sum(len(text) for text in texts)
+        await asyncio.sleep(self.call_latency + self.item_latency * len(texts))
+        return [f"Friendly reminder: {text}" for text in texts]
+
+
+class ChatCompletionsGenerator:
+    """Rewrites through an OpenAI-compatible ``/chat/completions``
+    endpoint, one request per text; a batch's requests run in parallel
+    over one keep-alive client."""
+
+    prompt = (
+        "Rewrite the user's reminder as one short, friendly sentence addressed to them. "
+        "Keep every date, time, amount and name. Reply with the sentence only."
+    )
+
+    def __init__(self, base_url, api_key, model, max_batch=16, timeout=30.0):
+        self.model = model
+        # Part of the cache key: bump the version when the prompt changes.
+        self.name = f"chat-v1:{model}"
+        self.max_batch = max_batch
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+
+    async def _rewrite(self, text):
+        response = await self._client.post("/chat/completions", json={
+            "model": self.model,
+            "messages": [{"role": "system", "content": self.prompt}, {"role": "user", "content": text}],
+        })
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    async def generate(self, texts):
+        return list(await asyncio.gather(*(self._rewrite(text) for text in texts)))
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def _chat_completions_generator():
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+    return ChatCompletionsGenerator(
+        os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        api_key,
+        os.environ.get("TEXT_GENERATOR_MODEL", "gpt-4o-mini"),
+    )
+
+
+# Backend factories by TEXT_GENERATOR name. A backend has a ``name``
+# (part of the cache key, so bump it when the model or prompt changes),
+# a ``max_batch``, ``async generate(texts) -> list`` returning one
+# output per input, in order, and ``async close()``. FakeGenerator is
+# deliberately not listed, so a deployment can't end up writing its
+# canned text into the logs; tests and benchmarks pass it in directly.
+GENERATORS = {"openai": _chat_completions_generator}
+
+
+class TextGenerationService:
+    def __init__(self, session_factory, generator, batch_size=None, max_wait=0.01, max_concurrency=4, memory_size=10000):
+        self.session_factory = session_factory
+        self.generator = generator
+        self.batch_size = min(batch_size or generator.max_batch, generator.max_batch)
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.memory = SettingsCache(max_size=memory_size, ttl=float("inf"))
+        self.requests = 0
+        self.stored_hits = 0
+        self.generated = 0
+        self.batches = 0
+        self.generate_seconds = 0.0
+        self._pending = {}
+        self._timer = None
+        self._flushes = set()
+
+    async def generate(self, text):
+        return (await self.generate_many([text]))[0]
+
+    async def generate_many(self, texts):
+        """The rewrite of each text, in order; empty texts give None."""
+        keys = [text_key(self.generator.name, text) if text and text.strip() else None for text in texts]
+        sources = {}
+        for key, text in zip(keys, texts):
+            if key is not None:
+                self.requests += 1
+                sources.setdefault(key, clean_text(text))
+
+        async def load(missing):
+            futures = [self._submit(key, sources[key]) for key in missing]
+            results = await asyncio.gather(*(asyncio.shield(future) for future in futures))
+            return dict(zip(missing, results))
+
+        values = await self.memory.get_many(list(sources), load)
+        return [values[key] if key is not None else None for key in keys]
+
+    def _submit(self, key, text):
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[1]
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = (text, future)
+        if len(self._pending) >= self.batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._start_flush)
+        return future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        # No connection is held while the generator runs.
+        self.batches += 1
+        try:
+            async with self.session_factory() as session:
+                stored = dict((await session.execute(
+                    select(generated_texts.c.text_hash, generated_texts.c.generated_text)
+                    .where(generated_texts.c.text_hash.in_(list(batch)))
+                )).all())
+            self.stored_hits += len(stored)
+            for key, value in stored.items():
+                _resolve(batch[key][1], value)
+            missing = [key for key in batch if key not in stored]
+            if not missing:
+                return
+            async with self._slots:
+                started = time.perf_counter()
+                outputs = await self.generator.generate([batch[key][0] for key in missing])
+                self.generate_seconds += time.perf_counter() - started
+            if len(outputs) != len(missing):
+                raise ValueError(f"{self.generator.name} returned {len(outputs)} outputs for {len(missing)} texts")
+            self.generated += len(missing)
+            for key, output in zip(missing, outputs):
+                _resolve(batch[key][1], output)
+            async with self.session_factory() as session:
+                await session.execute(_insert_ignore(session), [
+                    {"text_hash": key, "generator": self.generator.name, "source_text": batch[key][0], "generated_text": output}
+                    for key, output in zip(missing, outputs)
+                ])
+                await session.commit()
+        except Exception as err:
+            unresolved = [future for _, future in batch.values() if not future.done()]
+            for future in unresolved:
+                future.set_exception(err)
+            if not unresolved:
+                logger.exception("Storing %d generated texts failed", len(batch))
+
+    def stats(self):
+        memory = self.memory.stats()
+        return {
+            "requests": self.requests,
+            "memory_hits": memory["hits"],
+            "coalesced": memory["coalesced"],
+            "stored_hits": self.stored_hits,
+            "generated": self.generated,
+            "hit_ratio": round(1 - self.generated / self.requests, 4) if self.requests else 0.0,
+            "batches": self.batches,
+            "generate_seconds": round(self.generate_seconds, 3),
+        }
+
+
+def _resolve(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+def _insert_ignore(session):
+    # Another process may have stored the same key meanwhile; both rows
+    # hold an equivalent rewrite, so keep whichever landed first.
+    if session.bind.dialect.name == "sqlite":
+        return sqlite_insert(generated_texts).on_conflict_do_nothing()
+    return insert(generated_texts).prefix_with("IGNORE")
+
+
+async def fill_reminder_logs(session_factory, service, batch_size=500):
+    """Write ``ai_generated_text`` for every log that has source text but
+    no rewrite yet, ``batch_size`` logs at a time. Returns the number of
+    logs filled."""
+    filled = 0
+    after = 0
+    while True:
+        # The generator can take seconds; hold no connection meanwhile.
+        async with session_factory() as session:
+            rows = (await session.execute(
+                select(reminder_logs.c.id_log_id, reminder_logs.c.original_text)
+                .where(
+                    reminder_logs.c.id_log_id > after,
+                    reminder_logs.c.ai_generated_text.is_(None),
+                    reminder_logs.c.original_text.isnot(None),
+                )
+                .order_by(reminder_logs.c.id_log_id)
+                .limit(batch_size)
+            )).all()
+        if not rows:
+            return filled
+        after = rows[-1].id_log_id
+        outputs = await service.generate_many([row.original_text for row in rows])
+        updates = [
+            {"log_id": row.id_log_id, "text": output}
+            for row, output in zip(rows, outputs)
+            if output is not None
+        ]
+        if updates:
+            async with session_factory() as session:
+                await session.execute(
+                    update(reminder_logs)
+                    .where(reminder_logs.c.id_log_id == bindparam("log_id"))
+                    .values(ai_generated_text=bindparam("text")),
+                    updates,
+                )
+                await session.commit()
+        filled += len(updates)
+
+
+_service = None
+
+def get_text_generation_service():
+    global _service
+    if _service is None:
+        from lib.db.connection import SessionLocal
+
+        load_dotenv()
+        backend = os.environ.get("TEXT_GENERATOR")
+        if not backend:
+            raise ValueError("TEXT_GENERATOR environment variable not set")
+        if backend not in GENERATORS:
+            raise ValueError(f"Unknown TEXT_GENERATOR: {backend}")
+        _service = TextGenerationService(
+            SessionLocal,
+            GENERATORS[backend](),
+            batch_size=int(os.environ.get("TEXT_GENERATION_BATCH_SIZE", 32)),
+            max_wait=float(os.environ.get("TEXT_GENERATION_MAX_WAIT", 0.01)),
+            max_concurrency=int(os.environ.get("TEXT_GENERATION_CONCURRENCY", 4)),
+        )
+    return _service
+
+
+async def _main(args):
+    from lib.db.connection import SessionLocal, get_engine
+
+    service = get_text_generation_service()
+    try:
+        filled = await fill_reminder_logs(SessionLocal, service, batch_size=args.batch_size)
+        logger.info("Filled %d reminder logs: %s", filled, service.stats())
+    finally:
+        await service.generator.close()
+        await get_engine().dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill in AI-generated text for reminder logs.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """The fields request handlers need from the caller's ``User`` row."""
+    user_id: int
+    email: str
+    name: str
+
+
+class TokenCache:
+    """Bounded LRU of verified JWTs, keyed by the token's SHA-256 digest.
+
+    An entry lives for ``ttl`` seconds or until the token's ``exp``,
+    whichever comes first. The cache is per process, so invalidation on
+    one worker does not reach the others; ``ttl`` bounds that staleness.
+    """
+
+    def __init__(self, max_size=10000, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        if self.max_size <= 0:
+            self.misses += 1
+            return None
+        key = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims, user = entry
+            if expires_at <= time.monotonic():
+                self._remove(key, user.user_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims, user
+
+    def put(self, token, claims, user):
+        if self.max_size <= 0:
+            return
+        remaining = claims["exp"] - time.time()
+        if remaining <= 0:
+            return
+        key = self._digest(token)
+        expires_at = time.monotonic() + min(self.ttl, remaining)
+        with self._lock:
+            self._entries[key] = (expires_at, claims, user)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                old_key, (_, _, old_user) = self._entries.popitem(last=False)
+                self._discard_index(old_key, old_user.user_id)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in self._by_user.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, key, user_id):
+        self._entries.pop(key, None)
+        self._discard_index(key, user_id)
+
+    def _discard_index(self, key, user_id):
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_token_cache = None
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache(
+            max_size=int(os.environ.get("TOKEN_CACHE_SIZE", 10000)),
+            ttl=float(os.environ.get("TOKEN_CACHE_TTL", 60)),
+        )
+    return _token_cache
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+import httpx
+from sqlalchemy import select
+from lib.db.models import Reminder, ReminderForDelivery, User
+from services.deliveries import DELIVERY_FAILED, DELIVERY_SENT, DeliveryResult, digest_text, record_results
+from services.settings_cache import WhatsappAccount, get_delivery_settings_cache
+
+logger = logging.getLogger(__name__)
+
+GRAPH_API_URL = "https://graph.facebook.com/v19.0"
+
+
+class WhatsappSendError(Exception):
+    pass
+
+
+class _AccountLimiter:
+    """Token bucket for one account, plus a pause set from Retry-After.
+
+    Only callers for the same account wait on it, so a throttled account
+    never holds up sends for the others.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+def _retry_after(response, default=1.0):
+    value = response.headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class WhatsappDeliveryClient:
+    """Sends reminders through the WhatsApp Cloud API for every user over
+    one shared keep-alive ``httpx.AsyncClient``.
+
+    Each account (``phone_number_id``) is limited to ``rate_per_account``
+    sends per second. A 429 pauses only that account, for Retry-After
+    seconds, and the send is retried. 5xx responses and transport errors
+    are retried with backoff, up to ``max_attempts`` tries in total.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        base_url=GRAPH_API_URL,
+        rate_per_account=20.0,
+        burst=None,
+        max_connections=100,
+        max_attempts=4,
+        timeout=10.0,
+        settings_cache=None,
+    ):
+        self.session_factory = session_factory
+        self.settings_cache = settings_cache or get_delivery_settings_cache()
+        self.rate_per_account = rate_per_account
+        self.burst = burst or rate_per_account
+        self.max_attempts = max_attempts
+        self.throttled = 0
+        self._limiters = {}
+        # Requests wait here rather than in httpx's own pool queue, which
+        # rescans every waiter whenever a connection frees up.
+        self._inflight = asyncio.Semaphore(max_connections)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def _limiter(self, account):
+        limiter = self._limiters.get(account.phone_number_id)
+        if limiter is None:
+            limiter = self._limiters[account.phone_number_id] = _AccountLimiter(self.rate_per_account, self.burst)
+        return limiter
+
+    async def send(self, account: WhatsappAccount, to: str, body: str):
+        limiter = self._limiter(account)
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {"body": body},
+        }
+        headers = {"Authorization": f"Bearer {account.api_key}"}
+        for attempt in range(1, self.max_attempts + 1):
+            await limiter.acquire()
+            try:
+                async with self._inflight:
+                    response = await self._client.post(
+                        f"/{account.phone_number_id}/messages", json=payload, headers=headers
+                    )
+            except httpx.TransportError as err:
+                if attempt == self.max_attempts:
+                    raise WhatsappSendError(str(err)) from err
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+            if response.status_code == 429:
+                self.throttled += 1
+                limiter.pause(_retry_after(response))
+                continue
+            if response.status_code >= 500 and attempt < self.max_attempts:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+            if response.status_code >= 400:
+                raise WhatsappSendError(f"HTTP {response.status_code}: {response.text[:200]}")
+            try:
+                return response.json()
+            except ValueError as err:
+                raise WhatsappSendError(f"invalid response body: {response.text[:200]}") from err
+        raise WhatsappSendError(f"gave up after {self.max_attempts} attempts")
+
+    async def _load(self, delivery_ids, digest=False):
+        """One ``(account, to, body)`` job per delivery, or per user when
+        ``digest`` is set, keyed by the tuple of delivery ids it covers."""
+        query = (
+            select(
+                ReminderForDelivery.delivery_id,
+                Reminder.title,
+                Reminder.description,
+                User.user_id,
+                User.phone_number,
+            )
+            .join(Reminder, Reminder.reminder_id == ReminderForDelivery.reminder_id)
+            .join(User, User.user_id == Reminder.user_id)
+            .where(ReminderForDelivery.delivery_id.in_(delivery_ids))
+            .order_by(ReminderForDelivery.delivery_id)
+        )
+        async with self.session_factory() as session:
+            rows = (await session.execute(query)).all()
+            accounts = await self.settings_cache.whatsapp_accounts(session, [row.user_id for row in rows])
+        groups = {}
+        for delivery_id, title, description, user_id, phone_number in rows:
+            account = accounts.get(user_id)
+            if account is None or not phone_number:
+                continue
+            group = groups.setdefault(user_id if digest else delivery_id, (account, phone_number, [], []))
+            group[2].append(delivery_id)
+            group[3].append((title, description))
+        jobs = {}
+        for account, phone_number, ids, items in groups.values():
+            if len(items) == 1:
+                title, description = items[0]
+                body = f"{title}\n{description}" if description else title
+            else:
+                body = digest_text(items)
+            jobs[tuple(ids)] = (account, phone_number, body)
+        return jobs
+
+    async def _attempt(self, delivery_ids, account, to, body):
+        try:
+            await self.send(account, to, body)
+        except WhatsappSendError as err:
+            logger.warning("WhatsApp delivery %s via %s failed: %s", delivery_ids, account.phone_number_id, err)
+            return [DeliveryResult(delivery_id, DELIVERY_FAILED, error=str(err)) for delivery_id in delivery_ids]
+        sent_at = datetime.utcnow()
+        return [DeliveryResult(delivery_id, DELIVERY_SENT, sent_at=sent_at) for delivery_id in delivery_ids]
+
+    async def send_deliveries(self, delivery_ids, digest=False):
+        """Send the given deliveries concurrently without recording them.
+        With ``digest``, each user's deliveries go out as one message.
+        Deliveries with no active settings or phone number are marked failed."""
+        jobs = await self._load(delivery_ids, digest)
+        sent = await asyncio.gather(
+            *(self._attempt(ids, *job) for ids, job in jobs.items())
+        )
+        results = [result for group in sent for result in group]
+        covered = {delivery_id for ids in jobs for delivery_id in ids}
+        results.extend(
+            DeliveryResult(delivery_id, DELIVERY_FAILED, error="no active WhatsApp settings")
+            for delivery_id in delivery_ids if delivery_id not in covered
+        )
+        return results
+
+    async def deliver(self, delivery_ids):
+        """Send the given deliveries and write the outcomes back."""
+        results = await self.send_deliveries(delivery_ids)
+        await record_results(self.session_factory, results)
+        return results
+
+    async def close(self):
+        await self._client.aclose()